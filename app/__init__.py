@@ -1,8 +1,11 @@
 # app/__init__.py
 
-from flask import Flask
+from flask import Flask, jsonify
+from flask_login import login_required
 from app.config import Config
 from app.extensions import init_extensions
+from app.services.request_metrics import init_request_metrics
+from app.services.report_cache import init_report_cache
 
 # 导入蓝图
 from app.routes.auth import auth as auth_bp
@@ -20,6 +23,11 @@ def create_app(config_class=Config):
     # 1. 初始化扩展
     init_extensions(app)
 
+    # 1.1 请求性能指标：各端点耗时、SQL 条数与耗时、模板渲染耗时，/metrics 输出
+    init_request_metrics(app)
+    # 1.2 报表接口缓存 (订单变化时失效)
+    init_report_cache(app)
+
     # 2. 注册蓝图
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(product_bp, url_prefix='/product')
@@ -34,4 +42,13 @@ def create_app(config_class=Config):
         # 默认重定向到报表页
         return redirect(url_for('report.dashboard'))
 
+    # 4. 数据库连接池指标 (按绑定：primary / replica)：容量、借出 / 溢出连接数、取连接等待时间
+    @app.route('/api/pool_stats')
+    @login_required
+    def pool_stats():
+        from app.extensions import db
+        from app.services.db_pool import pool_stats as engine_pool_stats
+        return jsonify({'success': True, 'profile': app.config['DB_POOL_PROFILE'],
+                        'pools': engine_pool_stats(db.engines)})
+
     return app
\ No newline at end of file
@@ -18,5 +18,57 @@ class Config:
     # 关闭 SQLALCHEMY 跟踪，以节省资源
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # 数据库连接池配置档：dev (默认) / prod / high_concurrency，由 DB_POOL_PROFILE 环境变量选择。
+    # 所有配置档都开启 pool_pre_ping，并在 MySQL wait_timeout 之前回收空闲连接，避免取到已被服务端断开的连接。
+    DB_POOL_PROFILE = os.environ.get('DB_POOL_PROFILE') or 'dev'
+    DB_POOL_PROFILES = {
+        'dev': {
+            'pool_size': 5, 'max_overflow': 5, 'pool_timeout': 10,
+            'pool_recycle': 3600, 'pool_pre_ping': True,
+        },
+        'prod': {
+            'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 30,
+            'pool_recycle': 1800, 'pool_pre_ping': True,
+        },
+        'high_concurrency': {
+            # 超时短一些：连接池耗尽时快速失败，而不是让请求在队列里堆积；LIFO 让空闲连接自然超时回收
+            'pool_size': 30, 'max_overflow': 50, 'pool_timeout': 5,
+            'pool_recycle': 900, 'pool_pre_ping': True, 'pool_use_lifo': True,
+        },
+    }
+    # 单项覆盖 (优先于配置档)，如 DB_POOL_SIZE=20
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        option: int(os.environ[env])
+        for option, env in (('pool_size', 'DB_POOL_SIZE'), ('max_overflow', 'DB_MAX_OVERFLOW'),
+                            ('pool_timeout', 'DB_POOL_TIMEOUT'), ('pool_recycle', 'DB_POOL_RECYCLE'))
+        if os.environ.get(env)
+    }
+
+    # 只读副本 (可选)：报表与导出查询发往此库，订单与库存写入始终使用主库；副本不可用时自动回落到主库
+    SQLALCHEMY_BINDS = {'replica': os.environ['REPLICA_DATABASE_URL']} if os.environ.get('REPLICA_DATABASE_URL') else {}
+
+    # 批量导入接口 (/order/api/import_orders、/product/api/bulk_upsert) 的脚本调用令牌：
+    # 请求携带 Authorization: Bearer <token> 时无需登录会话和 CSRF 令牌；未设置时只能登录后在页面上调用
+    IMPORT_API_TOKEN = os.environ.get('IMPORT_API_TOKEN')
+
+    # 请求性能指标：GET /metrics (Prometheus 格式)，抓取需携带 Authorization: Bearer <METRICS_TOKEN>；
+    # 未设置时该端点只在调试 / 测试模式下开放
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # 慢请求日志阈值 (秒)，默认关闭；开启后超时请求的日志中列出最耗时的 SQL
+    SLOW_REQUEST_SECONDS = float(os.environ['SLOW_REQUEST_SECONDS']) if os.environ.get('SLOW_REQUEST_SECONDS') else None
+
+    # 报表接口缓存：memory (进程内，默认) / redis (多进程共享，需 REPORT_CACHE_URL) / fake (测试用) / none
+    REPORT_CACHE_BACKEND = os.environ.get('REPORT_CACHE_BACKEND') or 'memory'
+    REPORT_CACHE_URL = os.environ.get('REPORT_CACHE_URL') or 'redis://localhost:6379/0'
+    REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL') or 300)  # 秒；订单变化时通过数据库中的代数立即失效
+
+    # 报表接口并发执行互不依赖的聚合查询的线程数 (每个线程占用一个数据库连接)，1 表示顺序执行
+    REPORT_QUERY_WORKERS = int(os.environ.get('REPORT_QUERY_WORKERS') or 4)
+
+    # DeepSeek (OpenAI 兼容接口) 配置，测试时可把 DEEPSEEK_BASE_URL 指向本地桩服务 (flask ai_stub_server)
+    DEEPSEEK_API_KEY = os.environ.get('DEEPSEEK_API_KEY')
+    DEEPSEEK_BASE_URL = os.environ.get('DEEPSEEK_BASE_URL') or 'https://api.deepseek.com'
+    DEEPSEEK_MODEL = os.environ.get('DEEPSEEK_MODEL') or 'deepseek-chat'
+
     # 可视化报表配置（如果使用 Echarts 或 Plotly）
     CHART_COLORS = ['#5470C6', '#91CC75', '#EE6666', '#73C0DE', '#FAC858']
\ No newline at end of file
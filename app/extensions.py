@@ -4,18 +4,28 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
 from flask_wtf import CSRFProtect
+from app.services.db_routing import RoutingSession
 
 # 实例化扩展
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})  # 读写分离：报表查询可路由到只读副本
 login_manager = LoginManager()
 bcrypt = Bcrypt()
-csrf = 0
+csrf = CSRFProtect()
 
 def init_extensions(app):
     """初始化所有 Flask 扩展"""
+    # 连接池参数 (主库与只读副本) 按 DB_POOL_PROFILE 配置档生成，并使用带等待时间统计的连接池
+    from app.services.db_pool import engine_options, bind_engine_options, instrument_engine
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    app.config['SQLALCHEMY_BINDS'] = bind_engine_options(app.config)
     db.init_app(app)
+    with app.app_context():
+        # 主库与只读副本的连接池分别统计
+        for key, engine in db.engines.items():
+            options = app.config['SQLALCHEMY_BINDS'][key] if key is not None else app.config['SQLALCHEMY_ENGINE_OPTIONS']
+            instrument_engine(engine, options)
     bcrypt.init_app(app)
-    CSRFProtect(app)
+    csrf.init_app(app)
 
     login_manager.init_app(app)
     # 设置登录视图的端点名称
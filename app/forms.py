@@ -1,7 +1,7 @@
 # app/forms.py
 
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, BooleanField, SubmitField, DecimalField, IntegerField
+from wtforms import StringField, PasswordField, BooleanField, SubmitField, DecimalField, IntegerField, SelectField
 from wtforms.validators import DataRequired, Length, NumberRange, ValidationError
 
 
@@ -65,7 +65,7 @@ class CategoryForm(FlaskForm):
 # 定义一个用于商品列表页搜索的表单
 class ProductSearchForm(FlaskForm):
     # 搜索关键词：可以搜索名称或ID
-    search_term = StringField('搜索', render_kw={"placeholder": "商品名称"})
+    search_term = StringField('搜索', render_kw={"placeholder": "商品名称或拼音首字母"})
 
     submit = SubmitField('搜索')
 
@@ -73,4 +73,11 @@ class ProductSearchForm(FlaskForm):
 # 用于会员列表页搜索的表单
 class MemberSearchForm(FlaskForm):
     search_term = StringField('手机号', render_kw={"placeholder": "会员手机号"})
+    # 排序与消费统计筛选 (取值见 app.routes.member.MEMBER_SORTS)
+    sort = SelectField('排序', choices=[
+        ('id', '注册顺序'), ('total_spent', '累计消费最高'), ('recent_spent', '近90天消费最高'),
+        ('order_count', '订单最多'), ('last_order', '最近消费'), ('inactive', '最久未消费'),
+    ], default='id')
+    inactive_days = IntegerField('未消费天数', render_kw={"placeholder": "超过 N 天未消费"})
+    min_orders = IntegerField('最少订单数', render_kw={"placeholder": "至少 N 单"})
     submit = SubmitField('搜索')
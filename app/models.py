@@ -46,6 +46,10 @@ class Category(db.Model):
 # --- 3. 水果商品表 ---
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        # 分类删除前检查 / 分类页统计商品数
+        db.Index('ix_products_category_id', 'category_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
@@ -66,6 +70,12 @@ class Product(db.Model):
 # --- 4. 会员表 ---
 class Member(db.Model):
     __tablename__ = 'members'
+    __table_args__ = (
+        # 结算页会员联想搜索：姓名前缀匹配 (手机号前缀匹配使用唯一索引)
+        db.Index('ix_members_name', 'name'),
+        # 会员列表按累计消费排序 (键集分页)
+        db.Index('ix_members_total_spent', 'total_spent', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
@@ -77,6 +87,27 @@ class Member(db.Model):
 
     # 关系：一个会员可以有多个订单
     orders = relationship('Order', backref='member', lazy='dynamic')
+    # 消费统计 (一对一，无订单的会员没有统计行)
+    stats = relationship('MemberStats', backref='member', uselist=False, cascade='all, delete-orphan')
+    # RFM 分群 (flask segment_members 生成)
+    rfm_segment = relationship('MemberSegment', backref='member', uselist=False, cascade='all, delete-orphan')
+
+    @property
+    def order_count(self):
+        return self.stats.order_count if self.stats else 0
+
+    @property
+    def last_order_at(self):
+        return self.stats.last_order_at if self.stats else None
+
+    @property
+    def recent_spent(self):
+        return self.stats.recent_spent if self.stats else 0
+
+    @property
+    def average_order_value(self):
+        """平均客单价 = 累计消费 / 已完成订单数"""
+        return self.total_spent / self.order_count if self.order_count else 0
 
     def __repr__(self):
         return f"<Member {self.name}>"
@@ -85,6 +116,14 @@ class Member(db.Model):
 # --- 5. 销售订单表 ---
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # 报表：WHERE status = 'Completed' AND order_date >= ?
+        db.Index('ix_orders_status_order_date', 'status', 'order_date'),
+        # 订单列表：按日期区间筛选，并作为 (order_date, id) 键集分页的排序索引
+        db.Index('ix_orders_order_date', 'order_date', 'id'),
+        # 订单列表 / 导出：按会员筛选
+        db.Index('ix_orders_member_id', 'member_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     order_date = db.Column(db.DateTime, default=datetime.utcnow)
@@ -97,8 +136,8 @@ class Order(db.Model):
     # 状态：Completed, Deleted/Cancelled
     status = db.Column(db.String(20), default='Completed')
 
-    # 关系：一个订单包含多个订单详情
-    items = relationship('OrderItem', backref='order', lazy='dynamic', cascade='all, delete-orphan')
+    # 关系：一个订单包含多个订单详情 (普通集合关系，可用 selectinload 预加载)
+    items = relationship('OrderItem', backref='order', lazy='select', cascade='all, delete-orphan')
 
     def __repr__(self):
         return f"<Order {self.id}>"
@@ -107,6 +146,12 @@ class Order(db.Model):
 # --- 6. 订单详情表 ---
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
+    __table_args__ = (
+        # 订单详情 / 删除回滚：WHERE order_id = ?
+        db.Index('ix_order_items_order_id', 'order_id'),
+        # 商品维度聚合与关联
+        db.Index('ix_order_items_product_id', 'product_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
@@ -120,4 +165,131 @@ class OrderItem(db.Model):
     line_subtotal = db.Column(db.Numeric(10, 2), nullable=False)  # 行小计金额
 
     def __repr__(self):
-        return f"<OrderItem {self.id} for Order {self.order_id}>"
\ No newline at end of file
+        return f"<OrderItem {self.id} for Order {self.order_id}>"
+
+# --- 7. 每日销售汇总表 (报表预聚合，随订单创建/删除增量维护) ---
+class DailySales(db.Model):
+    __tablename__ = 'daily_sales'
+
+    sale_date = db.Column(db.Date, primary_key=True)
+
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0.00)  # 实付金额合计
+    order_count = db.Column(db.Integer, nullable=False, default=0)  # 已完成订单数
+    cost = db.Column(db.Numeric(14, 2), nullable=False, default=0.00)  # 销售成本合计
+    profit = db.Column(db.Numeric(14, 2), nullable=False, default=0.00)  # 毛利润 = 实付金额 - 成本
+
+    def __repr__(self):
+        return f"<DailySales {self.sale_date}>"
+
+
+# --- 8. 商品每日销售汇总表 (商品排行预聚合) ---
+class ProductDailySales(db.Model):
+    __tablename__ = 'product_daily_sales'
+
+    # 日期在前：按时间窗口范围扫描时直接走主键
+    sale_date = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+
+    quantity = db.Column(db.Integer, nullable=False, default=0)  # 销量
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0.00)  # 行小计合计
+    gross_profit = db.Column(db.Numeric(14, 2), nullable=False, default=0.00)  # (售价 - 成本) * 数量
+
+    def __repr__(self):
+        return f"<ProductDailySales {self.sale_date} #{self.product_id}>"
+
+
+# --- 9. AI 销售分析结果表 (按输入指标指纹缓存，相同输入只调用一次模型) ---
+class AiAnalysis(db.Model):
+    __tablename__ = 'ai_analyses'
+
+    fingerprint = db.Column(db.String(64), primary_key=True)  # 输入指标的 SHA-256，同时作为任务 ID
+    # 状态：pending (后台生成中), done, failed
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    analysis = db.Column(db.Text, nullable=True)  # 分析结果或失败原因
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)  # 最近一次提交任务或任务结束的时间
+
+    def __repr__(self):
+        return f"<AiAnalysis {self.fingerprint[:8]} {self.status}>"
+
+
+# --- 10. 会员手机号后缀索引表 (手机号子串搜索) ---
+class MemberPhoneSuffix(db.Model):
+    __tablename__ = 'member_phone_suffixes'
+
+    # 手机号的每个后缀一行："包含 term" 等价于 "某个后缀以 term 开头"，可走主键前缀范围扫描
+    suffix = db.Column(db.String(20), primary_key=True)
+    member_id = db.Column(db.Integer, db.ForeignKey('members.id'), primary_key=True)
+
+    def __repr__(self):
+        return f"<MemberPhoneSuffix {self.suffix} #{self.member_id}>"
+
+
+# --- 11. 批量导入订单记录表 (离线收银台补传订单的幂等键) ---
+class ImportedOrder(db.Model):
+    __tablename__ = 'imported_orders'
+
+    # 收银台生成的订单 UUID：同一 UUID 重复导入时直接跳过
+    client_uuid = db.Column(db.String(64), primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
+    imported_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ImportedOrder {self.client_uuid} -> {self.order_id}>"
+
+
+# --- 12. 会员消费统计表 (随订单创建/删除增量维护，flask recompute_member_stats 全量重建) ---
+class MemberStats(db.Model):
+    __tablename__ = 'member_stats'
+    __table_args__ = (
+        # 会员列表的排序与筛选 (键集分页)：近期消费排行、订单数排行、按最近消费时间筛选沉睡会员
+        db.Index('ix_member_stats_recent_spent', 'recent_spent', 'member_id'),
+        db.Index('ix_member_stats_order_count', 'order_count', 'member_id'),
+        db.Index('ix_member_stats_last_order_at', 'last_order_at', 'member_id'),
+    )
+
+    member_id = db.Column(db.Integer, db.ForeignKey('members.id'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)  # 已完成订单数
+    last_order_at = db.Column(db.DateTime, nullable=True)  # 最近一次消费时间
+    # 近期消费：recent_since 至今的实付金额合计 (新订单实时累加，窗口起点由 flask recompute_member_stats 每日滚动)
+    recent_spent = db.Column(db.Numeric(14, 2), nullable=False, default=0.00)
+    recent_since = db.Column(db.Date, nullable=True)
+
+    def __repr__(self):
+        return f"<MemberStats #{self.member_id} {self.order_count}>"
+
+
+# --- 13. 会员 RFM 分群结果表 (flask segment_members 批量生成，只包含有消费记录的会员) ---
+class MemberSegment(db.Model):
+    __tablename__ = 'member_segments'
+    __table_args__ = (
+        # 看板按分群计数、按分群筛选会员
+        db.Index('ix_member_segments_segment', 'segment'),
+        # 看板以最近一次分群时间作为缓存键
+        db.Index('ix_member_segments_computed_at', 'computed_at'),
+    )
+
+    member_id = db.Column(db.Integer, db.ForeignKey('members.id'), primary_key=True)
+    recency_days = db.Column(db.Integer, nullable=False)  # R：距最近一次消费的天数
+    frequency = db.Column(db.Integer, nullable=False)  # F：已完成订单数
+    monetary = db.Column(db.Numeric(14, 2), nullable=False)  # M：实付金额合计
+    # 五分位得分 1~5，越大越好 (最近消费越近、次数越多、金额越高)
+    r_score = db.Column(db.SmallInteger, nullable=False)
+    f_score = db.Column(db.SmallInteger, nullable=False)
+    m_score = db.Column(db.SmallInteger, nullable=False)
+    segment = db.Column(db.String(30), nullable=False)  # 分群标识，见 app.services.segments.SEGMENTS
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<MemberSegment #{self.member_id} {self.segment}>"
+
+
+# --- 14. 缓存代数表 (数据变化时在同一事务内加一，各进程的内存缓存据此判断是否被其他进程修改) ---
+class CacheGeneration(db.Model):
+    __tablename__ = 'cache_generations'
+
+    name = db.Column(db.String(30), primary_key=True)  # 缓存名称，如 reports / catalog
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CacheGeneration {self.name}={self.value}>"
@@ -1,46 +1,140 @@
 # app/routes/member.py
 
-from flask import Blueprint, render_template, redirect, url_for, flash
+from datetime import datetime, timedelta
+
+from flask import Blueprint, render_template, redirect, url_for, flash, jsonify
 from flask_login import login_required
-from app.models import Member
+from app.models import Member, MemberStats
 from app.forms import MemberForm, MemberSearchForm
 from app.extensions import db
+from app.services.pagination import KeysetPagination
+from app.services.phone_index import matching_members
 from sqlalchemy.exc import IntegrityError  # 捕获唯一约束错误
+from sqlalchemy.orm import joinedload, contains_eager
 from flask import request
 
 member = Blueprint('member', __name__)
 
 
+# 会员列表排序方式：名称 -> (排序列, 是否倒序, items 上对应的属性名)。
+# 每种排序都有 (排序列, 会员 ID) 复合索引，键集分页任意一页只扫描 per_page + 1 行
+MEMBER_SORTS = {
+    'id': ([Member.id], False, None),
+    'total_spent': ([Member.total_spent, Member.id], True, None),
+    'recent_spent': ([MemberStats.recent_spent, MemberStats.member_id], True, ['recent_spent', 'id']),
+    'order_count': ([MemberStats.order_count, MemberStats.member_id], True, ['order_count', 'id']),
+    'last_order': ([MemberStats.last_order_at, MemberStats.member_id], True, ['last_order_at', 'id']),
+    'inactive': ([MemberStats.last_order_at, MemberStats.member_id], False, ['last_order_at', 'id']),
+}
+# 这些排序 / 筛选只涉及有消费记录的会员 (JOIN 消费统计表)
+STATS_SORTS = {'recent_spent', 'order_count', 'last_order', 'inactive'}
+
+
+def _not_an_integer(field):
+    """IntegerField 填了非整数 (留空不算)：此时 data 为 None，解析错误记录在 process_errors 中"""
+    return bool(field.process_errors and field.raw_data and field.raw_data[0].strip())
+
+
+def member_pagination(form, after, before, per_page=10):
+    """
+    按搜索表单 (手机号、排序、未消费天数、最少订单数) 构造会员键集分页。
+    返回 (分页对象, 分页链接需要保留的筛选参数)；参数非法时抛出 ValueError。
+    """
+    sort = form.sort.data or 'id'
+    if sort not in MEMBER_SORTS:
+        raise ValueError(f'不支持的排序方式: {sort}')
+    inactive_days = form.inactive_days.data
+    min_orders = form.min_orders.data
+    if _not_an_integer(form.inactive_days) or inactive_days is not None and not 1 <= inactive_days <= 3650:
+        raise ValueError('未消费天数取值 1~3650')
+    if _not_an_integer(form.min_orders) or min_orders is not None and min_orders < 1:
+        raise ValueError('最少订单数必须大于 0')
+
+    # 消费统计随会员一并 JOIN 取出，不逐行查询
+    if sort in STATS_SORTS or inactive_days or min_orders:
+        query = Member.query.join(Member.stats).options(contains_eager(Member.stats)) \
+            .filter(MemberStats.order_count > 0)
+    else:
+        query = Member.query.options(joinedload(Member.stats))
+
+    # 关键词搜索：手机号包含该关键词 (通过手机号后缀索引 JOIN，不扫描会员表)
+    search_term = form.search_term.data
+    if search_term:
+        matches = matching_members(search_term)
+        query = query.join(matches, matches.c.member_id == Member.id)
+    if inactive_days:
+        query = query.filter(MemberStats.last_order_at < datetime.now() - timedelta(days=inactive_days))
+    if min_orders:
+        query = query.filter(MemberStats.order_count >= min_orders)
+
+    filters = {key: value for key, value in (
+        ('search_term', search_term),
+        ('sort', sort if sort != 'id' else None),
+        ('inactive_days', inactive_days),
+        ('min_orders', min_orders),
+    ) if value}
+    columns, descending, keys = MEMBER_SORTS[sort]
+    pagination = KeysetPagination(query, columns, per_page=per_page, after=after, before=before,
+                                  count_key=('members', tuple(sorted(filters.items()))),
+                                  descending=descending, keys=keys)
+    return pagination, filters
+
+
 # --- 会员列表视图 (C.2 会员消费记录查询 - 聚合信息) ---
 @member.route('/list', methods=['GET'])  # 确保允许 GET 请求
 @login_required
 def list_members():
-    """显示所有会员列表，支持手机号搜索和分页"""
-    # 1. 初始化表单和分页参数
+    """显示所有会员列表，支持手机号搜索、按消费统计排序 / 筛选和分页"""
     form = MemberSearchForm(request.args)  # 从 URL 参数中加载搜索数据
-    page = request.args.get('page', 1, type=int)
-    per_page = 10  # 每页显示数量
-
-    # 默认查询：按累计消费金额升序排列
-    query = Member.query.order_by(Member.id.asc())
-
-    # 2. 应用搜索条件
-    search_term = form.search_term.data
-    if search_term:
-        # 关键词搜索：按手机号进行模糊查询
-        search_pattern = f'%{search_term}%'
-        query = query.filter(Member.phone_number.like(search_pattern))
+    try:
+        pagination, filters = member_pagination(form, request.args.get('after'), request.args.get('before'))
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('.list_members'))
 
-    # 3. 执行分页查询
-    pagination = db.paginate(query, page=page, per_page=per_page, error_out=False)
-    members = pagination.items
     return render_template('member/list.html',
                            title='会员列表',
-                           members=members,
+                           members=pagination.items,
                            form=form,  # 传递搜索表单
+                           filters=filters,
                            pagination=pagination)  # 传递分页对象
 
 
+# --- 会员列表 JSON 接口 (参数同列表页，供外呼 / 营销工具拉取名单) ---
+@member.route('/api/list', methods=['GET'])
+@login_required
+def list_members_api():
+    """?sort= & inactive_days= & min_orders= & search_term= & per_page= (1~100) & after= / before="""
+    form = MemberSearchForm(request.args)
+    per_page = request.args.get('per_page', 20, type=int)
+    if not 1 <= per_page <= 100:
+        return jsonify({'success': False, 'message': '参数错误：per_page 取值 1~100'}), 400
+    try:
+        pagination, filters = member_pagination(form, request.args.get('after'), request.args.get('before'),
+                                                per_page=per_page)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    return jsonify({
+        'success': True,
+        'total': pagination.total,
+        'next_cursor': pagination.next_cursor,
+        'prev_cursor': pagination.prev_cursor,
+        'members': [{
+            'id': m.id,
+            'name': m.name,
+            'phone_number': m.phone_number,
+            'discount_rate': float(m.discount_rate),
+            'total_spent': float(m.total_spent or 0),
+            'order_count': m.order_count,
+            'average_order_value': float(m.average_order_value),
+            'recent_spent': float(m.recent_spent),
+            'last_order_at': m.last_order_at.isoformat(' ', 'seconds') if m.last_order_at else None,
+            'registered_at': m.registered_at.isoformat(' ', 'seconds') if m.registered_at else None,
+        } for m in pagination.items],
+    })
+
+
 # --- 会员创建/编辑视图 (C.1 会员信息 CRUD) ---
 @member.route('/create', methods=['GET', 'POST'])
 @member.route('/edit/<int:member_id>', methods=['GET', 'POST'])
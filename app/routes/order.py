@@ -3,10 +3,20 @@ import decimal
 
 from flask import Blueprint, render_template, redirect, url_for, flash, jsonify, request
 from flask_login import login_required
-from app.models import Product, Member, Order, OrderItem
+from app.models import Member, Order, OrderItem, ImportedOrder
 from app.forms import OrderSearchForm
 from app.extensions import db
+from app.services.checkout import place_order, CheckoutError
+from app.services.order_import import parse_batch, import_orders
+from app.services.rollups import apply_order
+from app.services.member_stats import apply_member_orders
+from app.services.pagination import KeysetPagination
+from app.services.phone_index import matching_members
+from app.services.catalog import search_products, search_members, typeahead_args, conditional_json
+from app.services.api_auth import token_or_login_required
+from sqlalchemy import delete
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
 from datetime import datetime, date, timedelta
 
 order = Blueprint('order', __name__)
@@ -17,27 +27,27 @@ order = Blueprint('order', __name__)
 @login_required
 def create_order():
     """销售开单页面 (主要依赖前端 AJAX)"""
-    # 预加载所有商品信息供前端使用
-    products = Product.query.filter(Product.stock_quantity > 0).all()
+    # 商品和会员改由前端通过联想搜索接口按需分页加载，页面大小与商品 / 会员数量无关
+    return render_template('order/create.html', title='销售开单')
 
-    # 转换为字典列表，只传递必要信息，避免暴露 cost_price 给前端 (安全优化)
-    products_data = [
-        {
-            'id': p.id,
-            'name': p.name,
-            'unit': p.unit,
-            'retail_price': float(p.retail_price),
-            'stock': p.stock_quantity
-        } for p in products
-    ]
 
-    # 获取所有会员信息（用于前端搜索）
-    members = Member.query.all()
+# --- 1.1 AJAX 接口：商品 / 会员联想搜索 (D.1 辅助) ---
+@order.route('/api/products', methods=['GET'])
+@login_required
+def product_search():
+    """按名称前缀或 ID 搜索有库存商品：?q=&limit=&after=，支持 ETag 条件请求"""
+    term, limit, after = typeahead_args()
+    items, next_cursor = search_products(term, limit=limit, after=after)
+    return conditional_json({'success': True, 'items': items, 'next_cursor': next_cursor})
+
 
-    return render_template('order/create.html',
-                           title='销售开单',
-                           products_data=products_data,
-                           members=members)
+@order.route('/api/members', methods=['GET'])
+@login_required
+def member_search():
+    """按手机号前缀或姓名前缀搜索会员：?q=&limit=&after=，支持 ETag 条件请求"""
+    term, limit, after = typeahead_args()
+    items, next_cursor = search_members(term, limit=limit, after=after)
+    return conditional_json({'success': True, 'items': items, 'next_cursor': next_cursor})
 
 
 # --- 2. AJAX 接口：查找会员 (D.1 辅助) ---
@@ -64,62 +74,33 @@ def submit_order():
     data = request.get_json()
     items = data.get('items')
     member_id = data.get('member_id')
-    final_amount = data.get('final_amount')
 
     if not items:
         return jsonify({'success': False, 'message': '订单不能为空！'}), 400
 
+    # 收银页提交的会员 ID 为字符串 (隐藏输入框的值)，统一转换为整数后再计价、写订单和会员统计
     try:
-        # 1. 创建订单头
-        order_obj = Order(
-            member_id=member_id if member_id else None,
-            original_amount=data['original_amount'],
-            discount_amount=data['discount_amount'],
-            final_amount=final_amount,
-            status='Completed'
-        )
-        db.session.add(order_obj)
-        db.session.flush()  # 立即获取 order_obj.id
-
-        # 2. 批量处理订单详情和库存扣减 (事务关键)
-        for item_data in items:
-            product_id = item_data['product_id']
-            quantity = item_data['quantity']
-
-            product = db.session.get(Product, product_id)
-            if not product or product.stock_quantity < quantity:
-                # 检查库存
-                db.session.rollback()
-                return jsonify({'success': False,
-                                'message': f'商品 "{product.name}" 库存不足 ({quantity} > {product.stock_quantity})'}), 400
-
-            # 扣减库存
-            product.stock_quantity -= quantity
-
-            # 查找销售时点的成本价
-            cost_at_sale = product.cost_price
-
-            # 创建订单详情项
-            order_item = OrderItem(
-                order_id=order_obj.id,
-                product_id=product_id,
-                quantity=quantity,
-                price_at_sale=item_data['price'],
-                cost_at_sale=cost_at_sale,
-                line_subtotal=item_data['subtotal']
-            )
-            db.session.add(order_item)
-
-        # 3. 更新会员累计消费 (D.2 辅助)
-        if member_id:
-            member_obj = db.session.get(Member, member_id)
-            if member_obj:
-                member_obj.total_spent += decimal.Decimal(final_amount)
-                db.session.add(member_obj)
+        member_id = int(member_id) if member_id not in (None, '') else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': f'会员 ID {member_id} 格式错误'}), 400
+
+    try:
+        # 1~2. 批量结算：一次加锁读取商品、服务端计价、单条 UPDATE 扣减库存、批量写入订单详情 (事务关键)
+        #      前端提交的 price / subtotal / 各项金额仅用于展示，以服务端计算结果为准
+        order_obj, order_quote = place_order(items, member_id=member_id)
+
+        # 3. 更新会员累计消费与消费统计 (D.2 辅助，SQL 端原子累加)
+        apply_member_orders([(order_obj.id, order_obj.member_id, order_obj.order_date, order_quote.final_amount)])
 
         # 4. 提交所有更改
         db.session.commit()
-        return jsonify({'success': True, 'message': '订单创建成功', 'order_id': order_obj.id})
+        return jsonify({'success': True, 'message': '订单创建成功', 'order_id': order_obj.id,
+                        **order_quote.to_dict()})
+
+    except CheckoutError as e:
+        # 库存不足 / 商品不存在：整单回滚
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
 
     except Exception as e:
         db.session.rollback()
@@ -128,6 +109,37 @@ def submit_order():
         return jsonify({'success': False, 'message': f'订单处理失败，请检查数据。错误: {str(e)}'}), 500
 
 
+# --- 3.1 批量导入订单 (离线收银台补传) ---
+@order.route('/api/import_orders', methods=['POST'])
+@token_or_login_required('IMPORT_API_TOKEN')
+def import_orders_api():
+    """
+    接收 NDJSON (每行一个订单) 或 CSV (每行一个订单商品) 批次：请求体直接上传，或以表单文件字段 file 上传。
+    格式由 ?format=ndjson|csv 指定，缺省时根据文件名 / Content-Type 判断。按订单 UUID 幂等。
+    收银台脚本携带 Authorization: Bearer <IMPORT_API_TOKEN> 调用，无需登录会话。
+    """
+    upload = request.files.get('file')
+    file_format = request.args.get('format')
+    if not file_format:
+        name = upload.filename if upload else ''
+        content_type = upload.mimetype if upload else request.mimetype
+        file_format = 'csv' if name.endswith('.csv') or content_type == 'text/csv' else 'ndjson'
+
+    try:
+        records = parse_batch(upload.stream if upload else request.stream, file_format)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'success': False, 'message': f'无法解析导入文件: {e}'}), 400
+
+    try:
+        report = import_orders(records)
+    except Exception as e:
+        db.session.rollback()
+        print(f"批量导入订单失败: {e}")
+        return jsonify({'success': False, 'message': f'批量导入失败: {str(e)}'}), 500
+
+    return jsonify({'message': f'已导入 {len(report.imported)} 个订单', **report.to_dict()})
+
+
 # --- 4. 订单列表查询 (D.4) ---
 @order.route('/list', methods=['GET', 'POST'])
 @login_required
@@ -140,49 +152,29 @@ def list_orders():
         # 从 URL 参数中加载数据，这样分页链接才能保留筛选条件
         form = OrderSearchForm(request.args)
 
-    # 获取当前页码和每页数量
-    page = request.args.get('page', 1, type=int)
+    # 键集分页游标和每页数量
+    after = request.args.get('after')
+    before = request.args.get('before')
     per_page = 10  # 每页显示 10 个订单
 
-    # 默认查询
-    query = Order.query.order_by(Order.id.asc())
+    # 默认查询 (排序由分页按 (order_date, id) 决定)，会员随订单一起 JOIN 加载，避免模板逐行查询
+    query = Order.query.options(joinedload(Order.member))
 
     # --- 应用筛选逻辑 ---
     # 我们使用 form.data 来获取数据，并总是应用筛选逻辑，
     # 这样GET请求（分页链接）也能保留筛选状态。
     if form.order_id.data:
-        target_index = int(form.order_id.data)
-        if target_index >= 1:
-            # 1. 使用 original_query 来查找目标记录
-            target_order = query.offset(target_index - 1).limit(1).first()
-
-            if target_order:
-                # 2. 将 query 变量（用于分页）替换为一个新的、精确的查询对象
-                query = Order.query.filter(Order.id == target_order.id)
-            else:
-                # 3. 如果没找到，替换为一个空查询
-                query = Order.query.filter(Order.id == -1)
-        else:
-            # 3. 如果没找到，替换为一个空查询
-            query = Order.query.filter(Order.id == -1)
+        # 订单号即订单主键，直接按主键定位 (与详情页、导出一致)
+        try:
+            query = query.filter(Order.id == int(form.order_id.data))
+        except ValueError:
+            # 非法订单号，返回空结果
+            query = query.filter(Order.id == -1)
 
     if form.member_phone.data:
-        # 联合查询会员手机号
-        phone_search_term = form.member_phone.data
-        search_pattern = f'%{phone_search_term}%'
-        # 1. 找到所有匹配模糊手机号的会员ID
-        #    使用 .filter(Member.phone_number.like(...))
-        # 获取所有匹配的 ID 列表
-        matching_member_ids = db.session.query(Member.id).filter(Member.phone_number.like(search_pattern)).all()
-        # 提取 ID 列表 (例如：[1, 5, 12])
-        member_id_list = [mid[0] for mid in matching_member_ids]
-        # 2. 应用到订单查询
-        if member_id_list:
-            # 如果找到匹配的会员，查询这些会员的所有订单
-            query = query.filter(Order.member_id.in_(member_id_list))
-        else:
-            # 如果没有找到任何匹配的会员，则返回空结果集
-            query = query.filter(Order.member_id == -1)
+        # 联合查询会员手机号：与手机号后缀索引匹配出的会员 JOIN，不再拼接 IN (...) 列表
+        matches = matching_members(form.member_phone.data)
+        query = query.join(matches, matches.c.member_id == Order.member_id)
 
     # 日期筛选逻辑
     start_dt = None
@@ -212,8 +204,16 @@ def list_orders():
             if request.method == 'POST':
                 flash("结束日期格式错误，请使用 YYYY-MM-DD。", 'danger')
 
-    # 4. 执行分页查询 (替换 query.all())
-    pagination = db.paginate(query, page=page, per_page=per_page, error_out=False)
+    # 4. 执行键集分页查询：任意一页耗时相同，总数按筛选条件缓存
+    filters = {key: value for key, value in (
+        ('order_id', form.order_id.data),
+        ('member_phone', form.member_phone.data),
+        ('start_date', start_date_str),
+        ('end_date', end_date_str),
+    ) if value}
+    pagination = KeysetPagination(query, [Order.order_date, Order.id], per_page=per_page,
+                                  after=after, before=before,
+                                  count_key=('orders', tuple(sorted(filters.items()))))
 
     orders = pagination.items
 
@@ -221,6 +221,7 @@ def list_orders():
                            title='订单记录',
                            orders=orders,
                            form=form,
+                           filters=filters,  # 分页链接需要保留的筛选参数
                            pagination=pagination)  # 传递分页对象
 
 
@@ -228,13 +229,17 @@ def list_orders():
 @order.route('/detail/<int:order_id>')
 @login_required
 def order_detail(order_id):
-    order_obj = db.session.get(Order, order_id)
+    # 订单 + 会员一次 JOIN，订单详情 + 商品一次 IN 查询
+    order_obj = db.session.get(Order, order_id, options=[
+        joinedload(Order.member),
+        selectinload(Order.items).joinedload(OrderItem.product)
+    ])
     if order_obj is None:
         flash('订单不存在。', 'danger')
         return redirect(url_for('.list_orders'))
 
     # 关联查询订单详情
-    items = order_obj.items.all()
+    items = order_obj.items
 
     # 计算毛利润 (用于内部详情查看，不暴露给顾客)
     total_cost = sum(float(item.cost_at_sale) * item.quantity for item in items)
@@ -250,7 +255,9 @@ def order_detail(order_id):
 @order.route('/delete/<int:order_id>', methods=['POST'])
 @login_required
 def delete_order(order_id):
-    order_obj = db.session.get(Order, order_id)
+    order_obj = db.session.get(Order, order_id, options=[
+        selectinload(Order.items).joinedload(OrderItem.product)
+    ])
     if order_obj is None:
         flash('订单不存在。', 'danger')
         return redirect(url_for('.list_orders'))
@@ -259,15 +266,27 @@ def delete_order(order_id):
     try:
         if order_obj.status == 'Completed':
             # 1. 回滚库存
+            lines = []
             for item in order_obj.items:
                 product = item.product
                 product.stock_quantity += item.quantity
-
-            # 2. 回滚会员消费
-            if order_obj.member:
-                order_obj.member.total_spent -= order_obj.final_amount
-
-            # 3. 彻底删除订单 (CASCADE 自动删除 OrderItems)
+                lines.append({
+                    'product_id': item.product_id,
+                    'quantity': item.quantity,
+                    'price_at_sale': item.price_at_sale,
+                    'cost_at_sale': item.cost_at_sale,
+                    'line_subtotal': item.line_subtotal,
+                })
+
+            # 2. 回滚会员消费与消费统计
+            apply_member_orders([(order_obj.id, order_obj.member_id, order_obj.order_date, order_obj.final_amount)],
+                                sign=-1)
+
+            # 2.1 同一事务内扣减报表汇总
+            apply_order(order_obj.order_date, order_obj.final_amount, lines, sign=-1)
+
+            # 3. 彻底删除订单 (CASCADE 自动删除 OrderItems)；批量导入的订单先删除其幂等记录 (外键指向订单)
+            db.session.execute(delete(ImportedOrder).where(ImportedOrder.order_id == order_obj.id))
             db.session.delete(order_obj)
             db.session.commit()
             flash(f'订单 #{order_id} 已成功删除并回滚库存。', 'success')
@@ -1,10 +1,15 @@
 # app/routes/product.py
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required
 from app.models import Product, Category
 from app.forms import ProductForm, CategoryForm,ProductSearchForm
 from app.extensions import db
+from app.services.pagination import KeysetPagination, RankedPagination
+from app.services.product_search import product_index
+from app.services.pricing import catalog_cache, discount_cache
+from app.services.product_import import parse_products, import_products
+from app.services.api_auth import token_or_login_required
 from wtforms_sqlalchemy.fields import QuerySelectField  # 用于动态选择分类
 
 # 创建蓝图
@@ -24,21 +29,25 @@ def list_products():
 
     # 1. 初始化表单和分页参数
     form = ProductSearchForm(request.args)  # 从 URL 参数中加载搜索数据
-    page = request.args.get('page', 1, type=int)
+    after = request.args.get('after')
+    before = request.args.get('before')
     per_page = 10 # 每页显示数量，默认为 10
 
-    query = Product.query.order_by(Product.id.asc())
-
     # 2. 应用搜索条件
     search_term = form.search_term.data
+    filters = {'search_term': search_term} if search_term else {}
     if search_term:
-        # 关键词搜索：搜索名称包含关键词 或 ID 匹配关键词
-        search_pattern = f'%{search_term}%'
-        query = query.filter(Product.name.like(search_pattern))
+        # 关键词搜索：商品搜索引擎 (名称子串 / 拼音首字母) 返回按相关度排序的 ID，只加载当前页的商品
+        def search(limit):
+            result = product_index.search(search_term, limit=limit)
+            return result.ids, result.total
 
-    # 3. 执行分页查询
-    # 使用 paginate 方法
-    pagination = db.paginate(query, page=page, per_page=per_page, error_out=False)
+        pagination = RankedPagination(search, lambda ids: Product.query.filter(Product.id.in_(ids)).all(),
+                                      per_page=per_page, after=after, before=before)
+    else:
+        # 3. 执行键集分页查询 (按 id 定位，不使用 OFFSET)
+        pagination = KeysetPagination(Product.query, [Product.id], per_page=per_page, after=after, before=before,
+                                      count_key=('products', search_term))
 
     products = pagination.items
 
@@ -46,6 +55,7 @@ def list_products():
                            title='商品列表',
                            products=products,
                            form=form,  # 传递搜索表单
+                           filters=filters,
                            pagination=pagination)  # 传递分页对象
 
 
@@ -122,6 +132,62 @@ def delete_product(product_id):
     return redirect(url_for('.list_products'))
 
 
+# --- 商品批量导入 / 更新 (CSV 或 JSON) ---
+def _import_format(upload):
+    """?format=csv|json 指定格式，缺省时根据文件名 / Content-Type 判断"""
+    file_format = request.args.get('format') or request.form.get('format')
+    if file_format:
+        return file_format
+    name = upload.filename if upload else ''
+    content_type = upload.mimetype if upload else request.mimetype
+    return 'json' if name.endswith('.json') or content_type == 'application/json' else 'csv'
+
+
+@product.route('/api/bulk_upsert', methods=['POST'])
+@token_or_login_required('IMPORT_API_TOKEN')
+def bulk_upsert():
+    """
+    按商品名称批量新增或更新商品：请求体直接上传，或以表单文件字段 file 上传。
+    已有商品覆盖文件中给出的分类 / 价格 / 单位，库存按 stock_delta 累加；逐行返回错误。
+    """
+    upload = request.files.get('file')
+    try:
+        rows = parse_products(upload.stream if upload else request.stream, _import_format(upload))
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'success': False, 'message': f'无法解析导入文件: {e}'}), 400
+
+    try:
+        report = import_products(rows)
+    except Exception as e:
+        print(f"商品批量导入失败: {e}")
+        return jsonify({'success': False, 'message': f'批量导入失败: {str(e)}'}), 500
+
+    return jsonify({'message': f'新增 {report.inserted} 个商品，更新 {report.updated} 个商品', **report.to_dict()})
+
+
+@product.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_products_page():
+    """上传 CSV / JSON 文件批量导入商品，页面上列出被拒绝的行"""
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('请选择要导入的文件。', 'warning')
+            return redirect(url_for('.import_products_page'))
+        try:
+            report = import_products(parse_products(upload.stream, _import_format(upload)))
+        except (ValueError, UnicodeDecodeError) as e:
+            flash(f'无法解析导入文件: {e}', 'danger')
+            return redirect(url_for('.import_products_page'))
+        except Exception as e:
+            flash(f'批量导入失败: {e}', 'danger')
+            return redirect(url_for('.import_products_page'))
+        flash(f'新增 {report.inserted} 个商品，更新 {report.updated} 个商品。',
+              'warning' if report.errors else 'success')
+
+    return render_template('product/import.html', title='批量导入商品', report=report)
+
 
 # --- 分类管理视图 ---
 @product.route('/categories', methods=['GET', 'POST'])
@@ -163,4 +229,12 @@ def delete_category(category_id):
                 db.session.rollback()
                 flash(f'删除失败: {e}', 'danger')
 
-    return redirect(url_for('.manage_categories'))
\ No newline at end of file
+    return redirect(url_for('.manage_categories'))
+
+
+# --- 商品目录缓存统计 ---
+@product.route('/api/cache_stats', methods=['GET'])
+@login_required
+def cache_stats():
+    """进程内商品目录 / 会员折扣缓存的条目数与命中统计"""
+    return jsonify({'success': True, 'catalog': catalog_cache.stats(), 'discount': discount_cache.stats()})
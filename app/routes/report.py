@@ -1,77 +1,60 @@
-import os
-import csv
-from io import StringIO
 from urllib.parse import quote
 from flask import Blueprint, render_template, jsonify, request, flash, Response, stream_with_context, redirect, url_for
 from flask_login import login_required
 # 确保导入了所有模型，包括 Member
-from app.models import Order, OrderItem, Product, Member
+from app.models import Order, OrderItem, Product, Member, DailySales, ProductDailySales
 from app.extensions import db
 from datetime import datetime, timedelta
-from sqlalchemy import func, extract, cast
-from sqlalchemy.types import Date
-# 引入 DeepSeek 兼容的客户端
-from openai import OpenAI
+from sqlalchemy import func, extract, cast, select, case
+from sqlalchemy.types import Numeric
+from app.services.phone_index import matching_members
+from app.services.db_routing import read_replica, primary_reads
+from app.services.report_cache import cached_report, cached_value
+from app.services.concurrent_queries import run_concurrently
+from app.services.segments import segment_counts, segments_computed_at
+from app.services.exporters import EXPORT_FORMATS, ExportError, stream_csv, stream_columnar
+# DeepSeek 分析在后台任务中执行，结果按输入指标指纹缓存
+from app.services.ai_analysis import request_analysis, get_analysis
 # 假设 OrderSearchForm 存在于 app.forms 中
 from app.forms import OrderSearchForm
 
 report = Blueprint('report', __name__)
 
-# --- DeepSeek 客户端初始化 ---
-# 注意：确保您在运行环境中设置了 DEEPSEEK_API_KEY 环境变量
-client = OpenAI(
-    api_key=os.environ.get('DEEPSEEK_API_KEY'),
-    base_url="https://api.deepseek.com"
-)
 
 
-# --- 1. 数据看板主页 (E.1, E.2) ---
-@report.route('/dashboard')
-@login_required
-def dashboard():
-    """数据看板主页，加载可视化图表"""
-
-    # 简单的总览数据 (可直接查询并传递给模板)
-    total_sales = db.session.query(func.sum(Order.final_amount)).scalar() or 0
-    completed_orders = db.session.query(func.count(Order.id)).filter_by(status='Completed').scalar() or 0
+# --- 0. 看板指标查询：均读取汇总表、互不依赖，由 run_concurrently 并发执行 ---
+def sales_totals():
+    """累计销售额、已完成订单数和今日销售额 (同一次汇总表扫描)"""
+    today_revenue = case((DailySales.sale_date == datetime.now().date(), DailySales.revenue), else_=0)
+    total_sales, completed_orders, today_sales = db.session.query(
+        func.sum(DailySales.revenue), func.sum(DailySales.order_count), func.sum(today_revenue)
+    ).one()
+    return float(total_sales or 0), int(completed_orders or 0), float(today_sales or 0)
 
-    # 获取今天零点
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_sales = db.session.query(func.sum(Order.final_amount)).filter(Order.order_date >= today).scalar() or 0
 
-    context = {
-        'title': '数据看板',
-        'total_sales': f"{total_sales:,.2f}",
-        'completed_orders': completed_orders,
-        'today_sales': f"{today_sales:,.2f}"
-    }
-    return render_template('report/dashboard.html', **context)
+def revenue_since(since):
+    return float(db.session.query(
+        func.sum(DailySales.revenue)
+    ).filter(
+        DailySales.sale_date >= since
+    ).scalar() or 0)
 
 
-# --- 2. API 接口：销售趋势数据 (E.1 可视化数据) ---
-@report.route('/api/sales_trend', methods=['GET'])
-@login_required
-def sales_trend():
-    """提供近30天销售额趋势数据"""
+def trend_series():
+    """近30天每天的销售额，(日期列表, 金额列表)"""
 
     # 计算30天前的日期
     thirty_days_ago = datetime.now() - timedelta(days=30)
 
-    # SQL 查询：按日期聚合销售总额
+    # 直接读取每日销售汇总表 (最多 31 行)
     sales_data = db.session.query(
-        cast(Order.order_date, Date).label('date'),
-        func.sum(Order.final_amount).label('total_amount')
+        DailySales.sale_date, DailySales.revenue
     ).filter(
-        Order.status == 'Completed',
-        Order.order_date >= thirty_days_ago
-    ).group_by(
-        'date'
-    ).order_by(
-        'date'
+        DailySales.sale_date >= thirty_days_ago.date()
     ).all()
 
     # 填充数据，确保连续30天都有数据点（即使为0）
-    date_map = {str(row.date): float(row.total_amount) for row in sales_data}
+    date_map = {str(row.sale_date): float(row.revenue) for row in sales_data}
 
     dates = []
     amounts = []
@@ -82,7 +65,108 @@ def sales_trend():
         dates.append(date_str)
         amounts.append(date_map.get(date_str, 0.00))
         current_date += timedelta(days=1)
+    return dates, amounts
+
+
+def top_products(metric, since, limit):
+    """从商品每日销售汇总表中取 since 日期以来 metric 列合计最高的 limit 个商品"""
+    total = func.sum(metric).label('total')
+    return db.session.query(
+        Product.name.label('product_name'),
+        total
+    ).join(
+        Product, Product.id == ProductDailySales.product_id
+    ).filter(
+        ProductDailySales.sale_date >= since
+    ).group_by(
+        ProductDailySales.product_id, Product.name
+    ).order_by(
+        total.desc()
+    ).limit(limit).all()
+
+
+def ranking(metric, since, limit):
+    return [{'name': row.product_name, 'value': float(row.total)} for row in top_products(metric, since, limit)]
+
+
+def ranking_args():
+    """解析 ?days= (默认 90) 和 ?limit= (默认 10)，参数错误时返回 (None, None)"""
+    days = request.args.get('days', 90, type=int)
+    limit = request.args.get('limit', 10, type=int)
+    if not 1 <= days <= 3660 or not 1 <= limit <= 100:
+        return None, None
+    return days, limit
+
+
+RANKING_ARGS_ERROR = '参数错误：days 取值 1~3660，limit 取值 1~100'
+
+
+# --- 1. 数据看板主页 (E.1, E.2) ---
+@report.route('/dashboard')
+@login_required
+@read_replica
+def dashboard():
+    """数据看板主页，加载可视化图表"""
+
+    # 简单的总览数据：读取每日销售汇总表，耗时与历史订单量无关；订单未变化时直接使用缓存
+    total_sales, completed_orders, today_sales = cached_value('dashboard_overview', sales_totals)
+    # 会员 RFM 分群人数 (由 flask segment_members 批量生成)
+    segments = cached_value('member_segments', segment_counts, segments_computed_at())
+
+    context = {
+        'title': '数据看板',
+        'total_sales': f"{total_sales:,.2f}",
+        'completed_orders': completed_orders,
+        'today_sales': f"{today_sales:,.2f}",
+        'segments': segments
+    }
+    return render_template('report/dashboard.html', **context)
+
+
+# --- 1.1 API 接口：看板全部指标 (一次请求，查询并发执行，耗时约等于最慢的一条查询) ---
+@report.route('/api/overview', methods=['GET'])
+@login_required
+@cached_report('overview')
+@read_replica
+def overview():
+    """总览数字、近30天趋势和销量 / 利润排行，排行参数同 /api/product_ranking"""
+
+    days, limit = ranking_args()
+    if days is None:
+        return jsonify({'success': False, 'message': RANKING_ARGS_ERROR}), 400
+    since = (datetime.now() - timedelta(days=days)).date()
+
+    results = run_concurrently({
+        'totals': sales_totals,
+        'trend': trend_series,
+        'quantity_rank': lambda: ranking(ProductDailySales.quantity, since, limit),
+        'profit_rank': lambda: ranking(ProductDailySales.gross_profit, since, limit),
+    })
+    total_sales, completed_orders, today_sales = results['totals']
+    dates, amounts = results['trend']
+
+    return jsonify({
+        'success': True,
+        'total_sales': total_sales,
+        'completed_orders': completed_orders,
+        'today_sales': today_sales,
+        'dates': dates,
+        'amounts': amounts,
+        'days': days,
+        'quantity_rank': results['quantity_rank'],
+        'profit_rank': results['profit_rank']
+    })
+
+
+# --- 2. API 接口：销售趋势数据 (E.1 可视化数据) ---
+@report.route('/api/sales_trend', methods=['GET'])
+@login_required
+@cached_report('sales_trend')
+@read_replica
+def sales_trend():
+    """提供近30天销售额趋势数据"""
 
+    dates, amounts = trend_series()
     return jsonify({
         'success': True,
         'dates': dates,
@@ -93,259 +177,226 @@ def sales_trend():
 # --- 3. API 接口：商品利润/销量排行 (E.2, E.3 可视化数据) ---
 @report.route('/api/product_ranking', methods=['GET'])
 @login_required
+@cached_report('product_ranking')
+@read_replica
 def product_ranking():
-    """提供销量和利润排行的聚合数据"""
+    """提供销量和利润排行的聚合数据，支持 ?days=7/30/90/365 (默认 90) 和 ?limit= (默认 10)"""
 
-    # 默认查看最近90天数据
-    ninety_days_ago = datetime.now() - timedelta(days=90)
-
-    # 聚合订单详情 (OrderItem)
-    ranking_data = db.session.query(
-        Product.name.label('product_name'),
-        func.sum(OrderItem.quantity).label('total_quantity'),
-        # 计算毛利润: (销售单价 - 成本单价) * 数量
-        func.sum((OrderItem.price_at_sale - OrderItem.cost_at_sale) * OrderItem.quantity).label('gross_profit')
-    ).join(
-        Product, Product.id == OrderItem.product_id
-    ).join(
-        Order, Order.id == OrderItem.order_id
-    ).filter(
-        Order.status == 'Completed',
-        Order.order_date >= ninety_days_ago
-    ).group_by(
-        Product.name
-    ).all()
+    days, limit = ranking_args()
+    if days is None:
+        return jsonify({'success': False, 'message': RANKING_ARGS_ERROR}), 400
 
-    # 分离数据，并按需排序
-    quantity_rank = sorted([
-        {'name': row.product_name, 'value': float(row.total_quantity)}
-        for row in ranking_data
-    ], key=lambda x: x['value'], reverse=True)[:10]  # Top 10 销量
+    since = (datetime.now() - timedelta(days=days)).date()
 
-    profit_rank = sorted([
-        {'name': row.product_name, 'value': float(row.gross_profit)}
-        for row in ranking_data
-    ], key=lambda x: x['value'], reverse=True)[:10]  # Top 10 利润
+    # 排序和截取都在 SQL 中完成，两个排行并发查询
+    results = run_concurrently({
+        'quantity_rank': lambda: ranking(ProductDailySales.quantity, since, limit),
+        'profit_rank': lambda: ranking(ProductDailySales.gross_profit, since, limit),
+    })
 
     return jsonify({
         'success': True,
-        'quantity_rank': quantity_rank,
-        'profit_rank': profit_rank
+        'days': days,
+        'quantity_rank': results['quantity_rank'],
+        'profit_rank': results['profit_rank']
     })
 
 
 # --- 4. API 接口：AI 销售数据分析 ---
 @report.route('/api/sales_summary_ai', methods=['GET'])
 @login_required
+@read_replica
 def sales_summary_ai():
     """获取AI对销售数据的评价和建议"""
 
-    # 1. 获取核心数据
-    total_sales = db.session.query(func.sum(Order.final_amount)).scalar() or 0
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_sales = db.session.query(func.sum(Order.final_amount)).filter(
-        Order.order_date >= today
-    ).scalar() or 0
-
+    # 1. 获取核心数据 (读取每日销售汇总表，三条查询并发执行)
     thirty_days_ago = datetime.now() - timedelta(days=30)
-    total_sales_30 = db.session.query(
-        func.sum(Order.final_amount)
-    ).filter(
-        Order.status == 'Completed',
-        Order.order_date >= thirty_days_ago
-    ).scalar() or 0
+    results = run_concurrently({
+        'totals': sales_totals,
+        'total_30': lambda: revenue_since(thirty_days_ago.date()),
+        # 获取Top 3 商品名称和销量
+        'top_3': lambda: top_products(ProductDailySales.quantity, thirty_days_ago.date(), 3),
+    })
+    total_sales_30 = results['total_30']
 
     num_days = (datetime.now() - thirty_days_ago).days
     avg_daily_sales_30 = total_sales_30 / num_days if num_days > 0 else 0
 
-    # 获取Top 3 商品名称和销量
-    ranking_data = db.session.query(
-        Product.name.label('product_name'),
-        func.sum(OrderItem.quantity).label('total_quantity')
-    ).join(
-        Product, Product.id == OrderItem.product_id
-    ).join(
-        Order, Order.id == OrderItem.order_id
-    ).filter(
-        Order.status == 'Completed',
-        Order.order_date >= thirty_days_ago
-    ).group_by(
-        Product.name
-    ).order_by(
-        func.sum(OrderItem.quantity).desc()
-    ).limit(3).all()
-
-    top_products_str = ", ".join([f"{row.product_name} ({int(row.total_quantity)}件)" for row in ranking_data])
-
-    # 2. 构建 Prompt
-    prompt_template = """
-    请你作为一名零售行业分析师，根据以下销售数据，对业务表现进行评价，并提出 actionable 的运营建议。
-
-    **数据总览 (基于已完成订单):**
-    - 累计总销售额: ¥{total_sales:,.2f}
-    - 今日销售额: ¥{today_sales:,.2f}
-    - 近30天总销售额: ¥{total_sales_30:,.2f}
-    - 近30天平均日销售额: ¥{avg_daily_sales_30:,.2f}
-    - 近30天畅销商品 Top 3: {top_products}
-
-    **分析要求:**
-    1. **评价**: 总结当前业务亮点和潜在风险。
-    2. **建议**: 针对 Top 畅销品和销售趋势，给出具体的促销或库存管理建议。
-    3. **格式**: 以纯中文文本形式清晰返回，不要包含任何前言和后记，不要用markdowm格式。
-    """
-
-    prompt = prompt_template.format(
-        total_sales=total_sales,
-        today_sales=today_sales,
-        total_sales_30=total_sales_30,
-        avg_daily_sales_30=avg_daily_sales_30,
-        top_products=top_products_str
-    )
+    top_products_str = ", ".join([f"{row.product_name} ({int(row.total)}件)" for row in results['top_3']])
 
-    # 3. 调用 DeepSeek API
-    try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system",
-                 "content": "You are a professional retail data analyst. Analyze the data and provide concise, actionable feedback in Chinese Markdown format."},
-                {"role": "user", "content": prompt},
-            ],
-            stream=False
-        )
-        ai_analysis_result = response.choices[0].message.content
-
-    except Exception as e:
-        ai_analysis_result = f"AI 分析服务调用失败，请检查 DEEPSEEK_API_KEY 配置和网络连接。错误详情: {e}"
-        print(f"DeepSeek API Error: {e}")
-
-        # 4. 返回结果
-    return jsonify({
-        'success': True,
-        'analysis': ai_analysis_result
-    })
+    metrics = {
+        'total_sales': results['totals'][0],
+        'today_sales': results['totals'][2],
+        'total_sales_30': total_sales_30,
+        'avg_daily_sales_30': avg_daily_sales_30,
+        'top_products': top_products_str,
+    }
+
+    # 2. 查找相同指标的已有分析；没有则提交后台任务，立即返回任务 ID 供前端轮询 (任务状态读写都在主库)
+    with primary_reads():
+        return analysis_response(request_analysis(metrics))
+
+
+def analysis_response(record):
+    """把 AiAnalysis 记录转换为 JSON 响应：生成中返回 202 和轮询地址"""
+    payload = {
+        'success': record.status != 'failed',
+        'status': record.status,
+        'job_id': record.fingerprint,
+        'analysis': record.analysis,
+    }
+    if record.status == 'pending':
+        payload['poll_url'] = url_for('.sales_summary_ai_job', job_id=record.fingerprint)
+        return jsonify(payload), 202
+    return jsonify(payload)
+
+
+@report.route('/api/sales_summary_ai/<string:job_id>', methods=['GET'])
+@login_required
+def sales_summary_ai_job(job_id):
+    """轮询 AI 分析任务状态"""
+    record = get_analysis(job_id)
+    if record is None:
+        return jsonify({'success': False, 'status': 'unknown', 'analysis': '分析任务不存在'}), 404
+    return analysis_response(record)
 
 
 # --- 5. 数据导出功能 (E.4) ---
-# 辅助函数：生成 CSV 数据流 (这里假设已包含您最新的修复，能正确导出商品数据)
-def generate_csv(query, headers, field_names, data_type):
-    data_stream = StringIO()
-    writer = csv.writer(data_stream)
-
-    # 写入 CSV 文件头
-    writer.writerow(headers)
-    yield data_stream.getvalue()
-    data_stream.seek(0)
-    data_stream.truncate(0)
-
-    # 写入数据行
-    for item in query.all():
-        row = []
-        if data_type == 'products':
-            for field in field_names:
-                value = getattr(item, field, '')
-
-                if isinstance(value, (float)):
-                    row.append(f'{value:.2f}')
-                elif isinstance(value, int):
-                    row.append(str(value))
-                elif isinstance(value, datetime):
-                    row.append(value.strftime('%Y-%m-%d %H:%M:%S'))
-                else:
-                    row.append(str(value))
-
-        elif data_type == 'sales':
-            # 处理销售数据行
-            member_name = item.member.name if item.member else '非会员'
-            member_phone = item.member.phone_number if item.member else ''
-
-            row = [
-                item.id,
-                item.order_date.strftime('%Y-%m-%d %H:%M:%S'),
-                member_name,
-                member_phone,
-                f'{item.original_amount:.2f}',
-                f'{item.discount_amount:.2f}',
-                f'{item.final_amount:.2f}',
-                item.status
-            ]
-
-        writer.writerow(row)
-        yield data_stream.getvalue()
-        data_stream.seek(0)
-        data_stream.truncate(0)
+# 行格式化函数 (仅 CSV 使用)：金额列均为 Numeric(10, 2)，读出的 Decimal 已固定两位小数，直接交给 csv 模块转字符串
+def format_plain_row(row):
+    return row
+
+
+def format_sales_row(row):
+    return (
+        row.id,
+        row.order_date.isoformat(' ', 'seconds'),  # 与 strftime('%Y-%m-%d %H:%M:%S') 相同，快约 3 倍
+        row.member_name or '非会员',
+        row.member_phone or '',
+        row.original_amount,
+        row.discount_amount,
+        row.final_amount,
+        row.status
+    )
+
+
+def format_order_item_row(row):
+    return (row[:2] + (row.order_date.isoformat(' ', 'seconds'),) + row[3:])
+
+
+def filter_order_dates(query, form):
+    """按 start_date / end_date (YYYY-MM-DD，结束日期包含当天) 筛选订单日期，格式错误的日期忽略"""
+    try:
+        if form.start_date.data:
+            query = query.where(Order.order_date >= datetime.strptime(form.start_date.data, '%Y-%m-%d'))
+        if form.end_date.data:
+            query = query.where(Order.order_date < datetime.strptime(form.end_date.data, '%Y-%m-%d') + timedelta(days=1))
+    except ValueError:
+        pass
+    return query
 
 
 @report.route('/export/<string:data_type>', methods=['GET'])
 @login_required
+@read_replica
 def export_data(data_type):
-    """数据导出 CSV/Excel"""
+    """数据导出，?format=csv (默认) / csv.gz / arrow / parquet"""
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        flash("无效的导出格式。", 'danger')
+        return redirect(url_for('.dashboard'))
 
     # --- 1. 导出商品数据 (PRODUCTS) ---
     if data_type == 'products':
-        query = Product.query.order_by(Product.id.asc())
+        statement = select(
+            Product.id, Product.name, Product.category_id, Product.cost_price,
+            Product.retail_price, Product.unit, Product.stock_quantity
+        ).order_by(Product.id.asc())
 
-        # 确保 field_names 与您的模型属性一致
+        # 列顺序与查询保持一致
         headers = ['商品ID', '名称', '分类id', '进货成本', '零售单价', '单位', '总库存']
-        field_names = ['id', 'name', 'category_id', 'cost_price', 'price', 'unit', 'stock_quantity']
-        filename_raw = f'商品数据_{datetime.now().strftime("%Y%m%d%H%M%S")}.csv'
-        filename_encoded = quote(filename_raw)
-        disposition = f"attachment; filename*=utf-8''{filename_encoded}"
-
-        response = Response(
-            stream_with_context(generate_csv(query, headers, field_names, data_type)),
-            mimetype='text/csv',
-            headers={
-                "Content-Disposition": disposition,
-                "Content-type": "text/csv; charset=UTF-8"
-            }
-        )
-        return response
+        format_row = format_plain_row
+        filename_prefix = '商品数据'
 
     # --- 2. 导出销售数据 (SALES) ---
     elif data_type == 'sales':
         # 重建订单查询逻辑
         form = OrderSearchForm(request.args)
-        query = Order.query.order_by(Order.id.desc())
+        # 只查询导出需要的列，会员信息通过 LEFT JOIN 一并取出
+        statement = select(
+            Order.id, Order.order_date,
+            Member.name.label('member_name'), Member.phone_number.label('member_phone'),
+            Order.original_amount, Order.discount_amount, Order.final_amount, Order.status
+        ).outerjoin(Member, Member.id == Order.member_id).order_by(Order.id.desc())
 
         # 应用筛选逻辑
         if form.order_id.data:
             try:
                 order_id_int = int(form.order_id.data)
-                query = query.filter(Order.id == order_id_int)
+                statement = statement.where(Order.id == order_id_int)
             except ValueError:
                 pass
 
         if form.member_phone.data:
-            phone_search_term = form.member_phone.data
-            search_pattern = f'%{phone_search_term}%'
-            matching_member_ids = db.session.query(Member.id).filter(Member.phone_number.like(search_pattern)).all()
-            member_id_list = [mid[0] for mid in matching_member_ids]
-            if member_id_list:
-                query = query.filter(Order.member_id.in_(member_id_list))
-            else:
-                query = query.filter(Order.member_id == -1)
-
-                # 日期筛选... (如果需要，请在这里添加)
-
-        # 定义 CSV 文件头
+            matches = matching_members(form.member_phone.data)
+            statement = statement.join(matches, matches.c.member_id == Order.member_id)
+
+        statement = filter_order_dates(statement, form)
+
+        # 定义 CSV 文件头 (列顺序与 format_sales_row 保持一致)
         headers = ['订单ID', '交易时间', '会员姓名', '会员手机', '原始总额', '折扣金额', '实付金额', '订单状态']
-        field_names = []
-
-        filename_raw = f'销售订单数据_{datetime.now().strftime("%Y%m%d%H%M%S")}.csv'
-        filename_encoded = quote(filename_raw)
-        disposition = f"attachment; filename*=utf-8''{filename_encoded}"
-
-        response = Response(
-            stream_with_context(generate_csv(query, headers, field_names, data_type)),
-            mimetype='text/csv',
-            headers={
-                "Content-Disposition": disposition,
-                "Content-type": "text/csv; charset=UTF-8"
-            }
-        )
-        return response
+        format_row = format_sales_row
+        filename_prefix = '销售订单数据'
+
+    # --- 3. 导出订单明细 (ORDER_ITEMS，含每行成本与毛利) ---
+    elif data_type == 'order_items':
+        form = OrderSearchForm(request.args)
+        line_cost = cast(OrderItem.cost_at_sale * OrderItem.quantity, Numeric(12, 2))
+        gross_profit = cast((OrderItem.price_at_sale - OrderItem.cost_at_sale) * OrderItem.quantity, Numeric(12, 2))
+        statement = select(
+            OrderItem.id, OrderItem.order_id, Order.order_date,
+            OrderItem.product_id, Product.name.label('product_name'),
+            OrderItem.quantity, OrderItem.price_at_sale, OrderItem.cost_at_sale, OrderItem.line_subtotal,
+            line_cost.label('line_cost'), gross_profit.label('gross_profit')
+        ).join(
+            Order, Order.id == OrderItem.order_id
+        ).outerjoin(
+            Product, Product.id == OrderItem.product_id
+        ).order_by(OrderItem.id.asc())
+
+        statement = filter_order_dates(statement, form)
+
+        headers = ['明细ID', '订单ID', '交易时间', '商品ID', '商品名称', '数量', '销售单价', '成本单价',
+                   '小计金额', '成本金额', '毛利润']
+        format_row = format_order_item_row
+        filename_prefix = '订单明细数据'
 
     else:
         flash("无效的导出类型。", 'danger')
         return redirect(url_for('.dashboard'))
+
+    # --- 按格式流式输出 ---
+    try:
+        if export_format in ('arrow', 'parquet'):
+            stream = stream_columnar(statement, export_format)
+        else:
+            stream = stream_csv(statement, headers, format_row, compress=(export_format == 'csv.gz'))
+    except ExportError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('.dashboard'))
+
+    content_type, extension = EXPORT_FORMATS[export_format]
+    filename_raw = f'{filename_prefix}_{datetime.now().strftime("%Y%m%d%H%M%S")}.{extension}'
+    filename_encoded = quote(filename_raw)
+    disposition = f"attachment; filename*=utf-8''{filename_encoded}"
+
+    response = Response(
+        stream_with_context(stream),
+        mimetype=content_type.split(';')[0],
+        headers={
+            "Content-Disposition": disposition,
+            "Content-type": content_type
+        }
+    )
+    return response
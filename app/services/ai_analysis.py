@@ -0,0 +1,167 @@
+# app/services/ai_analysis.py
+
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import update, or_, and_
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import AiAnalysis
+
+# 失败的任务至少间隔多久才重试；pending 超过多久视为任务丢失 (例如进程重启)
+RETRY_AFTER = timedelta(seconds=60)
+JOB_TIMEOUT = timedelta(minutes=5)
+
+# 后台线程池：模型调用不再占用 Web 请求线程
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='ai-analysis')
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+SYSTEM_PROMPT = ("You are a professional retail data analyst. Analyze the data and provide concise, "
+                 "actionable feedback in Chinese Markdown format.")
+
+PROMPT_TEMPLATE = """
+    请你作为一名零售行业分析师，根据以下销售数据，对业务表现进行评价，并提出 actionable 的运营建议。
+
+    **数据总览 (基于已完成订单):**
+    - 累计总销售额: ¥{total_sales:,.2f}
+    - 今日销售额: ¥{today_sales:,.2f}
+    - 近30天总销售额: ¥{total_sales_30:,.2f}
+    - 近30天平均日销售额: ¥{avg_daily_sales_30:,.2f}
+    - 近30天畅销商品 Top 3: {top_products}
+
+    **分析要求:**
+    1. **评价**: 总结当前业务亮点和潜在风险。
+    2. **建议**: 针对 Top 畅销品和销售趋势，给出具体的促销或库存管理建议。
+    3. **格式**: 以纯中文文本形式清晰返回，不要包含任何前言和后记，不要用markdowm格式。
+    """
+
+
+def get_client(api_key, base_url):
+    """按 (api_key, base_url) 复用 OpenAI 兼容客户端，首次使用时才创建"""
+    from openai import OpenAI
+
+    key = (api_key, base_url)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = OpenAI(api_key=api_key, base_url=base_url)
+        return _clients[key]
+
+
+def fingerprint(metrics, model):
+    """输入指标 (含模型名) 的 SHA-256 指纹；金额统一保留两位小数，避免浮点表示差异"""
+    normalized = {k: f'{v:.2f}' if isinstance(v, (int, float, Decimal)) else v
+                  for k, v in metrics.items()}
+    payload = json.dumps({'model': model, 'metrics': normalized}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def request_analysis(metrics):
+    """
+    返回指标对应的 AiAnalysis 记录。记录不存在时创建 pending 记录并提交后台任务；
+    相同指标已有结果 (或正在生成) 时直接返回，不会再次调用模型。
+    """
+    config = current_app.config
+    key = fingerprint(metrics, config['DEEPSEEK_MODEL'])
+    record = db.session.get(AiAnalysis, key)
+
+    if record is None:
+        record = AiAnalysis(fingerprint=key, status='pending')
+        db.session.add(record)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # 其他请求 / 进程已抢先创建了同一任务
+            db.session.rollback()
+            return db.session.get(AiAnalysis, key)
+        _submit(key, metrics)
+        return record
+
+    # 失败超过 RETRY_AFTER 或 pending 超过 JOB_TIMEOUT 的任务可以重试；用条件 UPDATE 保证只有一个请求重新提交
+    now = datetime.utcnow()
+    retried = db.session.execute(
+        update(AiAnalysis)
+        .where(AiAnalysis.fingerprint == key,
+               or_(and_(AiAnalysis.status == 'failed', AiAnalysis.updated_at < now - RETRY_AFTER),
+                   and_(AiAnalysis.status == 'pending', AiAnalysis.updated_at < now - JOB_TIMEOUT)))
+        .values(status='pending', analysis=None, updated_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    if retried:
+        _submit(key, metrics)
+        db.session.refresh(record)
+    return record
+
+
+def get_analysis(job_id):
+    """
+    轮询任务状态。pending 超过 JOB_TIMEOUT 的任务 (进程重启等导致丢失) 标记为失败，前端不再无限轮询；
+    updated_at 保持不变，因此刷新时 request_analysis 会立即重新提交。
+    """
+    record = db.session.get(AiAnalysis, job_id)
+    if record is not None and record.status == 'pending' and record.updated_at < datetime.utcnow() - JOB_TIMEOUT:
+        db.session.execute(
+            update(AiAnalysis)
+            .where(AiAnalysis.fingerprint == job_id, AiAnalysis.status == 'pending',
+                   AiAnalysis.updated_at == record.updated_at)
+            .values(status='failed', analysis='AI 分析任务超时 (可能因服务重启而中断)，请点击刷新重试。')
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        db.session.refresh(record)
+    return record
+
+
+def _submit(key, metrics):
+    app = current_app._get_current_object()
+    _executor.submit(_run_job, app, key, metrics)
+
+
+def _run_job(app, key, metrics):
+    """后台线程：调用模型并写回结果"""
+    with app.app_context():
+        config = app.config
+        prompt = PROMPT_TEMPLATE.format(**metrics)
+        try:
+            client = get_client(config['DEEPSEEK_API_KEY'], config['DEEPSEEK_BASE_URL'])
+            response = client.chat.completions.create(
+                model=config['DEEPSEEK_MODEL'],
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt},
+                ],
+                stream=False
+            )
+            status, result = 'done', response.choices[0].message.content
+        except Exception as e:
+            status = 'failed'
+            result = f"AI 分析服务调用失败，请检查 DEEPSEEK_API_KEY 配置和网络连接。错误详情: {e}"
+            print(f"DeepSeek API Error: {e}")
+
+        try:
+            _save_result(key, status, result)
+        except Exception:
+            # 线程池会吞掉异常：记录日志并尽量标记为失败，否则任务停留在 pending，前端一直轮询到 JOB_TIMEOUT
+            db.session.rollback()
+            app.logger.exception('AI 分析任务 %s 写回结果失败', key)
+            try:
+                _save_result(key, 'failed', 'AI 分析结果保存失败，请稍后重试。')
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('AI 分析任务 %s 标记失败状态时出错', key)
+
+
+def _save_result(key, status, result):
+    db.session.execute(
+        update(AiAnalysis)
+        .where(AiAnalysis.fingerprint == key)
+        .values(status=status, analysis=result, updated_at=datetime.utcnow())
+    )
+    db.session.commit()
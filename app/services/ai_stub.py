@@ -0,0 +1,75 @@
+# app/services/ai_stub.py
+"""
+本地 OpenAI 兼容桩服务：对 POST */chat/completions 返回固定的分析文本，并统计调用次数。
+测试或开发时将 DEEPSEEK_BASE_URL 指向它，无需真实的 DeepSeek 账号和网络。
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_ANALYSIS = '【桩服务】销售表现平稳，建议关注畅销商品库存并针对滞销品开展促销。'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        if not self.path.endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with self.server.lock:
+            self.server.calls += 1
+        if self.server.delay:
+            time.sleep(self.server.delay)  # 模拟模型响应耗时
+
+        payload = json.dumps({
+            'id': f'stub-{self.server.calls}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': STUB_ANALYSIS},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        # GET /calls 返回累计调用次数，便于测试断言"相同输入只调用一次模型"
+        if self.path != '/calls':
+            self.send_error(404)
+            return
+        payload = json.dumps({'calls': self.server.calls}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host='127.0.0.1', port=0, delay=0):
+    """创建桩服务 (port=0 时自动分配端口)，server.calls 为累计调用次数"""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.calls = 0
+    server.delay = delay
+    server.lock = threading.Lock()
+    return server
+
+
+def start_in_thread(**kwargs):
+    """在后台线程中启动桩服务，返回 (server, base_url)"""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f'http://{host}:{port}/v1'
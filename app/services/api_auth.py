@@ -0,0 +1,39 @@
+# app/services/api_auth.py
+
+import functools
+import hmac
+
+from flask import current_app, request
+from flask_login import login_required
+from app.extensions import csrf
+
+
+def has_bearer_token(config_key):
+    """请求头 Authorization: Bearer <token> 与 app.config[config_key] 一致 (未配置令牌时始终为 False)"""
+    token = current_app.config.get(config_key)
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+def token_or_login_required(config_key):
+    """
+    供脚本 (离线收银台等) 调用的接口：携带 config_key 配置的 Bearer 令牌时免登录、免 CSRF 校验；
+    否则与普通页面相同，要求登录会话并校验 CSRF 令牌 (令牌请求不带 Cookie，不存在 CSRF 问题)。
+    """
+    def decorator(view):
+        @login_required
+        def session_view(*args, **kwargs):
+            if current_app.config.get('WTF_CSRF_ENABLED', True):
+                csrf.protect()
+            return view(*args, **kwargs)
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if has_bearer_token(config_key):
+                return view(*args, **kwargs)
+            return session_view(*args, **kwargs)
+
+        # 全局 CSRFProtect 跳过此视图，改由上面按认证方式决定是否校验
+        return csrf.exempt(wrapper)
+    return decorator
@@ -0,0 +1,50 @@
+# app/services/cache_generation.py
+
+from sqlalchemy import select, event
+from sqlalchemy.orm import Session
+from app.models import CacheGeneration
+
+# 代数名称：报表 (订单汇总、商品名称) / 商品目录 (价格、成本、名称、库存状态)
+REPORTS = 'reports'
+CATALOG = 'catalog'
+
+
+def mark_changed(session, name):
+    """记录本事务修改了 name 对应的数据：提交时在同一事务内把代数加一，回滚则不变"""
+    session.info.setdefault('changed_generations', set()).add(name)
+
+
+def current_generation(session, name):
+    """读取代数 (主键查询)；尚未有过修改时为 0"""
+    value = session.execute(select(CacheGeneration.value).where(CacheGeneration.name == name)).scalar()
+    return value or 0
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_generations(session):
+    """
+    代数保存在数据库中并随数据一起提交，其他 Web 进程和 CLI (导入、重建汇总、造数) 的修改
+    同样会使各进程的缓存失效，不存在“已提交但代数未变”的窗口。
+    """
+    session.info.pop('committed_generations', None)
+    session.flush()  # 最后一次 flush 中标记的变化 (before_flush / after_flush 监听器) 也要计入
+    names = session.info.pop('changed_generations', None)
+    if names:
+        from app.services.rollups import upsert_rows  # rollups 间接依赖本模块，延迟导入避免循环
+        upsert_rows(CacheGeneration, [{'name': name, 'value': 1} for name in sorted(names)], ['name'],
+                    increment_columns=['value'])
+        # 加一之后的值 (行已被本事务锁定)：after_commit 中增量更新进程内结构时据此判断是否遗漏了其他进程的修改
+        session.info['committed_generations'] = dict(session.execute(
+            select(CacheGeneration.name, CacheGeneration.value).where(CacheGeneration.name.in_(names))
+        ).all())
+
+
+def committed_generation(session, name):
+    """在 after_commit 监听器中读取：本次提交把 name 的代数加到了多少 (本次未修改时为 None)"""
+    return session.info.get('committed_generations', {}).get(name)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('changed_generations', None)
+    session.info.pop('committed_generations', None)
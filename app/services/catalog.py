@@ -0,0 +1,114 @@
+# app/services/catalog.py
+
+from flask import jsonify, request
+from app.models import Product, Member
+from app.services.pagination import KeysetPagination, encode_cursor, decode_offset
+from app.services.pricing import catalog_cache
+from app.services.product_search import product_index
+
+# 联想搜索每页默认 / 最大条数：结算页每次只取一小页，响应大小与表规模无关
+TYPEAHEAD_LIMIT = 20
+TYPEAHEAD_MAX_LIMIT = 50
+
+
+def prefix_pattern(term):
+    """前缀匹配的 LIKE 模式 (转义 % 和 _)，'abc%' 可以走该列索引的范围扫描"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'{escaped}%'
+
+
+def search_products(term, limit=TYPEAHEAD_LIMIT, after=None):
+    """
+    查找有库存的商品。有关键词时按商品搜索引擎的相关度排序 (名称子串 / 拼音首字母，纯数字还匹配商品 ID)，
+    商品字段取自进程内目录缓存；无关键词时按名称键集分页浏览。
+    """
+    if not term:
+        page = KeysetPagination(Product.query.filter(Product.stock_quantity > 0), [Product.name],
+                                per_page=limit, after=after)
+        return [_product_item(p) for p in page.items], page.next_cursor
+
+    try:
+        position = max(int(decode_offset(after)), 0) if after else 0
+    except (ValueError, TypeError, IndexError):
+        position = 0
+
+    # 按相关度顺序读取快照并跳过无库存商品；每次只向搜索引擎取前 window 条，不够一页时加倍
+    items = []
+    window = position + limit * 2
+    while True:
+        ids, total = _ranked_product_ids(term, window)
+        snapshots = catalog_cache.get_many(ids[position:])
+        for product_id in ids[position:]:
+            position += 1
+            snapshot = snapshots.get(product_id)
+            if snapshot is not None and snapshot.stock_quantity > 0:
+                items.append(_product_item(snapshot))
+                if len(items) == limit:
+                    break
+        if len(items) == limit or len(ids) >= total:
+            break
+        window *= 2
+
+    return items, encode_cursor([position]) if position < total else None
+
+
+def _ranked_product_ids(term, limit):
+    """搜索结果的前 limit 个商品 ID 与命中总数；纯数字查询时同 ID 的商品排在最前"""
+    result = product_index.search(term, limit=limit)
+    if not term.isdigit():
+        return result.ids, result.total
+    product_id = int(term)
+    ids = [product_id] + [i for i in result.ids if i != product_id]
+    return ids, result.total + (0 if product_id in result.ids else 1)
+
+
+def _product_item(p):
+    return {
+        'id': p.id,
+        'name': p.name,
+        'unit': p.unit,
+        'retail_price': float(p.retail_price),
+        'stock': p.stock_quantity
+    }
+
+
+def search_members(term, limit=TYPEAHEAD_LIMIT, after=None):
+    """按手机号前缀 (纯数字) 或姓名前缀查找会员"""
+    query = Member.query
+    if term and term.isdigit():
+        query = query.filter(Member.phone_number.like(prefix_pattern(term), escape='\\'))
+        columns = [Member.phone_number]
+    else:
+        if term:
+            query = query.filter(Member.name.like(prefix_pattern(term), escape='\\'))
+        columns = [Member.name, Member.id]
+
+    page = KeysetPagination(query, columns, per_page=limit, after=after)
+    items = [
+        {
+            'id': m.id,
+            'name': m.name,
+            'phone_number': m.phone_number,
+            'discount': float(m.discount_rate)
+        } for m in page.items
+    ]
+    return items, page.next_cursor
+
+
+def typeahead_args():
+    """读取联想搜索的 q / limit / after 参数，limit 限制在 1 ~ TYPEAHEAD_MAX_LIMIT"""
+    term = (request.args.get('q') or '').strip()
+    limit = min(max(request.args.get('limit', TYPEAHEAD_LIMIT, type=int), 1), TYPEAHEAD_MAX_LIMIT)
+    return term, limit, request.args.get('after')
+
+
+def conditional_json(payload):
+    """
+    返回带 ETag 的 JSON 响应；请求头 If-None-Match 与当前内容一致时返回 304 (无响应体)。
+    no-cache 让浏览器每次都带 ETag 重新验证，保证库存 / 会员变更后立即可见。
+    """
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -0,0 +1,132 @@
+# app/services/checkout.py
+
+from collections import OrderedDict
+
+from sqlalchemy import select, update, insert, case
+from app.extensions import db
+from app.models import Product, Order, OrderItem
+from app.services.pricing import quote, catalog_cache, load_discounts, record_stock_change, ProductSnapshot
+from app.services.rollups import apply_order
+
+
+class CheckoutError(Exception):
+    """结算业务错误（库存不足、商品不存在等），由视图转换为 400 响应"""
+    pass
+
+
+def aggregate_cart(items):
+    """合并购物车中重复的商品行，返回 {product_id: quantity}（保持首次出现的顺序）"""
+    quantities = OrderedDict()
+    for item_data in items:
+        product_id = int(item_data['product_id'])
+        quantity = int(item_data['quantity'])
+        if quantity <= 0:
+            raise CheckoutError(f'商品 ID {product_id} 的数量必须大于 0')
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def lock_products(product_ids):
+    """
+    在当前事务内一次加载并锁定商品行：SELECT ... WHERE id IN (...) FOR UPDATE (按 ID 顺序加锁，避免多收银台死锁)。
+    SQLite 不支持行锁，先执行一条空操作 UPDATE 提前拿到数据库写锁，效果等同于串行化写事务。
+    结算与导入按这里读到的价格 / 成本计价，其他进程刚提交的改价在锁内一定可见 (进程内快照可能已过期)；
+    读到的最新数据同时写回本进程已缓存的快照。返回 {product_id: ProductSnapshot}。
+    """
+    ids = sorted(product_ids)
+    if db.session.get_bind().dialect.name == 'sqlite':
+        db.session.execute(
+            update(Product)
+            .where(Product.id.in_(ids))
+            .values(stock_quantity=Product.stock_quantity)
+            .execution_options(synchronize_session=False)
+        )
+
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.unit, Product.retail_price, Product.cost_price,
+               Product.stock_quantity)
+        .where(Product.id.in_(ids))
+        .order_by(Product.id)
+        .with_for_update()
+    ).all()
+    products = {row.id: ProductSnapshot(*row) for row in rows}
+    for product_id, snapshot in products.items():
+        catalog_cache.update(product_id, lambda _, snapshot=snapshot: snapshot)
+    return products
+
+
+def decrement_stock(quantities):
+    """
+    单条条件 UPDATE 扣减所有商品库存，任何一行库存不足则整条语句的影响行数不足。
+    调用方已用 lock_products 锁定并检查过库存，这里的条件是防超卖的兜底。
+    """
+    qty_case = case(quantities, value=Product.id)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(sorted(quantities)), Product.stock_quantity >= qty_case)
+        .values(stock_quantity=Product.stock_quantity - qty_case)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(quantities):
+        return False
+    record_stock_change(db.session(), quantities)
+    return True
+
+
+def place_order(items, member_id=None):
+    """
+    批量结算引擎：加锁读取商品 -> 服务端计价 -> 条件扣减库存 -> 写订单头 -> executemany 写订单详情。
+    金额一律由服务端按事务内读到的价格计算，不信任前端提交的价格。调用方负责 commit / rollback。
+    """
+    quantities = aggregate_cart(items)
+    if not quantities:
+        raise CheckoutError('订单不能为空！')
+
+    # 1. 一次加锁读取全部商品 (价格、成本、库存以数据库为准)
+    products = lock_products(quantities)
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            raise CheckoutError(f'商品 ID {product_id} 不存在')
+        if product.stock_quantity < quantity:
+            raise CheckoutError(f'商品 "{product.name}" 库存不足 ({quantity} > {product.stock_quantity})')
+
+    # 2. 计价：会员折扣率同样在事务内读取
+    try:
+        discounts = load_discounts([member_id]) if member_id else None
+        order_quote = quote(quantities, member_id, products=products, discounts=discounts)
+    except KeyError:
+        raise CheckoutError(f'会员 ID {member_id} 不存在')
+
+    # 3. 单条条件 UPDATE 扣减库存 (行已锁定，条件只是兜底)
+    if not decrement_stock(quantities):
+        raise CheckoutError('库存已被其他订单占用，请刷新后重试')
+
+    # 4. 创建订单头
+    order_obj = Order(
+        member_id=member_id if member_id else None,
+        original_amount=order_quote.original_amount,
+        discount_amount=order_quote.discount_amount,
+        final_amount=order_quote.final_amount,
+        status='Completed'
+    )
+    db.session.add(order_obj)
+    db.session.flush()  # 立即获取 order_obj.id
+
+    # 5. executemany 一次写入所有订单详情
+    lines = [
+        {
+            'order_id': order_obj.id,
+            'product_id': product_id,
+            'quantity': quantity,
+            'price_at_sale': order_quote.lines[product_id][0],
+            'cost_at_sale': products[product_id].cost_price,
+            'line_subtotal': order_quote.lines[product_id][1],
+        } for product_id, quantity in quantities.items()
+    ]
+    db.session.execute(insert(OrderItem), lines)
+
+    # 6. 同一事务内增量更新报表汇总
+    apply_order(order_obj.order_date, order_quote.final_amount, lines)
+
+    return order_obj, order_quote
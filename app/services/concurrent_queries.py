@@ -0,0 +1,55 @@
+# app/services/concurrent_queries.py
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g
+from sqlalchemy.pool import StaticPool, SingletonThreadPool
+from app.extensions import db
+
+# 查询线程继承的请求级标记：只读副本路由 (db_routing) 与请求 SQL 统计 (request_metrics)
+INHERITED_G_ATTRS = ('use_replica', '_request_stats')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """按 REPORT_QUERY_WORKERS 创建共享线程池 (首次使用时)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=current_app.config.get('REPORT_QUERY_WORKERS', 4),
+                                           thread_name_prefix='report-query')
+        return _executor
+
+
+def can_run_concurrently():
+    """所有线程共用一个连接的连接池 (SQLite 内存库) 无法并发查询；REPORT_QUERY_WORKERS<=1 表示关闭"""
+    if current_app.config.get('REPORT_QUERY_WORKERS', 4) <= 1:
+        return False
+    return not isinstance(db.engine.pool, (StaticPool, SingletonThreadPool))
+
+
+def run_concurrently(queries):
+    """
+    并发执行互不依赖的查询函数 {名称: 无参函数}，返回 {名称: 结果}。
+    每个函数在线程池中以独立的应用上下文运行，即各自的会话和连接，总耗时约等于最慢的一条查询。
+    任一函数抛出的异常在调用方重新抛出 (只读副本故障时由 read_replica 回落到主库重试)。
+    """
+    if len(queries) < 2 or not can_run_concurrently():
+        return {name: query() for name, query in queries.items()}
+
+    app = current_app._get_current_object()
+    inherited = {attr: g.get(attr) for attr in INHERITED_G_ATTRS if g.get(attr) is not None}
+    executor = get_executor()
+    futures = {name: executor.submit(_run, app, inherited, query) for name, query in queries.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def _run(app, inherited, query):
+    # 应用上下文结束时 Flask-SQLAlchemy 自动关闭该线程的会话并归还连接
+    with app.app_context():
+        for attr, value in inherited.items():
+            setattr(g, attr, value)
+        return query()
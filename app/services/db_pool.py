@@ -0,0 +1,149 @@
+# app/services/db_pool.py
+
+import threading
+import time
+import weakref
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """单个引擎 (主库或只读副本) 连接池的事件计数与取连接等待时间 (进程内累计)"""
+
+    def __init__(self, max_overflow=None):
+        self._lock = threading.Lock()
+        self.max_overflow = max_overflow  # 创建引擎时的参数 (QueuePool 不公开该值)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0  # 新建的数据库连接
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidations = 0  # 失效的连接 (pre-ping 检测到断开、连接出错等)
+            self.timeouts = 0  # 等待超过 pool_timeout 仍未取到连接
+            self.wait_count = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def stats(self, pool=None):
+        """累计计数，以及 pool (QueuePool) 当前的容量 / 借出 / 溢出连接数"""
+        with self._lock:
+            result = {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'invalidations': self.invalidations,
+                'timeouts': self.timeouts,
+                'wait_count': self.wait_count,
+                'wait_seconds_total': round(self.wait_total, 6),
+                'wait_seconds_avg': round(self.wait_total / self.wait_count, 6) if self.wait_count else 0.0,
+                'wait_seconds_max': round(self.wait_max, 6),
+            }
+        if isinstance(pool, QueuePool):
+            result.update({
+                'pool_size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+                'max_overflow': self.max_overflow,
+            })
+        return result
+
+
+_engine_metrics = weakref.WeakKeyDictionary()  # engine -> PoolMetrics
+
+
+class InstrumentedQueuePool(QueuePool):
+    """记录取连接耗时 (排队等待 + 必要时新建连接) 的 QueuePool，计入 instrument_engine 设置的 metrics"""
+
+    metrics = None
+
+    def _do_get(self):
+        if self.metrics is None:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.incr('timeouts')
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+
+    def recreate(self):
+        # engine.dispose() 会换用新的连接池，统计继续累计到同一个对象
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def engine_options(config, uri=None):
+    """
+    按 DB_POOL_PROFILE 生成 create_engine 参数，SQLALCHEMY_ENGINE_OPTIONS 中显式给出的项优先。
+    uri 缺省为主库；SQLite 内存库只有一个连接，不使用连接池参数。
+    """
+    uri = str(uri or config['SQLALCHEMY_DATABASE_URI'])
+    options = dict(config['DB_POOL_PROFILES'][config['DB_POOL_PROFILE']])
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') in ('sqlite:', 'sqlite')):
+        return {key: value for key, value in options.items() if not key.startswith('pool_') and key != 'max_overflow'}
+    options.setdefault('poolclass', InstrumentedQueuePool)
+    return options
+
+
+def bind_engine_options(config):
+    """
+    SQLALCHEMY_BINDS 中以 URL 给出的绑定 (只读副本) 同样按配置档生成连接池参数：
+    Flask-SQLAlchemy 只把 SQLALCHEMY_ENGINE_OPTIONS 用于主库。以字典给出的绑定原样保留。
+    """
+    return {key: dict(value) if isinstance(value, dict) else {'url': value, **engine_options(config, value)}
+            for key, value in (config.get('SQLALCHEMY_BINDS') or {}).items()}
+
+
+# --- 连接池事件：每个引擎单独注册，主库与只读副本分开统计 ---
+
+def instrument_engine(engine, options):
+    """在引擎创建后调用：为其连接池建立独立的 PoolMetrics 并注册连接池事件"""
+    metrics = PoolMetrics(max_overflow=options.get('max_overflow'))
+    _engine_metrics[engine] = metrics
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.metrics = metrics
+
+    # 以引擎为目标注册的连接池事件在 dispose() 重建连接池后仍然有效
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.incr('connects')
+
+    @event.listens_for(engine, 'checkout')
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.incr('checkouts')
+
+    @event.listens_for(engine, 'checkin')
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics.incr('checkins')
+
+    @event.listens_for(engine, 'invalidate')
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.incr('invalidations')
+
+    return metrics
+
+
+def pool_stats(engines):
+    """按绑定输出连接池统计：{'primary': {...}, 'replica': {...}}；engines 为 db.engines"""
+    return {
+        'primary' if key is None else key: _engine_metrics[engine].stats(engine.pool)
+        for key, engine in engines.items() if engine in _engine_metrics
+    }
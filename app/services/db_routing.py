@@ -0,0 +1,110 @@
+# app/services/db_routing.py
+
+import functools
+import threading
+import time
+
+from flask import g, has_app_context
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import Engine
+from flask_sqlalchemy.session import Session
+
+# SQLALCHEMY_BINDS 中只读副本的键
+REPLICA_BIND = 'replica'
+# 副本健康检查结果的缓存时间 (秒)：不可用期间报表查询回落到主库，过期后重新探测
+REPLICA_CHECK_TTL = 10
+
+_health = {}  # 引擎 URL -> (是否可用, 过期时间)
+_health_lock = threading.Lock()
+
+
+def replica_available(engine):
+    """SELECT 1 探测副本是否可用，结果缓存 REPLICA_CHECK_TTL 秒"""
+    key = str(engine.url)
+    now = time.monotonic()
+    cached = _health.get(key)
+    if cached and cached[1] > now:
+        return cached[0]
+    try:
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+        available = True
+    except exc.DBAPIError as e:
+        print(f"只读副本不可用，回落到主库: {e}")
+        available = False
+    with _health_lock:
+        _health[key] = (available, now + REPLICA_CHECK_TTL)
+    return available
+
+
+def mark_replica_down(engine):
+    """查询中途出错时把副本标记为不可用，REPLICA_CHECK_TTL 秒内不再使用"""
+    with _health_lock:
+        _health[str(engine.url)] = (False, time.monotonic() + REPLICA_CHECK_TTL)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _record_failed_engine(context):
+    # 在异常上记录出错的引擎 (并发查询线程中的异常原样在请求线程重新抛出)：只有副本出错时才回落到主库
+    if context.sqlalchemy_exception is not None:
+        context.sqlalchemy_exception.failed_engine = context.engine
+
+
+def fall_back_to_primary(error):
+    """
+    error 由只读副本抛出时：标记副本不可用、回滚会话，本请求之后的只读查询改用主库，返回 True。
+    主库的错误 (如锁等待超时) 返回 False，由调用方照常抛出。
+    """
+    from app.extensions import db
+    replica = db.engines.get(REPLICA_BIND)
+    if replica is None or getattr(error, 'failed_engine', None) is not replica:
+        return False
+    mark_replica_down(replica)
+    db.session.rollback()
+    g.use_replica = False
+    return True
+
+
+class RoutingSession(Session):
+    """
+    读写分离 Session：g.use_replica 为真时，只读查询发往 SQLALCHEMY_BINDS['replica']；
+    flush (ORM 写入) 与 INSERT / UPDATE / DELETE 语句始终使用主库。未配置副本或副本不可用时全部使用主库。
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and g.get('use_replica') and not self._flushing \
+                and not getattr(clause, 'is_dml', False):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None and replica_available(replica):
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(view):
+    """
+    视图装饰器：本次请求的只读查询使用副本。标记放在 g 上而不是 session.info：
+    流式导出在视图返回、请求的 Session 被移除后仍会继续读取，g 随应用上下文保留到响应结束。
+    副本在查询中途断开时标记为不可用，回滚后在主库上重新执行一次视图。流式导出的查询在视图返回后
+    才执行，不经过这里：由 exporters.iter_batches 在开始输出数据前回落；已开始输出后副本断开则下载中断。
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = True
+        try:
+            return view(*args, **kwargs)
+        except exc.OperationalError as e:
+            if not fall_back_to_primary(e):
+                raise
+            return view(*args, **kwargs)
+    return wrapper
+
+
+class primary_reads:
+    """在 read_replica 请求中临时改回主库读取 (读取刚写入、不能容忍复制延迟的数据时使用)"""
+
+    def __enter__(self):
+        self._previous = g.get('use_replica', False)
+        g.use_replica = False
+
+    def __exit__(self, *exc_info):
+        g.use_replica = self._previous
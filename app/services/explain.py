@@ -0,0 +1,90 @@
+# app/services/explain.py
+
+from flask import request, has_request_context
+from sqlalchemy import event
+from app.extensions import db
+from app.models import Order, Member, Product
+
+# 允许全表扫描的表：数据量很小 (每日汇总表每天仅一行)，走索引反而更慢
+SMALL_TABLES = {'admins', 'categories', 'daily_sales'}
+
+
+def hot_requests():
+    """按蓝图列出需要检查的 GET 请求，参数取自库中的真实数据"""
+    order_obj = Order.query.order_by(Order.id.desc()).first()
+    member_obj = Member.query.order_by(Member.id.desc()).first()
+    product_obj = Product.query.order_by(Product.id.desc()).first()
+
+    phone = member_obj.phone_number[-4:] if member_obj else '0000'
+    name = product_obj.name[:1] if product_obj else '果'
+
+    urls = [
+        '/report/dashboard',
+        '/report/api/sales_trend',
+        '/report/api/product_ranking',
+        '/report/api/product_ranking?days=365',
+        '/report/export/products',
+        f'/report/export/sales?member_phone={phone}',
+        '/order/create',
+        f'/order/api/member_lookup?phone={member_obj.phone_number if member_obj else phone}',
+        '/order/list',
+        '/order/list?order_id=5',
+        f'/order/list?member_phone={phone}',
+        '/order/list?start_date=2024-01-01&end_date=2024-12-31',
+        '/member/list',
+        f'/member/list?search_term={phone}',
+        '/product/list',
+        f'/product/list?search_term={name}',
+        '/product/categories',
+    ]
+    if order_obj:
+        urls.append(f'/order/detail/{order_obj.id}')
+    return urls
+
+
+def capture_queries(app, urls):
+    """用测试客户端依次访问 urls，记录每个端点执行过的 SELECT 语句 (按语句文本去重)"""
+    captured = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith('SELECT'):
+            return
+        endpoint = request.endpoint if has_request_context() else None
+        captured.setdefault(statement, (endpoint, parameters))
+
+    login_disabled = app.config.get('LOGIN_DISABLED', False)
+    app.config['LOGIN_DISABLED'] = True
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        client = app.test_client()
+        for url in urls:
+            response = client.get(url)
+            response.get_data()  # 消费完流式响应 (CSV 导出)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        app.config['LOGIN_DISABLED'] = login_disabled
+
+    return [(endpoint, statement, parameters) for statement, (endpoint, parameters) in captured.items()]
+
+
+def explain(statement, parameters):
+    """
+    对单条语句执行 EXPLAIN，返回 (计划文本列表, 全表扫描的表名列表)。
+    SQLite 使用 EXPLAIN QUERY PLAN (SCAN <table> 且未使用索引即为全表扫描)，
+    MySQL 使用 EXPLAIN (type = ALL 即为全表扫描)。
+    """
+    with db.engine.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+            plan = [row[-1] for row in rows]
+            scans = [detail.split()[1] for detail in plan
+                     if detail.startswith('SCAN ') and 'INDEX' not in detail]
+        else:
+            result = conn.exec_driver_sql('EXPLAIN ' + statement, parameters)
+            rows = [dict(zip(result.keys(), row)) for row in result]
+            plan = [f"{row.get('table')}: type={row.get('type')} key={row.get('key')} rows={row.get('rows')}"
+                    for row in rows]
+            scans = [row.get('table') for row in rows if row.get('type') == 'ALL']
+
+    # 只统计真实数据表：扫描物化子查询 / 派生表 (如 phone_matches) 只涉及已经按索引筛选过的结果集
+    return plan, [table for table in scans if table in db.metadata.tables and table not in SMALL_TABLES]
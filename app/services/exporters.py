@@ -0,0 +1,155 @@
+# app/services/exporters.py
+
+import csv
+import zlib
+from io import StringIO
+
+from sqlalchemy import exc, types
+from app.extensions import db
+from app.services.db_routing import fall_back_to_primary
+
+# 每批从服务端游标读取的行数，同时也是每个 yield 数据块 / Arrow 记录批次包含的行数
+EXPORT_BATCH_SIZE = 5000
+
+# format 参数 -> (Content-Type, 文件扩展名)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=UTF-8', 'csv'),
+    'csv.gz': ('application/gzip', 'csv.gz'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+class ExportError(Exception):
+    """导出格式不可用 (例如未安装 pyarrow)"""
+    pass
+
+
+def iter_batches(statement, batch_size=EXPORT_BATCH_SIZE):
+    """
+    直接在 Core 连接上用服务端游标 (stream_results) 执行，按批 yield 轻量列元组，跳过 ORM 结果加载。
+    查询在响应开始发送后才执行 (read_replica 无法重试)：只读副本在取到第一批数据前出错时在主库上重新执行；
+    已输出数据后出错则直接抛出，下载中断。
+    """
+    try:
+        batches = _execute_batches(statement, batch_size)
+        first = next(batches, None)
+    except exc.OperationalError as e:
+        if not fall_back_to_primary(e):
+            raise
+        batches = _execute_batches(statement, batch_size)
+        first = next(batches, None)
+    if first is not None:
+        yield first
+        yield from batches
+
+
+def _execute_batches(statement, batch_size):
+    result = db.session.connection().execute(
+        statement.execution_options(stream_results=True, yield_per=batch_size)
+    )
+    return result.partitions()
+
+
+def stream_csv(statement, headers, format_row, compress=False):
+    """
+    流式生成 CSV：每批格式化为一个数据块后 yield，内存占用与导出行数无关。
+    compress=True 时输出 gzip 流 (逐块压缩，同样不缓存整份文件)。
+    """
+    data_stream = StringIO()
+    writer = csv.writer(data_stream)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31 即 gzip 格式
+
+    def drain():
+        data = data_stream.getvalue().encode('utf-8')
+        data_stream.seek(0)
+        data_stream.truncate(0)
+        return compressor.compress(data) if compressor else data
+
+    # 写入 CSV 文件头
+    writer.writerow(headers)
+    yield drain()
+
+    # 写入数据行
+    for rows in iter_batches(statement):
+        writer.writerows(map(format_row, rows))
+        chunk = drain()
+        if chunk:
+            yield chunk
+
+    if compressor:
+        yield compressor.flush()
+
+
+def _arrow_type(pa, sql_type):
+    """把查询列的 SQLAlchemy 类型映射为 Arrow 类型"""
+    if isinstance(sql_type, types.Integer):
+        return pa.int64()
+    if isinstance(sql_type, types.Numeric):
+        return pa.decimal128(18, sql_type.scale if sql_type.scale is not None else 2)
+    if isinstance(sql_type, types.DateTime):
+        return pa.timestamp('us')
+    if isinstance(sql_type, types.Date):
+        return pa.date32()
+    return pa.string()
+
+
+class _ChunkSink:
+    """pyarrow 的写出目标：收集写入的字节，每写完一个记录批次后由 drain() 取走"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_columnar(statement, file_format):
+    """
+    以 Arrow IPC 流或 Parquet 格式流式导出：游标每读出一批即转为一个 RecordBatch 写出。
+    列名取查询中的列标签，列类型由 SQLAlchemy 类型推导。需要安装 pyarrow。
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError('Arrow / Parquet 导出需要安装 pyarrow：pip install pyarrow')
+
+    columns = statement.selected_columns
+    schema = pa.schema([(column.key, _arrow_type(pa, column.type)) for column in columns])
+    return _write_columnar(pa, pq, statement, schema, file_format)
+
+
+def _write_columnar(pa, pq, statement, schema, file_format):
+    sink = _ChunkSink()
+    output = pa.PythonFile(sink, mode='w')
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(output, schema, compression='snappy')
+    else:
+        writer = pa.ipc.new_stream(output, schema)
+
+    for rows in iter_batches(statement):
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,109 @@
+# app/services/member_stats.py
+
+from datetime import date, timedelta
+
+from sqlalchemy import select, update, delete, insert, func, case, bindparam
+from app.extensions import db
+from app.models import Member, MemberStats, Order
+from app.services.rollups import upsert_rows
+
+# 会员“近期消费”窗口 (天)：会员列表按近期消费排行
+RECENT_DAYS = 90
+
+
+def recent_window_start():
+    return date.today() - timedelta(days=RECENT_DAYS)
+
+
+def apply_member_orders(orders, sign=1):
+    """
+    订单创建 (sign=1) 或删除 (sign=-1) 时，在当前事务内更新会员累计消费和消费统计。
+    orders 为 [(order_id, member_id, order_date, final_amount), ...]，非会员订单 (member_id 为空) 忽略。
+    累计消费在 SQL 中原子累加 (total_spent = total_spent + ?)，并发订单不会互相覆盖；调用方负责 commit。
+    """
+    since = recent_window_start()
+    spending, recent, counts, latest, order_ids = {}, {}, {}, {}, []
+    for order_id, member_id, order_date, final_amount in orders:
+        if not member_id:
+            continue
+        order_ids.append(order_id)
+        spending[member_id] = spending.get(member_id, 0) + sign * final_amount
+        recent[member_id] = recent.get(member_id, 0) + (final_amount if order_date.date() >= since else 0)
+        counts[member_id] = counts.get(member_id, 0) + sign
+        latest[member_id] = max(latest.get(member_id, order_date), order_date)
+    if not spending:
+        return
+
+    # 1. 多个会员的消费额合并为一条 UPDATE
+    db.session.execute(
+        update(Member)
+        .where(Member.id.in_(list(spending)))
+        .values(total_spent=Member.total_spent + case(spending, value=Member.id))
+        .execution_options(synchronize_session=False)
+    )
+
+    # 2. 消费统计：新订单 upsert 累加订单数与近期消费、取较晚的消费时间 (recent_since 只在插入时写入)
+    if sign > 0:
+        upsert_rows(MemberStats, [
+            {'member_id': member_id, 'order_count': count, 'last_order_at': latest[member_id],
+             'recent_spent': recent[member_id], 'recent_since': since}
+            for member_id, count in counts.items()
+        ], ['member_id'], increment_columns=['order_count', 'recent_spent'], max_columns=['last_order_at'])
+        return
+
+    # 删除订单：最近消费时间和近期消费无法可靠地增量回退 (窗口起点因行而异)，
+    # 按会员订单索引从剩余订单重新计算 (被删除的订单尚未从表中移除)
+    remaining = [
+        Order.member_id == MemberStats.member_id,
+        Order.status == 'Completed',
+        Order.id.not_in(order_ids)
+    ]
+    remaining_latest = select(func.max(Order.order_date)).where(*remaining).scalar_subquery()
+    remaining_recent = select(func.coalesce(func.sum(Order.final_amount), 0)).where(
+        *remaining, Order.order_date >= MemberStats.recent_since
+    ).scalar_subquery()
+    db.session.execute(
+        update(MemberStats)
+        .where(MemberStats.member_id.in_(list(counts)))
+        .values(order_count=MemberStats.order_count + case(counts, value=MemberStats.member_id),
+                last_order_at=remaining_latest,
+                recent_spent=remaining_recent)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def recompute_member_stats():
+    """
+    根据 orders 全量重建会员消费统计，并校正 members.total_spent (修复历史上读-改-写丢失的更新)。
+    只执行一次按会员分组的聚合查询，返回有消费记录的会员数。调用方负责 commit。
+    每日执行一次以滚动“近期消费”窗口。
+    """
+    since = recent_window_start()
+    rows = db.session.execute(
+        select(Order.member_id,
+               func.count(Order.id).label('order_count'),
+               func.sum(Order.final_amount).label('total_spent'),
+               func.max(Order.order_date).label('last_order_at'),
+               func.sum(case((Order.order_date >= since, Order.final_amount), else_=0)).label('recent_spent'))
+        .where(Order.status == 'Completed', Order.member_id.is_not(None))
+        .group_by(Order.member_id)
+    ).all()
+
+    db.session.execute(delete(MemberStats))
+    if rows:
+        db.session.execute(insert(MemberStats), [
+            {'member_id': row.member_id, 'order_count': row.order_count, 'last_order_at': row.last_order_at,
+             'recent_spent': row.recent_spent, 'recent_since': since}
+            for row in rows
+        ])
+
+    # 累计消费：先全部清零 (没有订单的会员)，再按会员参数化 UPDATE (executemany)
+    members_table = Member.__table__
+    db.session.execute(update(members_table).values(total_spent=0))
+    if rows:
+        db.session.execute(
+            update(members_table).where(members_table.c.id == bindparam('member_id'))
+            .values(total_spent=bindparam('amount')),
+            [{'member_id': row.member_id, 'amount': row.total_spent} for row in rows]
+        )
+    return len(rows)
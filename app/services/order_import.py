@@ -0,0 +1,268 @@
+# app/services/order_import.py
+
+import csv
+import json
+from collections import OrderedDict
+from datetime import datetime, timezone
+from io import TextIOWrapper
+
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import Order, OrderItem, ImportedOrder
+from app.services.checkout import aggregate_cart, lock_products, decrement_stock, CheckoutError
+from app.services.pricing import quote, catalog_cache, discount_cache, load_discounts
+from app.services.rollups import apply_orders
+from app.services.member_stats import apply_member_orders
+
+# 每个事务写入的订单数：失败时只回滚当前批次，已提交的批次不受影响
+IMPORT_CHUNK_SIZE = 500
+# 库存被并发订单占用导致条件扣减失败时，整批重新分配的次数
+STOCK_RETRIES = 3
+
+CSV_HEADERS = ['uuid', 'order_date', 'member_id', 'product_id', 'quantity']
+
+
+class ImportReport:
+    """一次导入的结果：imported {uuid: 订单ID}，duplicates 已导入过的 UUID，rejected 被拒绝的记录"""
+
+    def __init__(self):
+        self.imported = OrderedDict()
+        self.duplicates = []
+        self.rejected = []  # [{'uuid', 'line', 'message'}]
+
+    def reject(self, record, message):
+        self.rejected.append({'uuid': record.get('uuid'), 'line': record.get('line'), 'message': message})
+
+    def to_dict(self):
+        return {
+            'success': not self.rejected,
+            'imported': len(self.imported),
+            'duplicates': len(self.duplicates),
+            'rejected': self.rejected,
+            'order_ids': self.imported,
+        }
+
+
+# --- 1. 解析：每条记录 {'uuid', 'order_date', 'member_id', 'items', 'line'} ---
+
+def parse_ndjson(lines):
+    """每行一个订单：{"uuid": ..., "order_date": ISO 时间, "member_id": ..., "items": [{"product_id", "quantity"}]}"""
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+            if not isinstance(data, dict):
+                raise ValueError('每行必须是一个 JSON 对象')
+        except ValueError as e:
+            yield {'line': line_no, 'error': f'JSON 解析失败: {e}'}
+            continue
+        yield {
+            'line': line_no,
+            'uuid': data.get('uuid'),
+            'order_date': data.get('order_date'),
+            'member_id': data.get('member_id'),
+            'items': data.get('items') or [],
+        }
+
+
+def parse_csv(lines):
+    """每行一个订单商品 (表头见 CSV_HEADERS)，同一 uuid 的多行合并为一个订单"""
+    orders = OrderedDict()
+    for line_no, row in enumerate(csv.DictReader(lines), start=2):
+        uuid = (row.get('uuid') or '').strip()
+        record = orders.setdefault(uuid, {
+            'line': line_no,
+            'uuid': uuid,
+            'order_date': row.get('order_date') or None,
+            'member_id': row.get('member_id') or None,
+            'items': [],
+        })
+        record['items'].append({'product_id': row.get('product_id'), 'quantity': row.get('quantity')})
+    return list(orders.values())
+
+
+def parse_batch(stream, file_format):
+    """按格式 ('ndjson' / 'csv') 解析二进制或文本流"""
+    if not hasattr(stream, 'encoding'):
+        stream = TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        return parse_csv(stream)
+    if file_format == 'ndjson':
+        return list(parse_ndjson(stream))
+    raise ValueError(f'不支持的导入格式: {file_format}')
+
+
+# --- 2. 校验：整批一次性检查格式、商品和会员，只需各一次批量查询 ---
+
+def _parse_order_date(value):
+    """ISO 时间；带时区偏移 (如 +08:00) 的换算为 UTC 并去掉时区，与 orders.order_date (UTC，不带时区) 一致"""
+    if not value:
+        return datetime.utcnow()
+    if not isinstance(value, str):
+        raise TypeError('order_date 必须是 ISO 格式字符串')
+    order_date = datetime.fromisoformat(value)
+    if order_date.tzinfo is not None:
+        order_date = order_date.astimezone(timezone.utc).replace(tzinfo=None)
+    return order_date
+
+
+def _validate(records, report):
+    """返回通过格式校验的订单，每条附加 quantities (合并后的 {product_id: quantity}) 与解析后的字段"""
+    valid = []
+    seen = set()
+    for record in records:
+        if 'error' in record:
+            report.reject(record, record['error'])
+            continue
+        uuid = record['uuid']
+        if not uuid or not isinstance(uuid, str) or len(uuid) > 64:
+            report.reject(record, '缺少订单 UUID 或 UUID 超过 64 个字符')
+            continue
+        if uuid in seen:
+            report.reject(record, '同一批次中 UUID 重复')
+            continue
+        seen.add(uuid)
+
+        try:
+            record['quantities'] = aggregate_cart(record['items'])
+            if not record['quantities']:
+                raise CheckoutError('订单不能为空')
+            record['member_id'] = int(record['member_id']) if record['member_id'] not in (None, '') else None
+            record['order_date'] = _parse_order_date(record['order_date'])
+        except CheckoutError as e:
+            report.reject(record, str(e))
+            continue
+        except (KeyError, TypeError, ValueError) as e:
+            report.reject(record, f'字段格式错误: {e}')
+            continue
+        valid.append(record)
+
+    # 商品 / 会员存在性：整批合并后各一次批量读取 (命中进程内缓存时不查询数据库)；计价在写入时加锁读取
+    products = catalog_cache.get_many(sorted({pid for r in valid for pid in r['quantities']}))
+    discounts = discount_cache.get_many(sorted({r['member_id'] for r in valid if r['member_id']}))
+
+    checked = []
+    for record in valid:
+        missing = [pid for pid in record['quantities'] if pid not in products]
+        if missing:
+            report.reject(record, f'商品 ID {missing[0]} 不存在')
+        elif record['member_id'] and record['member_id'] not in discounts:
+            report.reject(record, f"会员 ID {record['member_id']} 不存在")
+        else:
+            checked.append(record)
+    return checked
+
+
+# --- 3. 写入：每个批次一个事务，库存按商品合并后单条 UPDATE 扣减 ---
+
+def _allocate_stock(records):
+    """
+    加锁读取批次内所有商品 (一次查询，价格与库存以数据库为准)，按下单时间依次分配库存；
+    商品已被删除、会员已被删除或库存不够的订单被拒绝。
+    返回 (接受的订单, 被拒绝的 [(订单, 原因)], 接受订单按商品合计的扣减量, 商品快照, {会员 ID: 折扣率})。
+    """
+    products = lock_products({pid for r in records for pid in r['quantities']})
+    discounts = load_discounts(sorted({r['member_id'] for r in records if r['member_id']}))
+    stock = {pid: product.stock_quantity for pid, product in products.items()}
+
+    accepted, rejected, totals = [], [], {}
+    for record in sorted(records, key=lambda r: r['order_date']):
+        missing = [pid for pid in record['quantities'] if pid not in products]
+        short = [pid for pid, qty in record['quantities'].items() if stock.get(pid, 0) < qty]
+        if missing:
+            rejected.append((record, f'商品 ID {missing[0]} 不存在'))
+            continue
+        if record['member_id'] and record['member_id'] not in discounts:
+            rejected.append((record, f"会员 ID {record['member_id']} 不存在"))
+            continue
+        if short:
+            rejected.append((record, f'商品 ID {short[0]} 库存不足'))
+            continue
+        for pid, qty in record['quantities'].items():
+            stock[pid] -= qty
+            totals[pid] = totals.get(pid, 0) + qty
+        accepted.append(record)
+    return accepted, rejected, totals, products, discounts
+
+
+def _import_chunk(records, report):
+    """在一个事务中写入一批订单 (订单头、详情、幂等记录、会员消费、报表汇总)；返回 False 表示库存被并发占用需要重试"""
+    # 幂等：已导入过的 UUID 直接跳过
+    existing = set(db.session.execute(
+        select(ImportedOrder.client_uuid).where(ImportedOrder.client_uuid.in_([r['uuid'] for r in records]))
+    ).scalars())
+    duplicates = [r['uuid'] for r in records if r['uuid'] in existing]
+    records = [r for r in records if r['uuid'] not in existing]
+    if not records:
+        report.duplicates.extend(duplicates)
+        return True
+
+    accepted, rejected, totals, products, discounts = _allocate_stock(records)
+    if totals and not decrement_stock(totals):
+        db.session.rollback()
+        return False
+
+    # 服务端按加锁读到的价格计价 (与在线结算一致)，批量写订单头：ORM flush 在支持的数据库上使用多行 INSERT ... RETURNING 取回主键
+    quotes = [quote(r['quantities'], r['member_id'], products=products, discounts=discounts) for r in accepted]
+    orders = [Order(order_date=r['order_date'], member_id=r['member_id'],
+                    original_amount=q.original_amount, discount_amount=q.discount_amount,
+                    final_amount=q.final_amount, status='Completed')
+              for r, q in zip(accepted, quotes)]
+    db.session.add_all(orders)
+    db.session.flush()
+    order_ids = [o.id for o in orders]  # 提交后对象会过期，先记下主键，避免逐个重新加载
+
+    items, rollup_orders, member_orders = [], [], []
+    for record, order_quote, order_obj in zip(accepted, quotes, orders):
+        lines = [{
+            'order_id': order_obj.id,
+            'product_id': pid,
+            'quantity': qty,
+            'price_at_sale': order_quote.lines[pid][0],
+            'cost_at_sale': products[pid].cost_price,
+            'line_subtotal': order_quote.lines[pid][1],
+        } for pid, qty in record['quantities'].items()]
+        items.extend(lines)
+        rollup_orders.append((order_obj.order_date, order_quote.final_amount, lines))
+        member_orders.append((order_obj.id, record['member_id'], order_obj.order_date, order_quote.final_amount))
+
+    if accepted:
+        db.session.execute(insert(OrderItem), items)
+        db.session.execute(insert(ImportedOrder), [
+            {'client_uuid': r['uuid'], 'order_id': order_id, 'imported_at': datetime.utcnow()}
+            for r, order_id in zip(accepted, order_ids)
+        ])
+    apply_member_orders(member_orders)
+    apply_orders(rollup_orders)
+
+    db.session.commit()
+
+    report.duplicates.extend(duplicates)
+    for record, reason in rejected:
+        report.reject(record, reason)
+    for record, order_id in zip(accepted, order_ids):
+        report.imported[record['uuid']] = order_id
+    return True
+
+
+def import_orders(records, chunk_size=IMPORT_CHUNK_SIZE):
+    """导入已解析的订单记录，返回 ImportReport。每 chunk_size 个订单提交一次"""
+    report = ImportReport()
+    valid = _validate(records, report)
+
+    for offset in range(0, len(valid), chunk_size):
+        chunk = valid[offset:offset + chunk_size]
+        for _ in range(STOCK_RETRIES):
+            try:
+                if _import_chunk(chunk, report):
+                    break
+            except IntegrityError:
+                # 同一 UUID 正被其他请求并发导入：回滚后重试，重试时会识别为重复
+                db.session.rollback()
+        else:
+            for record in chunk:
+                report.reject(record, '库存或订单 UUID 被并发请求占用，本批次未导入，请重新提交')
+    return report
@@ -0,0 +1,164 @@
+# app/services/pagination.py
+
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, date
+from decimal import Decimal
+
+from sqlalchemy import and_, or_
+
+# 总数缓存有效期 (秒)：列表页只需要一个近似总数，不必每次翻页都 COUNT(*)
+COUNT_TTL = 60
+# 最多缓存的总数条数 (每种搜索词 / 筛选组合一条)，超出后按最近最少使用淘汰
+COUNT_CACHE_SIZE = 1000
+
+_count_cache = OrderedDict()  # key -> (过期时间, 总数)
+_count_lock = threading.Lock()
+
+
+def cached_count(query, key):
+    """按 key 缓存 COUNT(*) 结果 COUNT_TTL 秒"""
+    now = time.monotonic()
+    with _count_lock:
+        cached = _count_cache.get(key)
+        if cached and cached[0] > now:
+            _count_cache.move_to_end(key)
+            return cached[1]
+    total = query.order_by(None).count()
+    with _count_lock:
+        _count_cache[key] = (now + COUNT_TTL, total)
+        _count_cache.move_to_end(key)
+        while len(_count_cache) > COUNT_CACHE_SIZE:
+            _count_cache.popitem(last=False)
+    return total
+
+
+def encode_cursor(values):
+    """把排序键的值编码为 URL 安全的游标字符串"""
+    raw = json.dumps([v.isoformat() if isinstance(v, (datetime, date)) else str(v) if isinstance(v, Decimal) else v
+                      for v in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_raw(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+
+
+def decode_offset(cursor):
+    """解析位置游标 (RankedPagination / 搜索结果分页使用)"""
+    return _decode_raw(cursor)[0]
+
+
+def decode_cursor(cursor, columns):
+    """解析游标，按列类型还原日期时间；游标非法时返回 None"""
+    try:
+        values = _decode_raw(cursor)
+        if len(values) != len(columns):
+            return None
+        result = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            elif python_type is Decimal:
+                value = Decimal(value)
+            result.append(value)
+        return result
+    except (ValueError, TypeError, ArithmeticError):
+        return None
+
+
+def _seek(columns, values, forward):
+    """(c1, c2) > (v1, v2) 展开为 c1 > v1 OR (c1 = v1 AND c2 > v2)，便于走复合索引"""
+    clauses = []
+    for i, column in enumerate(columns):
+        compare = column > values[i] if forward else column < values[i]
+        clauses.append(and_(*[columns[j] == values[j] for j in range(i)], compare))
+    return or_(*clauses)
+
+
+class KeysetPagination:
+    """
+    键集 (seek) 分页结果。与 OFFSET 分页不同，任何一页都只扫描 per_page + 1 行。
+    模板使用 items / has_prev / has_next / prev_cursor / next_cursor / total。
+    descending=True 时所有排序列倒序；keys 为 items 上与排序列对应的属性名 (默认取列名，
+    排序列来自 JOIN 的其他表时需要指定)。
+    """
+
+    def __init__(self, query, columns, per_page=10, after=None, before=None, count_key=None,
+                 descending=False, keys=None):
+        self.per_page = per_page
+        self.total = cached_count(query, count_key) if count_key is not None else None
+
+        after_values = decode_cursor(after, columns) if after else None
+        before_values = decode_cursor(before, columns) if before else None
+
+        if before_values is not None:
+            # 向前翻页：反向取 per_page + 1 行再翻转
+            rows = query.filter(_seek(columns, before_values, forward=descending)) \
+                .order_by(*[c.asc() if descending else c.desc() for c in columns]).limit(per_page + 1).all()
+            self.has_prev = len(rows) > per_page
+            self.items = list(reversed(rows[:per_page]))
+            self.has_next = True
+        else:
+            if after_values is not None:
+                query = query.filter(_seek(columns, after_values, forward=not descending))
+            rows = query.order_by(*[c.desc() if descending else c.asc() for c in columns]) \
+                .limit(per_page + 1).all()
+            self.has_next = len(rows) > per_page
+            self.items = rows[:per_page]
+            self.has_prev = after_values is not None
+
+        self._keys = keys or [column.key for column in columns]
+
+    def _cursor(self, item):
+        return encode_cursor([getattr(item, key) for key in self._keys])
+
+    @property
+    def next_cursor(self):
+        return self._cursor(self.items[-1]) if self.has_next and self.items else None
+
+    @property
+    def prev_cursor(self):
+        return self._cursor(self.items[0]) if self.has_prev and self.items else None
+
+
+class RankedPagination:
+    """
+    对按相关度排序的搜索结果分页，游标为结果中的位置。
+    search(limit) 返回 (前 limit 个 ID, 命中总数)；loader(ids) 返回这些 ID 对应的对象 (顺序不限)。
+    与 KeysetPagination 提供相同的模板属性。
+    """
+
+    def __init__(self, search, loader, per_page=10, after=None, before=None):
+        self.per_page = per_page
+
+        start = 0
+        try:
+            if before:
+                start = max(int(decode_offset(before)) - per_page, 0)
+            elif after:
+                start = max(int(decode_offset(after)), 0)
+        except (ValueError, TypeError, IndexError):
+            start = 0
+
+        ids, self.total = search(start + per_page)
+        page_ids = ids[start:start + per_page]
+        objects = {obj.id: obj for obj in loader(page_ids)} if page_ids else {}
+        self.items = [objects[i] for i in page_ids if i in objects]
+        self.has_prev = start > 0
+        self.has_next = start + per_page < self.total
+        self._start = start
+
+    @property
+    def next_cursor(self):
+        return encode_cursor([self._start + self.per_page]) if self.has_next else None
+
+    @property
+    def prev_cursor(self):
+        return encode_cursor([self._start]) if self.has_prev else None
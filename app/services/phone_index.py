@@ -0,0 +1,67 @@
+# app/services/phone_index.py
+
+from sqlalchemy import select, delete, insert, event, inspect
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models import Member, MemberPhoneSuffix
+
+# 全量重建时每批处理的会员数
+REBUILD_BATCH_SIZE = 5000
+
+
+def suffixes(phone_number):
+    """手机号的全部后缀 (去重)，如 '138' -> ['138', '38', '8']"""
+    return list(dict.fromkeys(phone_number[i:] for i in range(len(phone_number))))
+
+
+def matching_members(term):
+    """
+    手机号包含 term 的会员 ID 子查询 (去重)，调用方与会员表或订单表 JOIN。
+    前缀条件写成 suffix >= term AND suffix < 上界 的范围比较：任何数据库都能走主键范围扫描
+    (SQLite 的 LIKE ... ESCAPE 无法使用索引)，不再全表扫描 members。
+    """
+    upper = term[:-1] + chr(ord(term[-1]) + 1)
+    return select(MemberPhoneSuffix.member_id).where(
+        MemberPhoneSuffix.suffix >= term, MemberPhoneSuffix.suffix < upper
+    ).distinct().subquery('phone_matches')
+
+
+def _index_rows(member_id, phone_number):
+    return [{'suffix': s, 'member_id': member_id} for s in suffixes(phone_number or '')]
+
+
+@event.listens_for(Session, 'before_flush')
+def _drop_deleted_phone_index(session, flush_context, instances):
+    """会员删除前先删除其后缀索引行 (flush 之后再删会违反 member_phone_suffixes 的外键约束)"""
+    member_ids = [obj.id for obj in session.deleted if isinstance(obj, Member) and obj.id is not None]
+    if member_ids:
+        session.connection().execute(delete(MemberPhoneSuffix).where(MemberPhoneSuffix.member_id.in_(member_ids)))
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_phone_index(session, flush_context):
+    """会员新增或修改手机号时，在同一事务内同步后缀索引"""
+    connection = session.connection()
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Member):
+            continue
+        if obj in session.dirty and not inspect(obj).attrs.phone_number.history.has_changes():
+            continue
+        connection.execute(delete(MemberPhoneSuffix).where(MemberPhoneSuffix.member_id == obj.id))
+        rows = _index_rows(obj.id, obj.phone_number)
+        if rows:
+            connection.execute(insert(MemberPhoneSuffix), rows)
+
+
+def rebuild_phone_index():
+    """根据会员表全量重建后缀索引 (用于已有数据库或绕过 ORM 批量导入会员之后)，返回写入行数"""
+    db.session.execute(delete(MemberPhoneSuffix))
+    total = 0
+    members = db.session.execute(select(Member.id, Member.phone_number)).all()
+    for offset in range(0, len(members), REBUILD_BATCH_SIZE):
+        rows = [row for member_id, phone_number in members[offset:offset + REBUILD_BATCH_SIZE]
+                for row in _index_rows(member_id, phone_number)]
+        if rows:
+            db.session.execute(insert(MemberPhoneSuffix), rows)
+        total += len(rows)
+    return total
@@ -0,0 +1,207 @@
+# app/services/pricing.py
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import select, event
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models import Product, Member
+
+CENT = Decimal('0.01')
+
+# 进程内缓存的最大条目数，超出后按最近最少使用 (LRU) 淘汰
+CATALOG_CACHE_SIZE = 10000
+DISCOUNT_CACHE_SIZE = 10000
+# 条目有效期 (秒)：Session 事件只能使本进程的缓存失效，其他进程的修改最迟在有效期后可见。
+# 结算与导入计价不使用缓存 (在事务内加锁读取)，缓存只用于联想搜索、校验与计价预览
+SNAPSHOT_TTL = 60
+
+# 商品目录快照：结算所需的全部商品字段
+ProductSnapshot = namedtuple('ProductSnapshot', 'id name unit retail_price cost_price stock_quantity')
+
+
+class SnapshotCache:
+    """
+    进程内版本化 LRU 快照缓存：{id: 值}，最多保留 maxsize 条，每条最多保留 ttl 秒。
+    未命中或过期的 id 通过 loader 一次批量加载；invalidate 时版本号 +1，
+    加载期间若版本号发生变化则丢弃结果，避免把旧数据写回缓存。
+    hits / misses 按 id 计数。
+    """
+
+    def __init__(self, loader, maxsize=None, ttl=None):
+        self._loader = loader  # callable(ids) -> {id: value}
+        self._data = OrderedDict()  # id -> (过期时间, 值)
+        self._lock = threading.Lock()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, ids):
+        result = {}
+        now = time.monotonic()
+        with self._lock:
+            for i in ids:
+                entry = self._data.get(i)
+                if entry is None:
+                    continue
+                if entry[0] <= now:
+                    del self._data[i]
+                    continue
+                self._data.move_to_end(i)
+                result[i] = entry[1]
+            missing = [i for i in ids if i not in result]
+            self.hits += len(result)
+            self.misses += len(missing)
+            version = self.version
+
+        if missing:
+            loaded = self._loader(missing)
+            with self._lock:
+                if version == self.version:
+                    expires = time.monotonic() + self.ttl if self.ttl is not None else float('inf')
+                    self._data.update((i, (expires, value)) for i, value in loaded.items())
+                    while self.maxsize is not None and len(self._data) > self.maxsize:
+                        self._data.popitem(last=False)
+            result.update(loaded)
+        return result
+
+    def update(self, key, func):
+        """对已缓存的条目就地应用 func(旧值) -> 新值 (有效期不变)；未缓存时忽略"""
+        with self._lock:
+            if key in self._data:
+                expires, value = self._data[key]
+                self._data[key] = (expires, func(value))
+
+    def invalidate(self, key=None):
+        """key 为空时清空全部快照"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+            self.version += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+def load_products(product_ids):
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.unit, Product.retail_price, Product.cost_price,
+               Product.stock_quantity).where(Product.id.in_(product_ids))
+    ).all()
+    return {row.id: ProductSnapshot(*row) for row in rows}
+
+
+def load_discounts(member_ids):
+    rows = db.session.execute(
+        select(Member.id, Member.discount_rate).where(Member.id.in_(member_ids))
+    ).all()
+    return {row.id: row.discount_rate if row.discount_rate is not None else Decimal('1.00') for row in rows}
+
+
+# 商品目录快照 / 会员折扣率快照，由下方的 Session 事件在本进程的相关改动提交后失效，或在 SNAPSHOT_TTL 后过期
+catalog_cache = SnapshotCache(load_products, maxsize=CATALOG_CACHE_SIZE, ttl=SNAPSHOT_TTL)
+discount_cache = SnapshotCache(load_discounts, maxsize=DISCOUNT_CACHE_SIZE, ttl=SNAPSHOT_TTL)
+
+
+# --- 缓存失效：改动先记录在 session.info 中，事务提交后才作用到缓存，回滚则丢弃 ---
+
+def record_stock_change(session, quantities, sign=-1):
+    """记录本事务内对商品库存的批量 (Core) 修改：{product_id: quantity}，sign=-1 为扣减"""
+    deltas = session.info.setdefault('catalog_stock_deltas', {})
+    for product_id, quantity in quantities.items():
+        deltas[product_id] = deltas.get(product_id, 0) + sign * quantity
+
+
+def record_catalog_changes(session, product_ids):
+    """记录本事务内绕过 ORM (Core 批量语句) 修改过的商品，提交后使其快照失效"""
+    session.info.setdefault('catalog_evict', set()).update(product_ids)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_invalidations(session, flush_context, instances):
+    """ORM 修改 / 删除商品或会员时记录需要失效的 id (新增的行不在缓存中，无需处理)"""
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Product):
+            session.info.setdefault('catalog_evict', set()).add(obj.id)
+        elif isinstance(obj, Member):
+            session.info.setdefault('discount_evict', set()).add(obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_invalidations(session):
+    for product_id in session.info.pop('catalog_evict', ()):
+        catalog_cache.invalidate(product_id)
+    for member_id in session.info.pop('discount_evict', ()):
+        discount_cache.invalidate(member_id)
+    # 结算扣减的库存直接同步到快照，热销商品不必因每笔订单重新加载
+    for product_id, delta in session.info.pop('catalog_stock_deltas', {}).items():
+        catalog_cache.update(product_id, lambda snap: snap._replace(stock_quantity=snap.stock_quantity + delta))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    for key in ('catalog_evict', 'discount_evict', 'catalog_stock_deltas'):
+        session.info.pop(key, None)
+
+
+class Quote:
+    """一次计价结果，所有金额均为保留两位小数的 Decimal"""
+
+    def __init__(self, lines, original_amount, discount_rate, discount_amount, final_amount, price_version):
+        self.lines = lines  # {product_id: (price, subtotal)}
+        self.original_amount = original_amount
+        self.discount_rate = discount_rate
+        self.discount_amount = discount_amount
+        self.final_amount = final_amount
+        self.price_version = price_version
+
+    def to_dict(self):
+        return {
+            'original_amount': float(self.original_amount),
+            'discount_rate': float(self.discount_rate),
+            'discount_amount': float(self.discount_amount),
+            'final_amount': float(self.final_amount),
+        }
+
+
+def quote(quantities, member_id=None, products=None, discounts=None):
+    """
+    服务端计价：按零售价计算每行小计，再按会员折扣率计算折扣与实付金额。
+    quantities 为 {product_id: quantity}；products / discounts 为调用方已取得的商品快照与 {会员 ID: 折扣率}
+    (可选，缺省时读取缓存)。商品或会员不存在时抛出 KeyError。
+    """
+    price_version = catalog_cache.version
+    if products is None:
+        products = catalog_cache.get_many(list(quantities))
+    prices = {product_id: products[product_id].retail_price for product_id in quantities}
+
+    # 单次遍历算出所有行小计
+    lines = {
+        product_id: (prices[product_id],
+                     (prices[product_id] * quantity).quantize(CENT, rounding=ROUND_HALF_UP))
+        for product_id, quantity in quantities.items()
+    }
+    original_amount = sum((subtotal for _, subtotal in lines.values()), Decimal('0.00'))
+
+    discount_rate = Decimal('1.00')
+    if member_id:
+        discount_rate = (discounts if discounts is not None else discount_cache.get_many([member_id]))[member_id]
+
+    final_amount = (original_amount * discount_rate).quantize(CENT, rounding=ROUND_HALF_UP)
+    discount_amount = original_amount - final_amount
+
+    return Quote(lines, original_amount, discount_rate, discount_amount, final_amount, price_version)
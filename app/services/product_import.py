@@ -0,0 +1,225 @@
+# app/services/product_import.py
+
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from io import TextIOWrapper
+
+from sqlalchemy import select
+from app.extensions import db
+from app.models import Product, Category
+from app.services.checkout import decrement_stock
+from app.services.pricing import record_catalog_changes
+from app.services.product_search import record_product_changes
+from app.services.rollups import upsert_rows
+
+# 每条 INSERT ... ON DUPLICATE KEY UPDATE 语句写入的行数 (同时也是按名称批量读取现有商品的批次大小)
+UPSERT_CHUNK_SIZE = 1000
+
+CSV_HEADERS = ['name', 'category', 'retail_price', 'cost_price', 'unit', 'stock_delta']
+
+# 按名称覆盖的字段；库存按 stock_delta 累加
+REPLACE_COLUMNS = ['category_id', 'retail_price', 'cost_price', 'unit']
+
+
+class ProductImportReport:
+    """一次商品批量导入的结果：inserted / updated 为新增和更新的商品数，errors 为被拒绝的行"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []  # [{'line', 'name', 'message'}]
+
+    def reject(self, row, message):
+        self.errors.append({'line': row.get('line'), 'name': row.get('name'), 'message': message})
+
+    def to_dict(self):
+        return {
+            'success': not self.errors,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'errors': self.errors,
+        }
+
+
+# --- 1. 解析：每行 {'line', 'name', 'category', 'retail_price', 'cost_price', 'unit', 'stock_delta'} ---
+
+def parse_csv(lines):
+    """表头见 CSV_HEADERS；更新已有商品时除 name 外的列均可留空 (保持原值)"""
+    rows = []
+    for line_no, row in enumerate(csv.DictReader(lines), start=2):
+        rows.append({'line': line_no, **{key: (row.get(key) or '').strip() or None for key in CSV_HEADERS}})
+    return rows
+
+
+def parse_json(text):
+    """JSON 数组，每个元素是一个字段同 CSV_HEADERS 的对象"""
+    data = json.loads(text)
+    if not isinstance(data, list):
+        raise ValueError('JSON 顶层必须是数组')
+    rows = []
+    for line_no, item in enumerate(data, start=1):
+        if not isinstance(item, dict):
+            rows.append({'line': line_no, 'name': None, 'error': '每个元素必须是一个 JSON 对象'})
+            continue
+        rows.append({'line': line_no, **{key: item.get(key) for key in CSV_HEADERS}})
+    return rows
+
+
+def parse_products(stream, file_format):
+    """按格式 ('csv' / 'json') 解析二进制或文本流"""
+    if not hasattr(stream, 'encoding'):
+        stream = TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        return parse_csv(stream)
+    if file_format == 'json':
+        return parse_json(stream.read())
+    raise ValueError(f'不支持的导入格式: {file_format}')
+
+
+# --- 2. 校验：字段格式逐行检查，分类与现有商品各一次批量查询 ---
+
+def _price(value, label):
+    if value in (None, ''):
+        return None
+    try:
+        price = Decimal(str(value)).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'{label}不是有效的数字')
+    if price < Decimal('0.01'):
+        raise ValueError(f'{label}必须大于 0')
+    return price
+
+
+def _check_format(row):
+    """返回规范化后的字段，格式错误时抛出 ValueError"""
+    name = str(row.get('name') or '').strip()
+    if not name or len(name) > 100:
+        raise ValueError('商品名称不能为空且不超过 100 个字符')
+    unit = str(row['unit']).strip() if row.get('unit') not in (None, '') else None
+    if unit is not None and len(unit) > 20:
+        raise ValueError('单位不能超过 20 个字符')
+    try:
+        stock_delta = int(row.get('stock_delta') or 0)
+    except (TypeError, ValueError):
+        raise ValueError('库存变动必须是整数')
+    return {
+        'name': name,
+        'category': str(row['category']).strip() if row.get('category') not in (None, '') else None,
+        'retail_price': _price(row.get('retail_price'), '零售价'),
+        'cost_price': _price(row.get('cost_price'), '成本价'),
+        'unit': unit,
+        'stock_delta': stock_delta,
+    }
+
+
+def _validate(rows, report):
+    """返回通过格式校验的行 (附加规范化字段 values)；同一文件中名称重复的行被拒绝"""
+    valid, seen = [], set()
+    for row in rows:
+        if 'error' in row:
+            report.reject(row, row['error'])
+            continue
+        try:
+            row['values'] = _check_format(row)
+        except ValueError as e:
+            report.reject(row, str(e))
+            continue
+        name = row['values']['name']
+        if name in seen:
+            report.reject(row, '同一文件中商品名称重复')
+            continue
+        seen.add(name)
+        valid.append(row)
+    return valid
+
+
+def _build_rows(rows, categories, existing, report):
+    """
+    合并现有商品的字段，生成 upsert 行。
+    返回 (upsert 行, 已有商品 ID, 新商品名称)；缺少必填字段或库存将变为负数的行被拒绝。
+    减少库存的行先执行条件 UPDATE (库存不足时不更新)，不按读取到的库存判断：
+    读取之后并发结算仍可能扣减库存。
+    """
+    upserts, updated_ids, new_names = [], [], []
+    for row in rows:
+        values = row['values']
+        current = existing.get(values['name'])
+
+        if values['category'] is not None and values['category'] not in categories:
+            report.reject(row, f"分类 \"{values['category']}\" 不存在")
+            continue
+        category_id = categories[values['category']] if values['category'] is not None else None
+
+        if current is None:
+            missing = [label for label, value in (('分类', category_id), ('零售价', values['retail_price']),
+                                                  ('成本价', values['cost_price']), ('单位', values['unit']))
+                       if value is None]
+            if missing:
+                report.reject(row, f"新商品缺少{'、'.join(missing)}")
+                continue
+            if values['stock_delta'] < 0:
+                report.reject(row, '新商品的库存不能为负数')
+                continue
+
+        stock_delta = values['stock_delta']
+        if current is not None and stock_delta < 0:
+            if not decrement_stock({current.id: -stock_delta}):
+                report.reject(row, f'库存不足，无法减少 {-stock_delta}')
+                continue
+            stock_delta = 0  # 已扣减，upsert 不再累加
+
+        upserts.append({
+            'name': values['name'],
+            'category_id': category_id if category_id is not None else current.category_id,
+            'retail_price': values['retail_price'] if values['retail_price'] is not None else current.retail_price,
+            'cost_price': values['cost_price'] if values['cost_price'] is not None else current.cost_price,
+            'unit': values['unit'] if values['unit'] is not None else current.unit,
+            'stock_quantity': stock_delta,
+        })
+        if current is None:
+            new_names.append(values['name'])
+        else:
+            updated_ids.append(current.id)
+    return upserts, updated_ids, new_names
+
+
+# --- 3. 写入：整个文件一个事务，按名称 (唯一键) 批量 upsert，库存按变动量原子累加 ---
+
+def import_products(rows, chunk_size=UPSERT_CHUNK_SIZE):
+    """导入已解析的商品行，返回 ProductImportReport。通过校验的行在同一事务中写入，出错时整体回滚"""
+    report = ProductImportReport()
+    valid = _validate(rows, report)
+
+    # 分类按名称一次读取
+    category_names = {row['values']['category'] for row in valid if row['values']['category'] is not None}
+    categories = dict(db.session.execute(
+        select(Category.name, Category.id).where(Category.name.in_(category_names))
+    ).all()) if category_names else {}
+
+    try:
+        for offset in range(0, len(valid), chunk_size):
+            chunk = valid[offset:offset + chunk_size]
+            existing = {r.name: r for r in db.session.execute(
+                select(Product.id, Product.name, Product.category_id, Product.retail_price,
+                       Product.cost_price, Product.unit, Product.stock_quantity)
+                .where(Product.name.in_([row['values']['name'] for row in chunk]))
+            )}
+            upserts, updated_ids, new_names = _build_rows(chunk, categories, existing, report)
+            upsert_rows(Product, upserts, ['name'],
+                        increment_columns=['stock_quantity'], replace_columns=REPLACE_COLUMNS)
+
+            # Core 语句不经过 ORM flush：手动登记商品目录缓存失效与搜索索引新增，提交后生效
+            record_catalog_changes(db.session, updated_ids)
+            if new_names:
+                record_product_changes(db.session, dict(db.session.execute(
+                    select(Product.id, Product.name).where(Product.name.in_(new_names))
+                ).all()))
+            report.inserted += len(new_names)
+            report.updated += len(updated_ids)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    report.errors.sort(key=lambda error: error['line'])
+    return report
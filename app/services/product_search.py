@@ -0,0 +1,285 @@
+# app/services/product_search.py
+
+import bisect
+import heapq
+import threading
+
+from sqlalchemy import select, event, inspect
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models import Product
+from app.services.cache_generation import CATALOG, mark_changed, current_generation, committed_generation
+
+# GB2312 一级汉字按拼音排序，各声母首字的区位码即分界点 (没有 I / U / V 开头的拼音)
+_GB2312_BOUNDARIES = [
+    (0xB0A1, 'a'), (0xB0C5, 'b'), (0xB2C1, 'c'), (0xB4EE, 'd'), (0xB6EA, 'e'), (0xB7A2, 'f'),
+    (0xB8C1, 'g'), (0xB9FE, 'h'), (0xBBF7, 'j'), (0xBFA6, 'k'), (0xC0AC, 'l'), (0xC2E8, 'm'),
+    (0xC4C3, 'n'), (0xC5B6, 'o'), (0xC5BE, 'p'), (0xC6DA, 'q'), (0xC8BB, 'r'), (0xC8F6, 's'),
+    (0xCBFA, 't'), (0xCDDA, 'w'), (0xCEF4, 'x'), (0xD1B9, 'y'), (0xD4D1, 'z'),
+]
+_GB2312_LEVEL1_END = 0xD7F9
+_BOUNDARY_CODES = [code for code, _ in _GB2312_BOUNDARIES]
+
+# 二级汉字不按拼音排序，这里补充水果名称中的常用字
+_EXTRA_INITIALS = {
+    '莓': 'm', '猕': 'm', '橘': 'j', '枇': 'p', '杷': 'p', '葚': 's', '橄': 'g', '榄': 'l', '荸': 'b', '荠': 'q',
+}
+
+try:
+    # 安装了 pypinyin 时使用其完整字库 (pip install pypinyin)
+    from pypinyin import lazy_pinyin, Style
+except ImportError:
+    lazy_pinyin = None
+
+
+def _char_initial(ch):
+    """单个汉字的拼音首字母，无法识别时返回 None"""
+    if ch in _EXTRA_INITIALS:
+        return _EXTRA_INITIALS[ch]
+    try:
+        encoded = ch.encode('gb2312')
+    except UnicodeEncodeError:
+        return None
+    if len(encoded) != 2:
+        return None
+    code = encoded[0] << 8 | encoded[1]
+    if code < _BOUNDARY_CODES[0] or code > _GB2312_LEVEL1_END:
+        return None
+    return _GB2312_BOUNDARIES[bisect.bisect_right(_BOUNDARY_CODES, code) - 1][1]
+
+
+def normalize(text):
+    """统一小写、去掉空白"""
+    return ''.join((text or '').lower().split())
+
+
+def pinyin_initials(name):
+    """名称的拼音首字母串，如 '红富士苹果' -> 'hfspg'；字母数字原样保留，无法识别的汉字记为 '?'"""
+    name = normalize(name)
+    if lazy_pinyin is not None:
+        letters = lazy_pinyin(name, style=Style.FIRST_LETTER, errors=lambda s: list(s))
+        return ''.join(letter[:1] if letter else '?' for letter in letters)
+
+    letters = []
+    for ch in name:
+        if ch.isascii():
+            letters.append(ch)
+        else:
+            letters.append(_char_initial(ch) or '?')
+    return ''.join(letters)
+
+
+def _grams(text):
+    """文本的全部 1 ~ 3 元组 (连续子串)"""
+    return {text[i:i + n] for n in (1, 2, 3) for i in range(len(text) - n + 1)}
+
+
+def _query_grams(term):
+    """不超过 3 个字的查询词本身就是一个 n-gram；更长的取其全部三元组求交"""
+    return [term] if len(term) <= 3 else [term[i:i + 3] for i in range(len(term) - 2)]
+
+
+# 前缀倒排记录的最大前缀长度，更长的查询词先按此长度取候选再逐个校验
+PREFIX_LEN = 4
+
+
+class SearchResult:
+    """一次搜索的结果：total 为命中总数，ids 为按相关度排序的前 limit 个商品 ID"""
+
+    def __init__(self, ids, total):
+        self.ids = ids
+        self.total = total
+
+
+class ProductSearchIndex:
+    """
+    进程内商品名称倒排索引：名称及其拼音首字母串各自的 1 ~ 3 元组 / 前缀 -> 文档集合。
+    文档以序号 (名称长度 << 32 | 商品 ID) 表示，集合中的整数顺序即同级结果的排序 (名称越短越靠前)，
+    取前 N 条时不必对全部命中结果排序。
+    首次查询时从数据库构建，之后随本进程商品的新增 / 改名 / 删除 (Session 事件) 增量更新；
+    每次查询比较数据库中的商品目录代数，其他进程 (或 CLI) 修改过商品时全量重建。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # 保护倒排表
+        self._build_lock = threading.Lock()  # 同一时间只有一个线程从数据库重建
+        self._reset()
+
+    def _reset(self):
+        self._grams = ({}, {})  # (名称 n-gram, 拼音首字母 n-gram) -> set(序号)
+        self._prefixes = ({}, {})  # (名称前缀, 拼音首字母前缀) -> set(序号)
+        self._docs = {}  # 序号 -> (名称, 拼音首字母串)
+        self._ordinals = {}  # 商品 ID -> 序号
+        self._exact = {}  # 名称 -> 序号
+        self._built = False
+        self._generation = None  # 索引已包含的商品目录代数；None 表示不跟踪数据库 (调用方直接 build)
+
+    def _postings(self, doc):
+        """文档在各倒排表中的键：[(倒排表, 键), ...]"""
+        keys = []
+        for field, text in enumerate(doc):
+            keys.extend((self._grams[field], gram) for gram in _grams(text))
+            keys.extend((self._prefixes[field], text[:n]) for n in range(1, min(len(text), PREFIX_LEN) + 1))
+        return keys
+
+    def _add(self, product_id, name):
+        doc = (normalize(name), pinyin_initials(name))
+        ordinal = len(doc[0]) << 32 | product_id
+        self._docs[ordinal] = doc
+        self._ordinals[product_id] = ordinal
+        self._exact[doc[0]] = ordinal
+        for table, key in self._postings(doc):
+            table.setdefault(key, set()).add(ordinal)
+
+    def _remove(self, product_id):
+        ordinal = self._ordinals.pop(product_id, None)
+        if ordinal is None:
+            return
+        doc = self._docs.pop(ordinal)
+        if self._exact.get(doc[0]) == ordinal:
+            del self._exact[doc[0]]
+        for table, key in self._postings(doc):
+            ordinals = table.get(key)
+            if ordinals is not None:
+                ordinals.discard(ordinal)
+                if not ordinals:
+                    del table[key]
+
+    def build(self, rows, generation=None):
+        """用 [(id, name), ...] 全量重建；generation 为读取 rows 之前的商品目录代数"""
+        with self._lock:
+            self._reset()
+            for product_id, name in rows:
+                self._add(product_id, name)
+            self._built = True
+            self._generation = generation
+
+    def _ensure_current(self):
+        """索引未构建，或数据库中的代数与索引不一致 (其他进程改过商品) 时从数据库重建"""
+        if self._built and self._generation is None:
+            return
+        if self._built and current_generation(db.session, CATALOG) == self._generation:
+            return
+        with self._build_lock:
+            # 先读代数再读商品：构建期间提交的修改会使代数大于索引记录的值，下次查询时再次重建
+            generation = current_generation(db.session, CATALOG)
+            if self._built and generation == self._generation:
+                return  # 等锁期间其他线程已重建
+            self.build(db.session.execute(select(Product.id, Product.name)).all(), generation)
+
+    def apply_changes(self, upserts, deletes, generation=None):
+        """
+        upserts: {id: name}；deletes: 商品 ID 集合；generation 为本次提交后的商品目录代数。
+        索引尚未构建时忽略 (构建时会读取最新数据)。索引恰好落后一代时推进代数，
+        否则说明期间有其他进程的修改，保持原代数使下次查询全量重建。
+        """
+        with self._lock:
+            if not self._built:
+                return
+            for product_id in deletes:
+                self._remove(product_id)
+            for product_id, name in upserts.items():
+                self._remove(product_id)
+                self._add(product_id, name)
+            if generation is not None and self._generation is not None and self._generation == generation - 1:
+                self._generation = generation
+
+    def invalidate(self):
+        """丢弃索引，下次查询时重新构建"""
+        with self._lock:
+            self._reset()
+
+    def _contains(self, field, term):
+        """该字段包含 term 的文档：n-gram 倒排求交，查询词超过三个字时再校验是否为连续子串"""
+        postings = [self._grams[field].get(gram) for gram in _query_grams(term)]
+        if any(ordinals is None for ordinals in postings):
+            return set()
+        postings.sort(key=len)
+        matched = postings[0].intersection(*postings[1:])
+        if len(term) > 3:
+            matched = {o for o in matched if term in self._docs[o][field]}
+        return matched
+
+    def _starts_with(self, field, term, candidates):
+        matched = candidates & self._prefixes[field].get(term[:PREFIX_LEN], set())
+        if len(term) > PREFIX_LEN:
+            matched = {o for o in matched if self._docs[o][field].startswith(term)}
+        return matched
+
+    def search(self, term, limit=None):
+        """
+        返回 SearchResult，ids 按相关度排序 (limit 为空时返回全部)：
+        名称完全一致 > 名称前缀 > 拼音首字母前缀 > 名称包含 > 拼音首字母包含，同级名称越短越靠前。
+        """
+        term = normalize(term)
+        if not term:
+            return SearchResult([], 0)
+        self._ensure_current()
+
+        with self._lock:
+            in_name = self._contains(0, term)
+            in_initials = self._contains(1, term)
+            exact = {self._exact[term]} if term in self._exact else set()
+            name_prefix = self._starts_with(0, term, in_name) - exact
+            initials_prefix = self._starts_with(1, term, in_initials) - exact - name_prefix
+            seen = exact | name_prefix | initials_prefix
+            rest_name = in_name - seen
+            rest_initials = in_initials - seen - rest_name
+            tiers = [exact, name_prefix, initials_prefix, rest_name, rest_initials]
+
+        total = sum(len(tier) for tier in tiers)
+        wanted = total if limit is None else min(limit, total)
+        ranked = []
+        for tier in tiers:
+            if len(ranked) >= wanted:
+                break
+            need = wanted - len(ranked)
+            ranked.extend(sorted(tier) if need >= len(tier) else heapq.nsmallest(need, tier))
+        return SearchResult([ordinal & 0xFFFFFFFF for ordinal in ranked], total)
+
+
+product_index = ProductSearchIndex()
+
+
+# --- 索引维护：flush 时记录商品改动并标记商品目录代数，事务提交后再作用到索引，回滚则丢弃 ---
+
+def record_product_changes(session, upserts):
+    """记录本事务内绕过 ORM (Core 批量语句) 新增或改名的商品：{id: name}，提交后更新索引"""
+    session.info.setdefault('search_upserts', {}).update(upserts)
+    if upserts:
+        mark_changed(session, CATALOG)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_product_changes(session, flush_context):
+    """只关心新增、删除和改名 (库存、价格变化不影响索引，也不推进代数)"""
+    upserts = session.info.setdefault('search_upserts', {})
+    deletes = session.info.setdefault('search_deletes', set())
+    for obj in session.new:
+        if isinstance(obj, Product):
+            upserts[obj.id] = obj.name
+            deletes.discard(obj.id)
+            mark_changed(session, CATALOG)
+    for obj in session.dirty:
+        if isinstance(obj, Product) and inspect(obj).attrs.name.history.has_changes():
+            upserts[obj.id] = obj.name
+            mark_changed(session, CATALOG)
+    for obj in session.deleted:
+        if isinstance(obj, Product):
+            upserts.pop(obj.id, None)
+            deletes.add(obj.id)
+            mark_changed(session, CATALOG)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_product_changes(session):
+    upserts = session.info.pop('search_upserts', {})
+    deletes = session.info.pop('search_deletes', set())
+    if upserts or deletes:
+        product_index.apply_changes(upserts, deletes, generation=committed_generation(session, CATALOG))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_product_changes(session):
+    session.info.pop('search_upserts', None)
+    session.info.pop('search_deletes', None)
@@ -0,0 +1,184 @@
+# app/services/report_cache.py
+
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+from flask import current_app, has_app_context, request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models import Product
+from app.services.cache_generation import REPORTS, mark_changed, current_generation
+
+# 报表缓存键中包含数据库中的“报表代数”：订单新增 / 删除 (汇总表变化) 或商品改名后加一 (任何进程、CLI 均如此)，
+# 旧代数的缓存条目不再被读取，随 LRU / TTL 淘汰
+
+
+class MemoryBackend:
+    """进程内 LRU + TTL，条目不在进程间共享 (代数在数据库中，失效对所有进程同时生效)"""
+
+    def __init__(self, maxsize=512, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (过期时间, 值)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class RedisBackend:
+    """Redis 兼容存储 (redis-py 客户端或 FakeRedis)，多个进程共享缓存条目"""
+
+    def __init__(self, client, ttl=300, prefix='fruit:report:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+
+class FakeRedis:
+    """测试用的进程内 Redis 替身，只实现 RedisBackend 用到的 get / set"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}  # key -> (过期时间或 None, 值)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (entry[0] is not None and entry[0] <= time.monotonic()):
+                self._data.pop(key, None)
+                return None
+            return entry[1]
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            if not isinstance(value, bytes):
+                value = str(value).encode()
+            self._data[key] = (time.monotonic() + ex if ex else None, value)
+
+
+def make_backend(config):
+    """按 REPORT_CACHE_BACKEND (memory / redis / fake / none) 创建缓存后端"""
+    backend = config.get('REPORT_CACHE_BACKEND', 'memory')
+    ttl = config.get('REPORT_CACHE_TTL', 300)
+    if backend == 'none':
+        return None
+    if backend == 'memory':
+        return MemoryBackend(ttl=ttl)
+    if backend == 'fake':
+        return RedisBackend(FakeRedis(), ttl=ttl)
+    if backend == 'redis':
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('REPORT_CACHE_BACKEND=redis 需要安装 redis：pip install redis')
+        return RedisBackend(redis.Redis.from_url(config['REPORT_CACHE_URL']), ttl=ttl)
+    raise ValueError(f'未知的报表缓存后端: {backend}')
+
+
+def init_report_cache(app):
+    """创建本应用的报表缓存后端 (REPORT_CACHE_BACKEND=none 时不缓存)"""
+    app.extensions['report_cache'] = make_backend(app.config)
+
+
+def get_backend():
+    return current_app.extensions.get('report_cache') if has_app_context() else None
+
+
+def _key(name, *parts):
+    """代数 + 当天日期 (“近 N 天”的窗口随日期滚动) + 参数 -> 缓存键"""
+    raw = json.dumps([name, date.today().isoformat(), *parts], sort_keys=True, default=str)
+    return f'{name}:{hashlib.sha1(raw.encode()).hexdigest()[:16]}'
+
+
+def cached_value(name, compute, *parts):
+    """缓存 compute() 的 JSON 可序列化结果 (看板页的汇总数字等)"""
+    backend = get_backend()
+    if backend is None:
+        return compute()
+    key = _key(name, current_generation(db.session, REPORTS), *parts)
+    cached = backend.get(key)
+    if cached is not None:
+        return json.loads(cached)
+    value = compute()
+    backend.set(key, json.dumps(value).encode())
+    return value
+
+
+def cached_report(name):
+    """
+    报表 JSON 接口装饰器：同一代数、同一天、同样参数的请求直接返回缓存的响应体，只执行一条读取代数的主键查询；
+    ETag 为响应体的摘要，只有当前有效的缓存内容与浏览器的 If-None-Match 一致时才返回 304。只缓存 200 响应。
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            backend = get_backend()
+            if backend is None:
+                return view(*args, **kwargs)
+
+            key = _key(name, current_generation(db.session, REPORTS), sorted(request.args.items(multi=True)), kwargs)
+            body = backend.get(key)
+            if body is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                backend.set(key, body)
+
+            # 响应体相同的各进程给出相同的 ETag；缓存过期或代数变化后重新计算，内容变了 ETag 也随之改变
+            etag = hashlib.sha1(body).hexdigest()[:16]
+            if request.if_none_match.contains(etag):
+                return _conditional(Response(status=304), etag)
+            return _conditional(Response(body, mimetype='application/json'), etag)
+        return wrapper
+    return decorator
+
+
+def _conditional(response, etag):
+    response.set_etag(etag)
+    # 每次都向服务器确认 (命中时只返回 304)，不同管理员的浏览器不共享缓存
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+# --- 失效：汇总表或商品名称在事务中变化时记录，提交时在同一事务内把报表代数加一，回滚则丢弃 ---
+
+def mark_reports_stale(session):
+    mark_changed(session, REPORTS)
+
+
+@event.listens_for(Session, 'before_flush')
+def _mark_product_changes(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Product):
+            mark_reports_stale(session)
+            return
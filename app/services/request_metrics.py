@@ -0,0 +1,224 @@
+# app/services/request_metrics.py
+
+import heapq
+import threading
+import time
+
+from flask import g, request, has_app_context, Response, abort
+from flask import request_started, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.services.api_auth import has_bearer_token
+
+# 请求耗时直方图的桶上界 (秒)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 慢请求日志中列出的最耗时 SQL 条数
+SLOW_LOG_STATEMENTS = 5
+# 单个请求最多保留的 SQL 语句 (仅开启慢请求日志时记录)，防止批量导入等请求占用过多内存
+MAX_RECORDED_STATEMENTS = 1000
+
+
+class RequestStats:
+    """单个请求的计时数据，挂在 g 上；流式响应在响应体发送完毕后才结束统计"""
+
+    def __init__(self, record_statements):
+        self.lock = threading.Lock()  # 报表的并发查询线程 (concurrent_queries) 共用同一个统计对象
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_started = None
+        self.statements = [] if record_statements else None  # [(耗时, SQL)]
+
+
+class _EndpointMetrics:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.latency_sum = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.statuses = {}  # (方法, 状态码) -> 请求数
+
+
+class MetricsRegistry:
+    """按端点累计的请求指标 (进程内)，以 Prometheus 文本格式输出"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def observe(self, endpoint, method, status, latency, stats):
+        with self._lock:
+            metrics = self._endpoints.get(endpoint)
+            if metrics is None:
+                metrics = self._endpoints[endpoint] = _EndpointMetrics()
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    metrics.buckets[i] += 1
+            metrics.count += 1
+            metrics.latency_sum += latency
+            metrics.sql_count += stats.sql_count
+            metrics.sql_time += stats.sql_time
+            metrics.template_time += stats.template_time
+            key = (method, status)
+            metrics.statuses[key] = metrics.statuses.get(key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def render(self):
+        """Prometheus 文本格式 (text/plain; version=0.0.4)"""
+        lines = [
+            '# HELP http_requests_total Requests by endpoint, method and status.',
+            '# TYPE http_requests_total counter',
+        ]
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            for endpoint, m in endpoints:
+                for (method, status), count in sorted(m.statuses.items()):
+                    lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+            lines += ['# HELP http_request_duration_seconds Request latency, including streamed response bodies.',
+                      '# TYPE http_request_duration_seconds histogram']
+            for endpoint, m in endpoints:
+                for bound, count in zip(LATENCY_BUCKETS, m.buckets):
+                    lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+                lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {m.count}')
+                lines.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {m.latency_sum:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {m.count}')
+
+            for name, help_text, attr, fmt in (
+                    ('http_request_sql_statements_total', 'SQL statements executed while serving requests.',
+                     'sql_count', '{}'),
+                    ('http_request_sql_seconds_total', 'Time spent executing SQL while serving requests.',
+                     'sql_time', '{:.6f}'),
+                    ('http_request_template_seconds_total', 'Time spent rendering templates.',
+                     'template_time', '{:.6f}')):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for endpoint, m in endpoints:
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {fmt.format(getattr(m, attr))}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def _current_stats():
+    return g.get('_request_stats') if has_app_context() else None
+
+
+# --- SQL 计时：对所有引擎 (主库与只读副本) 生效，请求之外 (后台任务、命令行) 的语句不计入 ---
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    stats = _current_stats()
+    if stats is None:
+        return
+    with stats.lock:
+        stats.sql_count += 1
+        stats.sql_time += elapsed
+        if stats.statements is not None and len(stats.statements) < MAX_RECORDED_STATEMENTS:
+            stats.statements.append((elapsed, statement))
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    # 出错的语句不会触发 after_cursor_execute：同样弹出开始时间，否则后续语句的计时会错位
+    conn = context.connection
+    if conn is not None and context.statement is not None and conn.info.get('query_started'):
+        conn.info['query_started'].pop()
+
+
+def init_request_metrics(app):
+    """注册请求计时 (Flask 信号) 与 /metrics 端点"""
+    slow_threshold = app.config.get('SLOW_REQUEST_SECONDS')
+
+    def on_request_started(sender, **extra):
+        g._request_stats = RequestStats(record_statements=slow_threshold is not None)
+
+    def on_before_render(sender, template, context, **extra):
+        stats = _current_stats()
+        if stats is not None:
+            stats.template_started = time.perf_counter()
+
+    def on_template_rendered(sender, template, context, **extra):
+        stats = _current_stats()
+        if stats is not None and stats.template_started is not None:
+            stats.template_time += time.perf_counter() - stats.template_started
+            stats.template_started = None
+
+    # 信号只持有弱引用，这里把处理函数挂在 app 上保持存活
+    app.extensions['request_metrics'] = (on_request_started, on_before_render, on_template_rendered)
+    request_started.connect(on_request_started, app)
+    before_render_template.connect(on_before_render, app)
+    template_rendered.connect(on_template_rendered, app)
+
+    @app.after_request
+    def finish_request_metrics(response):
+        stats = g.pop('_request_stats', None)
+        if stats is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        method, status = request.method, response.status_code
+        path = request.full_path.rstrip('?')
+
+        def finish():
+            # 在响应关闭时结束统计：流式导出的查询发生在视图返回之后
+            latency = time.perf_counter() - stats.started
+            registry.observe(endpoint, method, status, latency, stats)
+            if slow_threshold is not None and latency >= slow_threshold:
+                slowest = heapq.nlargest(SLOW_LOG_STATEMENTS, stats.statements or [], key=lambda s: s[0])
+                app.logger.warning(
+                    '慢请求 %s %s (%s): %.3fs，SQL %d 条 / %.3fs，模板 %.3fs%s', method, path, endpoint, latency,
+                    stats.sql_count, stats.sql_time, stats.template_time,
+                    ''.join(f'\n  [{elapsed * 1000:.1f}ms] {" ".join(sql.split())}' for elapsed, sql in slowest))
+
+        if response.is_streamed:
+            # 流式响应体在 after_request 之后才生成，期间仍需累计 SQL：把统计对象放回 g
+            g._request_stats = stats
+        response.call_on_close(finish)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """
+        Prometheus 抓取端点，要求 Authorization: Bearer <METRICS_TOKEN>。
+        未配置令牌时只在调试 / 测试模式下开放，生产环境返回 404。
+        """
+        if not app.config.get('METRICS_TOKEN'):
+            if not (app.debug or app.testing):
+                abort(404)
+        elif not has_bearer_token('METRICS_TOKEN'):
+            abort(401)
+        from app.extensions import db
+        from app.services.db_pool import pool_stats
+        return Response(registry.render() + _pool_gauges(pool_stats(db.engines)),
+                        mimetype='text/plain; version=0.0.4')
+
+
+def _pool_gauges(stats_by_bind):
+    """连接池指标 (见 db_pool.PoolMetrics) 的 Prometheus 格式，按绑定 (primary / replica) 加 bind 标签"""
+    counters = ('connects', 'checkouts', 'checkins', 'invalidations', 'timeouts', 'wait_count', 'wait_seconds_total')
+    samples = {}  # 指标名 -> [(绑定, 值)]；只读副本可能不是 QueuePool，指标项可能少于主库
+    for bind, stats in stats_by_bind.items():
+        for key, value in stats.items():
+            samples.setdefault(key, []).append((bind, value))
+    lines = []
+    for key, values in samples.items():
+        if key in counters:
+            name = f"db_pool_{key if key.endswith('_total') else key + '_total'}"
+            lines.append(f'# TYPE {name} counter')
+        else:
+            name = f'db_pool_{key}'
+            lines.append(f'# TYPE {name} gauge')
+        lines += [f'{name}{{bind="{bind}"}} {value}' for bind, value in values]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,159 @@
+# app/services/rollups.py
+
+from datetime import datetime
+
+from sqlalchemy import select, delete, insert, func
+from app.extensions import db
+from app.models import Order, OrderItem, DailySales, ProductDailySales
+from app.services.report_cache import mark_reports_stale
+
+
+def upsert_increment(model, rows, key_columns):
+    """
+    批量“插入或累加”：主键不存在时插入，存在时把其余列累加到原值上。
+    MySQL 使用 INSERT ... ON DUPLICATE KEY UPDATE，SQLite / PostgreSQL 使用 ON CONFLICT DO UPDATE。
+    """
+    if not rows:
+        return
+    upsert_rows(model, rows, key_columns, increment_columns=[c for c in rows[0] if c not in key_columns])
+
+
+def upsert_rows(model, rows, key_columns, increment_columns=(), replace_columns=(), max_columns=()):
+    """
+    通用批量 upsert：key_columns (主键或唯一键) 冲突时，increment_columns 累加到原值上，
+    replace_columns 用新值覆盖，max_columns 取原值与新值中较大者 (原值为 NULL 时取新值)，其余列保持不变。
+    """
+    if not rows:
+        return
+    table = model.__table__
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(table).values(rows)
+        new_values = stmt.inserted
+    else:
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as conflict_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as conflict_insert
+        stmt = conflict_insert(table).values(rows)
+        new_values = stmt.excluded
+
+    set_ = {c: table.c[c] + new_values[c] for c in increment_columns}
+    set_.update({c: new_values[c] for c in replace_columns})
+    # 双参数 max() 在 SQLite 中是标量函数；MySQL / PostgreSQL 使用 GREATEST
+    greatest = func.max if dialect == 'sqlite' else func.greatest
+    set_.update({c: greatest(func.coalesce(table.c[c], new_values[c]), new_values[c]) for c in max_columns})
+    if dialect == 'mysql':
+        stmt = stmt.on_duplicate_key_update(set_)
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=key_columns, set_=set_)
+    db.session.execute(stmt)
+
+
+def apply_order(order_date, final_amount, lines, sign=1):
+    """
+    订单创建 (sign=1) 或删除 (sign=-1) 时，在当前事务内增量更新每日销售汇总和商品每日销售汇总。
+    lines 为订单详情字典列表：product_id / quantity / price_at_sale / cost_at_sale / line_subtotal。
+    """
+    apply_orders([(order_date, final_amount, lines)], sign=sign)
+
+
+def apply_orders(orders, sign=1):
+    """
+    批量版 apply_order：orders 为 [(order_date, final_amount, lines), ...]，
+    先在内存中按日期 / (日期, 商品) 合并，每张汇总表只执行一条 upsert。
+    """
+    daily = {}
+    product_daily = {}
+    for order_date, final_amount, lines in orders:
+        sale_date = order_date.date() if isinstance(order_date, datetime) else order_date
+        total_cost = sum(line['cost_at_sale'] * line['quantity'] for line in lines)
+
+        day = daily.setdefault(sale_date, {'sale_date': sale_date, 'revenue': 0, 'order_count': 0,
+                                           'cost': 0, 'profit': 0})
+        day['revenue'] += sign * final_amount
+        day['order_count'] += sign
+        day['cost'] += sign * total_cost
+        day['profit'] += sign * (final_amount - total_cost)
+
+        for line in lines:
+            key = (sale_date, line['product_id'])
+            row = product_daily.setdefault(key, {'sale_date': sale_date, 'product_id': line['product_id'],
+                                                 'quantity': 0, 'revenue': 0, 'gross_profit': 0})
+            row['quantity'] += sign * line['quantity']
+            row['revenue'] += sign * line['line_subtotal']
+            row['gross_profit'] += sign * (line['price_at_sale'] - line['cost_at_sale']) * line['quantity']
+
+    upsert_increment(DailySales, list(daily.values()), ['sale_date'])
+    upsert_increment(ProductDailySales, list(product_daily.values()), ['sale_date', 'product_id'])
+    mark_reports_stale(db.session)
+
+
+def rebuild_daily_sales():
+    """根据 orders / order_items 全量重建每日销售汇总，返回写入的天数"""
+    sale_date = func.date(Order.order_date).label('sale_date')
+
+    revenue_rows = db.session.execute(
+        select(sale_date,
+               func.sum(Order.final_amount).label('revenue'),
+               func.count(Order.id).label('order_count'))
+        .where(Order.status == 'Completed')
+        .group_by(sale_date)
+    ).all()
+    cost_rows = db.session.execute(
+        select(sale_date, func.sum(OrderItem.cost_at_sale * OrderItem.quantity).label('cost'))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.status == 'Completed')
+        .group_by(sale_date)
+    ).all()
+    cost_map = {str(row.sale_date): row.cost or 0 for row in cost_rows}
+
+    rows = []
+    for row in revenue_rows:
+        revenue = row.revenue or 0
+        cost = cost_map.get(str(row.sale_date), 0)
+        rows.append({
+            'sale_date': datetime.strptime(str(row.sale_date), '%Y-%m-%d').date(),
+            'revenue': revenue,
+            'order_count': row.order_count,
+            'cost': cost,
+            'profit': revenue - cost,
+        })
+
+    db.session.execute(delete(DailySales))
+    mark_reports_stale(db.session)
+    if rows:
+        db.session.execute(insert(DailySales), rows)
+    return len(rows)
+
+
+def rebuild_product_daily_sales():
+    """根据 orders / order_items 全量重建商品每日销售汇总，返回写入的行数"""
+    sale_date = func.date(Order.order_date).label('sale_date')
+
+    result_rows = db.session.execute(
+        select(sale_date,
+               OrderItem.product_id,
+               func.sum(OrderItem.quantity).label('quantity'),
+               func.sum(OrderItem.line_subtotal).label('revenue'),
+               func.sum((OrderItem.price_at_sale - OrderItem.cost_at_sale) * OrderItem.quantity).label('gross_profit'))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.status == 'Completed')
+        .group_by(sale_date, OrderItem.product_id)
+    ).all()
+
+    rows = [{
+        'sale_date': datetime.strptime(str(row.sale_date), '%Y-%m-%d').date(),
+        'product_id': row.product_id,
+        'quantity': row.quantity,
+        'revenue': row.revenue,
+        'gross_profit': row.gross_profit,
+    } for row in result_rows]
+
+    db.session.execute(delete(ProductDailySales))
+    mark_reports_stale(db.session)
+    if rows:
+        db.session.execute(insert(ProductDailySales), rows)
+    return len(rows)
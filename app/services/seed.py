@@ -0,0 +1,176 @@
+# app/services/seed.py
+
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import select, insert, func
+from app.extensions import db
+from app.models import Category, Product, Member, Order, OrderItem
+from app.services.rollups import rebuild_daily_sales, rebuild_product_daily_sales
+from app.services.phone_index import rebuild_phone_index
+from app.services.member_stats import recompute_member_stats
+from app.services.pricing import catalog_cache, discount_cache
+from app.services.product_search import product_index
+from app.services.cache_generation import CATALOG, mark_changed
+
+# 每条 INSERT 语句 (executemany) 写入的订单数，订单详情按同一批次写入
+SEED_CHUNK = 20000
+
+# 分类 -> [(水果, 参考零售价, 单位)]
+FRUITS = {
+    '柑橘类': [('脐橙', 6.8, '斤'), ('砂糖橘', 5.5, '斤'), ('柠檬', 3.0, '个'), ('沃柑', 7.5, '斤'), ('柚子', 12.0, '个'),
+            ('丑橘', 9.9, '斤'), ('金桔', 8.0, '斤')],
+    '仁果类': [('苹果', 6.5, '斤'), ('香梨', 5.8, '斤'), ('雪梨', 4.5, '斤'), ('山楂', 7.0, '斤'), ('枇杷', 18.0, '斤')],
+    '浆果类': [('草莓', 25.0, '斤'), ('蓝莓', 19.9, '盒'), ('葡萄', 12.8, '斤'), ('提子', 15.8, '斤'), ('桑葚', 22.0, '盒'),
+            ('树莓', 29.9, '盒')],
+    '核果类': [('水蜜桃', 9.8, '斤'), ('樱桃', 39.9, '斤'), ('李子', 8.5, '斤'), ('杏', 9.0, '斤'), ('冬枣', 12.0, '斤'),
+            ('油桃', 8.8, '斤')],
+    '热带水果': [('香蕉', 3.5, '斤'), ('芒果', 9.9, '斤'), ('菠萝', 5.0, '个'), ('火龙果', 7.8, '斤'), ('榴莲', 35.0, '斤'),
+             ('山竹', 29.0, '斤'), ('荔枝', 18.0, '斤'), ('龙眼', 14.0, '斤'), ('牛油果', 8.0, '个'), ('椰子', 10.0, '个')],
+    '瓜类': [('西瓜', 2.8, '斤'), ('哈密瓜', 5.5, '斤'), ('甜瓜', 6.0, '斤'), ('木瓜', 6.5, '斤')],
+    '进口水果': [('车厘子', 59.0, '斤'), ('奇异果', 4.5, '个'), ('红心火龙果', 11.0, '斤'), ('释迦', 45.0, '斤'),
+             ('青提', 22.0, '斤')],
+    '果切果盒': [('鲜切果盒', 19.9, '盒'), ('西瓜果切', 12.9, '盒'), ('菠萝果切', 9.9, '盒'), ('混合果杯', 15.9, '杯')],
+}
+ORIGINS = ['', '赣南', '烟台', '新疆', '海南', '云南', '广西', '四川', '陕西', '山东', '福建', '智利', '泰国', '新西兰',
+           '越南', '阿克苏', '砀山', '丹东', '台湾', '宁夏']
+GRADES = ['', '精品', '优选', '特级', '家庭装', '礼盒']
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈'
+GIVEN_CHARS = '伟芳娜秀敏静丽强磊军洋勇艳杰娟涛明超兰霞平刚桂英华玉萍红建文辉力斌宇浩凯佳欣怡晨阳雪梅琳婷'
+# 会员折扣率分布
+DISCOUNTS = [(Decimal('1.00'), 50), (Decimal('0.95'), 30), (Decimal('0.90'), 15), (Decimal('0.85'), 5)]
+# 24 小时的下单权重：午间与傍晚两个高峰
+HOUR_WEIGHTS = [1, 0, 0, 0, 0, 1, 2, 4, 6, 8, 10, 11, 9, 6, 5, 5, 7, 10, 12, 11, 8, 5, 3, 2]
+
+
+def _skewed(rnd, n):
+    """0 ~ n-1 的偏斜分布：靠前的元素被选中的概率更高 (热门商品 / 常客)"""
+    return min(int(n * rnd.random() ** 2.5), n - 1)
+
+
+def _money(value):
+    return Decimal(value).quantize(Decimal('0.01'))
+
+
+def seed_categories():
+    existing = dict(db.session.execute(select(Category.name, Category.id)).all())
+    missing = [name for name in FRUITS if name not in existing]
+    if missing:
+        db.session.execute(insert(Category), [{'name': name} for name in missing])
+        existing = dict(db.session.execute(select(Category.name, Category.id)).all())
+    return existing
+
+
+def seed_products(rnd, count, categories):
+    """产地 + 品级 + 水果组合出 count 个不重名的商品，价格在参考价上下浮动，成本为售价的 55% ~ 75%"""
+    combos = [(category, fruit, origin, grade)
+              for category, fruits in FRUITS.items() for fruit in fruits for origin in ORIGINS for grade in GRADES]
+    rnd.shuffle(combos)
+    rows, names = [], set()
+    for category, (fruit, price, unit), origin, grade in combos:
+        name = f'{origin}{fruit}{grade}'
+        if name in names:
+            continue
+        names.add(name)
+        factor = 1 + 0.3 * ('礼盒' in grade or '特级' in grade) + 0.15 * bool(origin)
+        retail = _money(price * factor * rnd.uniform(0.85, 1.2))
+        rows.append({
+            'name': name, 'category_id': categories[category], 'unit': '盒' if grade == '礼盒' else unit,
+            'retail_price': retail, 'cost_price': _money(float(retail) * rnd.uniform(0.55, 0.75)),
+            'stock_quantity': rnd.randint(50, 5000),
+        })
+        if len(rows) >= count:
+            break
+    db.session.execute(insert(Product), rows)
+
+
+def seed_members(rnd, count, start):
+    """手机号从号段中无放回抽样，保证唯一"""
+    prefixes = ['130', '131', '132', '135', '136', '137', '138', '139', '150', '151', '158', '177', '186', '188', '199']
+    numbers = rnd.sample(range(len(prefixes) * 10 ** 8), count)
+    for offset in range(0, count, SEED_CHUNK):
+        db.session.execute(insert(Member.__table__), [{
+            'name': rnd.choice(SURNAMES) + ''.join(rnd.choice(GIVEN_CHARS) for _ in range(rnd.randint(1, 2))),
+            'phone_number': f'{prefixes[n // 10 ** 8]}{n % 10 ** 8:08d}',
+            'discount_rate': rnd.choices([d for d, _ in DISCOUNTS], [w for _, w in DISCOUNTS])[0],
+            'total_spent': 0,
+            'registered_at': start + timedelta(seconds=rnd.randint(0, 86400 * 30)),
+        } for n in numbers[offset:offset + SEED_CHUNK]])
+
+
+def seed_orders(rnd, count, days, member_share=0.6, progress=None):
+    """
+    在最近 days 天内生成 count 张订单：时段按 HOUR_WEIGHTS、周末多三成，每单 1 ~ 6 种商品。
+    订单主键预先分配，订单与详情各用一条 executemany 写入，不经过 ORM。
+    """
+    products = db.session.execute(select(Product.id, Product.retail_price, Product.cost_price)).all()
+    members = db.session.execute(select(Member.id, Member.discount_rate)).all()
+    rnd.shuffle(products)
+    rnd.shuffle(members)
+    next_id = (db.session.execute(select(func.max(Order.id))).scalar() or 0) + 1
+
+    end = datetime.now().replace(minute=0, second=0, microsecond=0)
+    first_day = (end - timedelta(days=days - 1)).replace(hour=0)
+    day_weights = [1.3 if (first_day + timedelta(days=d)).weekday() >= 5 else 1.0 for d in range(days)]
+
+    for offset in range(0, count, SEED_CHUNK):
+        size = min(SEED_CHUNK, count - offset)
+        order_days = rnd.choices(range(days), day_weights, k=size)
+        hours = rnd.choices(range(24), HOUR_WEIGHTS, k=size)
+        orders, items = [], []
+        for i in range(size):
+            order_id = next_id + offset + i
+            order_date = first_day + timedelta(days=order_days[i], hours=hours[i], seconds=rnd.randint(0, 3599))
+            member = members[_skewed(rnd, len(members))] if members and rnd.random() < member_share else None
+            discount = member.discount_rate if member else Decimal('1.00')
+
+            original = Decimal('0.00')
+            chosen = {products[_skewed(rnd, len(products))] for _ in range(rnd.randint(1, 6))}
+            for product in chosen:
+                quantity = rnd.randint(1, 5)
+                subtotal = product.retail_price * quantity
+                original += subtotal
+                items.append({
+                    'order_id': order_id, 'product_id': product.id, 'quantity': quantity,
+                    'price_at_sale': product.retail_price, 'cost_at_sale': product.cost_price,
+                    'line_subtotal': subtotal,
+                })
+            final = _money(original * discount)
+            orders.append({
+                'id': order_id, 'order_date': order_date, 'member_id': member.id if member else None,
+                'original_amount': original, 'discount_amount': original - final, 'final_amount': final,
+                'status': 'Completed',
+            })
+
+        db.session.execute(insert(Order.__table__), orders)
+        db.session.execute(insert(OrderItem.__table__), items)
+        db.session.commit()
+        if progress:
+            progress(offset + size, count)
+
+
+
+def seed_data(orders=100000, members=5000, products=200, days=365, seed=42, progress=None):
+    """
+    生成可复现 (固定随机种子) 的演示 / 压测数据：分类、商品、会员与订单，随后重建报表汇总、手机号索引和会员消费统计。
+    数据通过 Core 批量语句写入，结束后清空进程内的商品、折扣缓存与搜索索引。
+    """
+    rnd = random.Random(seed)
+    categories = seed_categories()
+    seed_products(rnd, products, categories)
+    seed_members(rnd, members, datetime.now() - timedelta(days=days + 30))
+    mark_changed(db.session, CATALOG)  # 其他进程的商品搜索索引随之重建
+    db.session.commit()
+
+    seed_orders(rnd, orders, days, progress=progress)
+
+    rebuild_daily_sales()
+    rebuild_product_daily_sales()
+    rebuild_phone_index()
+    recompute_member_stats()  # 会员累计消费与消费统计
+    db.session.commit()
+
+    catalog_cache.invalidate()
+    discount_cache.invalidate()
+    product_index.invalidate()
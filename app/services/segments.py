@@ -0,0 +1,172 @@
+# app/services/segments.py
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import create_engine, select, delete, insert, func
+from app.extensions import db
+from app.models import Member, MemberSegment, Order
+
+try:
+    # RFM 打分使用 NumPy 向量化计算 (pip install numpy)
+    import numpy as np
+except ImportError:
+    np = None
+
+# 游标每批读取的订单数；内存占用 = 一批订单 + 每个会员 ID 三个数组元素
+SEGMENT_CHUNK = 50000
+# 每条 INSERT 语句 (executemany) 写入的分群结果数
+WRITE_CHUNK = 20000
+
+# 分群：(标识, 名称)，按看板展示顺序
+SEGMENTS = [
+    ('champions', '冠军客户'),
+    ('loyal', '忠诚客户'),
+    ('potential_loyalists', '潜力客户'),
+    ('new_customers', '新客户'),
+    ('promising', '有潜力的新客'),
+    ('need_attention', '需要关注'),
+    ('about_to_sleep', '即将沉睡'),
+    ('at_risk', '流失风险'),
+    ('cant_lose', '不能失去'),
+    ('hibernating', '沉睡客户'),
+]
+
+# 常用的 RFM 分群网格：按 (R 得分, F 得分) 划分，M 得分只记录不参与分群
+_SEGMENT_RULES = [
+    ('hibernating', (1, 2), (1, 2)),
+    ('at_risk', (1, 2), (3, 4)),
+    ('cant_lose', (1, 2), (5, 5)),
+    ('about_to_sleep', (3, 3), (1, 2)),
+    ('need_attention', (3, 3), (3, 3)),
+    ('loyal', (3, 4), (4, 5)),
+    ('promising', (4, 4), (1, 1)),
+    ('new_customers', (5, 5), (1, 1)),
+    ('potential_loyalists', (4, 5), (2, 3)),
+    ('champions', (5, 5), (4, 5)),
+]
+
+
+def _segment_grid():
+    """6 x 6 查找表：grid[r, f] 为 SEGMENTS 中的下标 (后面的规则覆盖前面的)"""
+    keys = [key for key, _ in SEGMENTS]
+    grid = np.zeros((6, 6), dtype=np.int64)
+    for key, (r_low, r_high), (f_low, f_high) in _SEGMENT_RULES:
+        grid[r_low:r_high + 1, f_low:f_high + 1] = keys.index(key)
+    return grid
+
+
+def aggregate_orders(connection, low, high, now, chunk_size=SEGMENT_CHUNK):
+    """
+    一次流式扫描 member_id 在 [low, high] 内的已完成订单 (服务端游标，每批 chunk_size 行)，
+    用按会员 ID 下标的稠密数组累加 (np.bincount / np.maximum.at)。
+    返回有订单的会员：(会员 ID, 距最近消费天数, 订单数, 实付金额合计) 四个数组。
+    """
+    size = high - low + 1
+    frequency = np.zeros(size, dtype=np.int64)
+    monetary = np.zeros(size, dtype=np.float64)
+    last_seen = np.full(size, np.iinfo(np.int64).min, dtype=np.int64)  # 最近消费时间 (秒)
+
+    orders = Order.__table__
+    result = connection.execute(
+        select(orders.c.member_id, orders.c.order_date, orders.c.final_amount)
+        .where(orders.c.status == 'Completed', orders.c.member_id.between(low, high))
+        .execution_options(yield_per=chunk_size)
+    )
+    for rows in result.partitions():
+        member_ids, order_dates, amounts = zip(*rows)
+        index = np.fromiter(member_ids, dtype=np.int64, count=len(rows)) - low
+        frequency += np.bincount(index, minlength=size)
+        monetary += np.bincount(index, weights=np.array(amounts, dtype=np.float64), minlength=size)
+        np.maximum.at(last_seen, index, np.array(order_dates, dtype='datetime64[s]').astype(np.int64))
+
+    present = np.flatnonzero(frequency)
+    now_seconds = np.datetime64(now, 's').astype(np.int64)
+    recency_days = np.maximum((now_seconds - last_seen[present]) // 86400, 0)
+    return present + low, recency_days, frequency[present], monetary[present]
+
+
+def _aggregate_range(database_url, low, high, now, chunk_size):
+    """进程池任务：子进程使用自己的引擎和连接"""
+    engine = create_engine(database_url)
+    try:
+        with engine.connect() as connection:
+            return aggregate_orders(connection, low, high, now, chunk_size)
+    finally:
+        engine.dispose()
+
+
+def quintile_scores(values, higher_is_better=True):
+    """
+    按排名五等分把数值分为 1~5 分 (向量化)，每个分数段的会员数相同 (最多相差一人)。
+    不按分位点取值划分：大量重复值 (例如多数会员只下过一单) 会使分位点重合，分数段失衡。
+    取值相同的会员按原顺序 (会员 ID) 排名，可能落在相邻的分数段。
+    """
+    ranks = np.argsort(values, kind='stable').argsort()
+    scores = 1 + ranks * 5 // len(values)
+    return scores if higher_is_better else 6 - scores
+
+
+def segment_members(workers=1, chunk_size=SEGMENT_CHUNK, now=None):
+    """
+    为所有有消费记录的会员计算 RFM 得分与分群，全量替换 member_segments 表。
+    workers > 1 时按会员 ID 区间拆分到多个进程并行扫描订单 (SQLite 内存库始终单进程)。
+    返回 {分群标识: 会员数}。调用方负责 commit。
+    """
+    if np is None:
+        raise RuntimeError('会员分群需要安装 numpy：pip install numpy')
+    now = now or datetime.utcnow()  # 订单时间按 UTC 存储
+
+    low, high = db.session.execute(select(func.min(Member.id), func.max(Member.id))).one()
+    in_memory = db.engine.url.database in (None, '', ':memory:')  # 内存库无法被子进程访问
+    if low is None:
+        parts = []
+    elif workers > 1 and not in_memory:
+        bounds = np.linspace(low, high + 1, workers + 1).astype(np.int64).tolist()
+        ranges = [(start, end - 1) for start, end in zip(bounds, bounds[1:]) if end > start]
+        database_url = db.engine.url.render_as_string(hide_password=False)
+        with ProcessPoolExecutor(max_workers=len(ranges),
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            parts = list(pool.map(_aggregate_range, *zip(*[
+                (database_url, start, end, now, chunk_size) for start, end in ranges
+            ])))
+    else:
+        parts = [aggregate_orders(db.session.connection(), low, high, now, chunk_size)]
+
+    parts = [part for part in parts if len(part[0])]
+    db.session.execute(delete(MemberSegment))
+    if not parts:
+        return {}
+
+    member_ids, recency_days, frequency, monetary = (np.concatenate(column) for column in zip(*parts))
+
+    # 分位点在全体会员上计算 (不能按区间分别计算)
+    r_scores = quintile_scores(recency_days, higher_is_better=False)
+    f_scores = quintile_scores(frequency)
+    m_scores = quintile_scores(monetary)
+    segment_index = _segment_grid()[r_scores, f_scores]
+
+    keys = [key for key, _ in SEGMENTS]
+    columns = [member_ids.tolist(), recency_days.tolist(), frequency.tolist(), np.round(monetary, 2).tolist(),
+               r_scores.tolist(), f_scores.tolist(), m_scores.tolist(), [keys[i] for i in segment_index.tolist()]]
+    names = ['member_id', 'recency_days', 'frequency', 'monetary', 'r_score', 'f_score', 'm_score', 'segment']
+    rows = [dict(zip(names, values), computed_at=now) for values in zip(*columns)]
+    for offset in range(0, len(rows), WRITE_CHUNK):
+        db.session.execute(insert(MemberSegment.__table__), rows[offset:offset + WRITE_CHUNK])
+
+    counts = np.bincount(segment_index, minlength=len(keys))
+    return {key: int(count) for key, count in zip(keys, counts) if count}
+
+
+def segments_computed_at():
+    """最近一次分群的时间 (索引查询)，作为看板分群人数的缓存键：命令行重新分群后各 Web 进程的缓存随之失效"""
+    return db.session.execute(select(func.max(MemberSegment.computed_at))).scalar()
+
+
+def segment_counts():
+    """看板用：[(分群名称, 会员数)]，按 SEGMENTS 顺序，未运行过分群时为空列表"""
+    counts = dict(db.session.execute(
+        select(MemberSegment.segment, func.count()).group_by(MemberSegment.segment)
+    ).all())
+    return [(label, counts[key]) for key, label in SEGMENTS if counts.get(key)]
@@ -0,0 +1,127 @@
+# benchmarks/checkout_concurrency.py
+"""
+结算并发压测：多个“收银台”线程同时调用 /order/api/submit_order 抢购同一批商品，
+验证不会超卖，并统计 1 / 8 / 32 并发下的每秒订单数。
+
+用法：
+    python benchmarks/checkout_concurrency.py                     # 默认使用临时 SQLite 文件
+    BENCH_DATABASE_URL=mysql+pymysql://.../bench python benchmarks/checkout_concurrency.py --reset --orders 2000
+
+压测库只读取 BENCH_DATABASE_URL (不使用 DATABASE_URL / .env 中的业务库)；每轮都会清空重建该库，
+因此指定数据库时必须加 --reset 确认。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.models import Category, Product, Order, OrderItem
+from app.services.pricing import catalog_cache
+
+
+def make_config(database_url):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_BINDS = {}  # 不使用 .env 中配置的只读副本
+        # SQLite 写锁等待时间放宽，避免 32 并发时直接报 database is locked
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 60}} if database_url.startswith('sqlite') else {}
+        WTF_CSRF_ENABLED = False
+        LOGIN_DISABLED = True
+        TESTING = True
+
+    return BenchConfig
+
+
+def seed(app, num_products, stock):
+    with app.app_context():
+        db.drop_all(bind_key=None)
+        db.create_all(bind_key=None)
+        category = Category(name='压测分类')
+        db.session.add(category)
+        db.session.flush()
+        db.session.add_all([
+            Product(name=f'压测商品{i}', category_id=category.id, retail_price=10, cost_price=6,
+                    unit='斤', stock_quantity=stock)
+            for i in range(num_products)
+        ])
+        db.session.commit()
+        catalog_cache.invalidate()  # 每轮重建表，丢弃上一轮的商品快照
+        return [p.id for p in Product.query.order_by(Product.id).all()]
+
+
+def run_round(app, product_ids, clients, total_orders, lines_per_order):
+    """clients 个线程共同提交 total_orders 张订单，返回 (成功数, 失败数, 耗时秒)"""
+    counter = {'ok': 0, 'rejected': 0}
+    lock = threading.Lock()
+    per_client = total_orders // clients
+
+    def worker(seed_value):
+        rnd = random.Random(seed_value)
+        client = app.test_client()
+        for _ in range(per_client):
+            lines = rnd.sample(product_ids, min(lines_per_order, len(product_ids)))
+            items = [{'product_id': pid, 'quantity': rnd.randint(1, 3)} for pid in lines]
+            resp = client.post('/order/api/submit_order', json={'items': items, 'member_id': None})
+            with lock:
+                counter['ok' if resp.status_code == 200 else 'rejected'] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counter['ok'], counter['rejected'], time.perf_counter() - started
+
+
+def check_no_oversell(app, initial_stock):
+    """库存守恒：剩余库存 + 已售数量 == 初始库存，且库存不为负"""
+    with app.app_context():
+        sold = dict(db.session.query(OrderItem.product_id, db.func.sum(OrderItem.quantity))
+                    .group_by(OrderItem.product_id).all())
+        for p in Product.query.all():
+            assert p.stock_quantity >= 0, f'{p.name} 库存为负: {p.stock_quantity}'
+            assert p.stock_quantity + (sold.get(p.id) or 0) == initial_stock, f'{p.name} 库存不守恒'
+        return Order.query.count()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='结算并发压测')
+    parser.add_argument('--clients', default='1,8,32', help='并发客户端数列表，逗号分隔')
+    parser.add_argument('--orders', type=int, default=640, help='每轮提交的订单总数')
+    parser.add_argument('--products', type=int, default=20, help='商品数量')
+    parser.add_argument('--lines', type=int, default=5, help='每张订单的商品行数')
+    parser.add_argument('--stock', type=int, default=300, help='每个商品的初始库存 (设小一些以制造抢购)')
+    parser.add_argument('--reset', action='store_true', help='确认清空并重建 BENCH_DATABASE_URL 指定的数据库')
+    args = parser.parse_args()
+
+    database_url = os.environ.get('BENCH_DATABASE_URL')
+    if not database_url:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_checkout.db')
+    elif not args.reset:
+        parser.error('压测会删除并重建 BENCH_DATABASE_URL 中的所有表，确认后请加 --reset')
+
+    app = create_app(make_config(database_url))
+    print(f'数据库: {database_url}')
+    print(f'{"并发数":>6} {"成功":>6} {"拒绝":>6} {"耗时(s)":>8} {"订单/秒":>8}')
+
+    for clients in [int(c) for c in args.clients.split(',')]:
+        product_ids = seed(app, args.products, args.stock)
+        ok, rejected, elapsed = run_round(app, product_ids, clients, args.orders, args.lines)
+        orders_in_db = check_no_oversell(app, args.stock)
+        assert orders_in_db == ok, f'订单数不一致: 数据库 {orders_in_db} / 成功响应 {ok}'
+        print(f'{clients:>6} {ok:>6} {rejected:>6} {elapsed:>8.2f} {ok / elapsed:>8.1f}')
+
+    print('库存校验通过：无超卖。')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/export_stream.py
+"""
+CSV 流式导出压测：写入 N 条订单后请求 /report/export/sales，统计吞吐量 (MB/s) 和进程峰值内存。
+导出在独立子进程中执行，峰值内存不受造数阶段影响。
+
+用法：
+    python benchmarks/export_stream.py                  # 默认 100 万行，临时 SQLite 文件
+    python benchmarks/export_stream.py --rows 200000
+    BENCH_DATABASE_URL=mysql+pymysql://.../bench python benchmarks/export_stream.py --reset
+
+压测库只读取 BENCH_DATABASE_URL (不使用 DATABASE_URL / .env 中的业务库)；造数前会清空重建该库，
+因此指定数据库时必须加 --reset 确认。
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.models import Member, Order
+
+SEED_CHUNK = 20000
+
+
+def make_config(database_url):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_BINDS = {}  # 不使用 .env 中配置的只读副本
+        WTF_CSRF_ENABLED = False
+        LOGIN_DISABLED = True
+        TESTING = True
+
+    return BenchConfig
+
+
+def seed(app, rows):
+    """分批写入订单，每 10 单中有 7 单关联会员"""
+    with app.app_context():
+        db.drop_all(bind_key=None)
+        db.create_all(bind_key=None)
+        db.session.execute(insert(Member), [
+            {'name': f'会员{i}', 'phone_number': f'138{i:08d}', 'discount_rate': 0.95, 'total_spent': 0}
+            for i in range(1000)
+        ])
+        start = datetime(2020, 1, 1)
+        for offset in range(0, rows, SEED_CHUNK):
+            db.session.execute(insert(Order), [
+                {
+                    'order_date': start + timedelta(minutes=i),
+                    'member_id': (i % 1000) + 1 if i % 10 < 7 else None,
+                    'original_amount': 100, 'discount_amount': 5, 'final_amount': 95,
+                    'status': 'Completed'
+                } for i in range(offset, min(offset + SEED_CHUNK, rows))
+            ])
+            db.session.commit()
+
+
+def max_rss_mb():
+    # Linux 上 ru_maxrss 单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def export_worker(database_url, queue):
+    app = create_app(make_config(database_url))
+    client = app.test_client()
+    rss_before = max_rss_mb()
+
+    started = time.perf_counter()
+    response = client.get('/report/export/sales', buffered=False)
+    total_bytes = 0
+    chunks = 0
+    for chunk in response.response:
+        total_bytes += len(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        chunks += 1
+    response.close()
+    elapsed = time.perf_counter() - started
+
+    queue.put((total_bytes, chunks, elapsed, rss_before, max_rss_mb()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CSV 流式导出压测')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='订单行数')
+    parser.add_argument('--reset', action='store_true', help='确认清空并重建 BENCH_DATABASE_URL 指定的数据库')
+    args = parser.parse_args()
+
+    database_url = os.environ.get('BENCH_DATABASE_URL')
+    if not database_url:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_export.db')
+    elif not args.reset:
+        parser.error('压测会删除并重建 BENCH_DATABASE_URL 中的所有表，确认后请加 --reset')
+
+    app = create_app(make_config(database_url))
+    print(f'数据库: {database_url}')
+    started = time.perf_counter()
+    seed(app, args.rows)
+    print(f'已写入 {args.rows} 条订单，用时 {time.perf_counter() - started:.1f}s')
+
+    queue = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=export_worker, args=(database_url, queue))
+    worker.start()
+    total_bytes, chunks, elapsed, rss_before, rss_peak = queue.get()
+    worker.join()
+
+    mb = total_bytes / 1024 / 1024
+    print(f'导出 {args.rows} 行，{mb:.1f} MB，{chunks} 个数据块，用时 {elapsed:.2f}s，{mb / elapsed:.1f} MB/s')
+    print(f'峰值内存 {rss_peak:.1f} MB (导出前 {rss_before:.1f} MB，增长 {rss_peak - rss_before:.1f} MB)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/product_search.py
+"""
+商品搜索引擎压测：用 N 个合成商品名称构建倒排索引，统计常见查询 (名称子串 / 拼音首字母)
+取前 --limit 条排序结果 (结算页联想搜索 / 列表第一页) 的耗时。
+索引是纯内存结构，不需要数据库。
+
+用法：
+    python benchmarks/product_search.py                  # 默认 5 万个商品
+    python benchmarks/product_search.py --products 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.product_search import ProductSearchIndex
+
+PREFIXES = ['红富士', '进口', '海南', '新疆', '有机', '精品', '烟台', '赣南', '云南', '泰国']
+FRUITS = ['苹果', '香蕉', '葡萄', '橙子', '梨', '西瓜', '哈密瓜', '草莓', '芒果', '猕猴桃', '菠萝', '樱桃', '柚子', '荔枝']
+SPECS = ['', '礼盒', '大果', '小果', '特级', '一级', '家庭装']
+QUERIES = ['pg', '苹果', '果', 'xj', '哈密', 'hmg', '红富士', 'mht', '进口樱桃', 'jkyt', 'cm', '礼盒']
+
+
+def make_names(count):
+    rnd = random.Random(42)
+    names = set()
+    while len(names) < count:
+        names.add(f'{rnd.choice(PREFIXES)}{rnd.choice(FRUITS)}{rnd.choice(SPECS)}{rnd.randint(1, 9999)}')
+    return list(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='商品搜索引擎压测')
+    parser.add_argument('--products', type=int, default=50000, help='商品数量')
+    parser.add_argument('--limit', type=int, default=20, help='每次查询返回的结果数')
+    parser.add_argument('--repeat', type=int, default=200, help='每个查询重复次数')
+    args = parser.parse_args()
+
+    index = ProductSearchIndex()
+    started = time.perf_counter()
+    index.build(enumerate(make_names(args.products), start=1))
+    print(f'构建 {args.products} 个商品的索引，用时 {time.perf_counter() - started:.2f}s')
+
+    print(f'{"查询":<10} {"命中数":>8} {"平均(ms)":>10} {"P99(ms)":>10}')
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            result = index.search(query, limit=args.limit)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        print(f'{query:<10} {result.total:>8} {statistics.mean(timings):>10.3f} {p99:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
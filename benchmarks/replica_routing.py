@@ -0,0 +1,139 @@
+# benchmarks/replica_routing.py
+"""
+读写分离验证：报表 / 导出请求的查询应发往只读副本，结算写入应留在主库；副本不可用时报表回落到主库。
+
+默认使用两个临时 SQLite 文件，副本是主库初始化后的文件拷贝 (模拟复制快照)，
+因此主库上新提交的订单不会出现在副本的看板数据中。也可以指向已配置好复制的 MySQL 压测库：
+    BENCH_DATABASE_URL=mysql+pymysql://.../primary BENCH_REPLICA_DATABASE_URL=mysql+pymysql://.../replica \\
+        python benchmarks/replica_routing.py --reset
+
+只读取 BENCH_* 变量 (不使用 DATABASE_URL / .env 中的业务库)；验证前会清空重建主库，
+因此指定数据库时必须加 --reset 确认。
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter
+
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.models import Category, Product
+from app.services.db_routing import REPLICA_BIND, _health
+
+
+def make_config(primary_url, replica_url):
+    class RoutingConfig(Config):
+        SQLALCHEMY_DATABASE_URI = primary_url
+        SQLALCHEMY_BINDS = {REPLICA_BIND: replica_url}
+        WTF_CSRF_ENABLED = False
+        LOGIN_DISABLED = True
+        TESTING = True
+        REPORT_CACHE_BACKEND = 'none'  # 只验证 SQL 路由，报表缓存命中时不执行查询
+
+    return RoutingConfig
+
+
+def seed(app):
+    with app.app_context():
+        db.drop_all(bind_key=None)
+        db.create_all(bind_key=None)
+        category = Category(name='读写分离')
+        db.session.add(category)
+        db.session.flush()
+        db.session.add_all([
+            Product(name=f'副本商品{i}', category_id=category.id, retail_price=10, cost_price=6,
+                    unit='斤', stock_quantity=1000)
+            for i in range(5)
+        ])
+        db.session.commit()
+        return [p.id for p in Product.query.order_by(Product.id).all()]
+
+
+def count_statements(app):
+    """按引擎统计执行的 SQL 语句数：{'primary': n, 'replica': n}"""
+    counts = Counter()
+    with app.app_context():
+        for key, engine in db.engines.items():
+            name = 'primary' if key is None else key
+
+            @event.listens_for(engine, 'before_cursor_execute')
+            def _count(conn, cursor, statement, parameters, context, executemany, name=name):
+                if statement.strip().upper() != 'SELECT 1':  # 不计副本健康检查
+                    counts[name] += 1
+    return counts
+
+
+def run(client, counts, method, url, **kwargs):
+    counts.clear()
+    resp = getattr(client, method)(url, **kwargs)
+    if url.startswith('/report/export'):
+        resp.get_data()  # 流式导出：读完响应体才执行完全部查询
+    print(f'  {method.upper():4} {url:<40} {resp.status_code}  主库 {counts["primary"]:>2} 条 / 副本 {counts["replica"]:>2} 条')
+    return resp
+
+
+def main():
+    parser = argparse.ArgumentParser(description='读写分离验证')
+    parser.add_argument('--reset', action='store_true', help='确认清空并重建 BENCH_DATABASE_URL 指定的主库')
+    args = parser.parse_args()
+
+    primary_url = os.environ.get('BENCH_DATABASE_URL')
+    replica_url = os.environ.get('BENCH_REPLICA_DATABASE_URL')
+    snapshot = not (primary_url and replica_url)
+    if not snapshot and not args.reset:
+        parser.error('验证会删除并重建 BENCH_DATABASE_URL 中的所有表，确认后请加 --reset')
+    if snapshot:
+        workdir = tempfile.mkdtemp()
+        primary_path, replica_path = os.path.join(workdir, 'primary.db'), os.path.join(workdir, 'replica.db')
+        primary_url, replica_url = f'sqlite:///{primary_path}', f'sqlite:///{replica_path}'
+
+    app = create_app(make_config(primary_url, replica_url))
+    product_ids = seed(app)
+    if snapshot:
+        shutil.copyfile(primary_path, replica_path)
+    counts = count_statements(app)
+    client = app.test_client()
+
+    print(f'主库: {primary_url}\n副本: {replica_url}')
+    print('1. 写入与报表分离')
+    resp = run(client, counts, 'post', '/order/api/submit_order',
+               json={'items': [{'product_id': product_ids[0], 'quantity': 2}], 'member_id': None})
+    assert resp.status_code == 200 and counts['replica'] == 0, '结算请求不应访问副本'
+    for url in ['/report/dashboard', '/report/api/overview', '/report/api/sales_trend', '/report/api/product_ranking',
+                '/report/export/sales', '/report/export/products']:
+        resp = run(client, counts, 'get', url)
+        assert resp.status_code == 200 and counts['replica'] > 0 and counts['primary'] == 0, f'{url} 未使用副本'
+    if snapshot:
+        # 副本是下单前的快照：看板上还看不到刚提交的订单
+        trend = client.get('/report/api/sales_trend').get_json()
+        assert sum(trend['amounts']) == 0, '副本快照中不应包含新订单'
+        print('  副本数据为下单前快照，报表未读取主库 ✓')
+
+    if snapshot:
+        print('2. 副本不可用时回落到主库')
+        os.remove(replica_path)  # 副本文件消失：SQLite 会新建空库，查询时报 no such table
+        with app.app_context():
+            db.engines[REPLICA_BIND].dispose()  # 关闭仍指向旧文件的连接
+        _health.clear()
+        # 看板总览的查询在线程池中执行：副本报错同样回落到主库重试
+        resp = run(client, counts, 'get', '/report/api/overview')
+        assert resp.status_code == 200 and sum(resp.get_json()['amounts']) > 0, '回落后应读到主库数据'
+        resp = run(client, counts, 'get', '/report/api/product_ranking')
+        assert counts['replica'] == 0, '副本被标记为不可用后不应再访问'
+        # 健康检查缓存仍认为副本可用 (副本在缓存有效期内断开)：流式导出在输出数据前回落到主库
+        _health.clear()
+        resp = run(client, counts, 'get', '/report/export/sales')
+        assert resp.status_code == 200 and len(resp.get_data().splitlines()) > 1, '导出应回落到主库'
+
+    print('验证通过。')
+
+
+if __name__ == '__main__':
+    main()
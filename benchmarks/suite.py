@@ -0,0 +1,324 @@
+# benchmarks/suite.py
+"""
+端到端基准测试套件：用 seed_data 生成可复现的数据后，以本地测试客户端并发请求主要端点，
+统计每个场景的吞吐量、p50 / p95 / p99 延迟和每个请求的 SQL 条数。
+结果写入 benchmarks/results/<时间>_<提交>.json，并与上一次 (或 --compare 指定的) 结果对比。
+
+用法：
+    python benchmarks/suite.py                                    # 临时 SQLite 文件，2 万订单
+    python benchmarks/suite.py --orders 1000000 --requests 500 --concurrency 8
+    python benchmarks/suite.py --only submit_order,list_orders
+    BENCH_DATABASE_URL=mysql+pymysql://.../bench python benchmarks/suite.py --reset     # 清空该库后造数
+    BENCH_DATABASE_URL=mysql+pymysql://.../bench python benchmarks/suite.py --no-seed   # 使用已执行过 flask seed_data 的库
+
+压测库只读取 BENCH_DATABASE_URL (不使用 DATABASE_URL / .env 中的业务库)。指定数据库时必须明确选择
+--reset (删除重建所有表并造数) 或 --no-seed (使用已有数据；下单场景仍会写入订单)。
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, select, func
+from sqlalchemy.engine import Engine, make_url
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.models import Product, Member, Order
+from app.services.seed import seed_data
+from app.services.product_search import pinyin_initials
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+_local = threading.local()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    _local.queries = getattr(_local, 'queries', 0) + 1
+
+
+def make_config(database_url):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_BINDS = {}  # 不使用 .env 中配置的只读副本
+        # SQLite 写锁等待时间放宽，并发下单时不直接报 database is locked
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 60}} if database_url.startswith('sqlite') else {}
+        WTF_CSRF_ENABLED = False
+        LOGIN_DISABLED = True
+        TESTING = True
+
+    return BenchConfig
+
+
+# --- 场景：每个函数根据随机数与数据样本返回 (方法, URL, 请求参数) ---
+
+def load_samples(app):
+    """读取生成请求参数所需的数据样本 (商品 ID / 名称、会员手机号、订单 ID 范围)"""
+    with app.app_context():
+        products = db.session.execute(select(Product.id, Product.name).where(Product.stock_quantity > 0)).all()
+        phones = db.session.execute(select(Member.id, Member.phone_number).limit(2000)).all()
+        min_id, max_id = db.session.execute(select(func.min(Order.id), func.max(Order.id))).one()
+    return {
+        'product_ids': [p.id for p in products],
+        'search_terms': [p.name[:2] for p in products] + [pinyin_initials(p.name)[:2] for p in products],
+        'members': phones,
+        'order_ids': (min_id or 1, max_id or 1),
+    }
+
+
+def submit_order(rnd, s):
+    items = [{'product_id': pid, 'quantity': rnd.randint(1, 3)}
+             for pid in rnd.sample(s['product_ids'], min(rnd.randint(1, 4), len(s['product_ids'])))]
+    member_id = rnd.choice(s['members']).id if s['members'] and rnd.random() < 0.6 else None
+    return 'post', '/order/api/submit_order', {'json': {'items': items, 'member_id': member_id}}
+
+
+def list_orders(rnd, s):
+    return 'get', '/order/list', {}
+
+
+def list_orders_by_phone(rnd, s):
+    phone = rnd.choice(s['members']).phone_number
+    start = rnd.randint(0, len(phone) - 4)
+    return 'get', f'/order/list?member_phone={phone[start:start + 4]}', {}
+
+
+def order_detail(rnd, s):
+    return 'get', f"/order/detail/{rnd.randint(*s['order_ids'])}", {}
+
+
+def product_search_api(rnd, s):
+    return 'get', '/order/api/products', {'query_string': {'q': rnd.choice(s['search_terms'])}}
+
+
+def member_search_api(rnd, s):
+    return 'get', '/order/api/members', {'query_string': {'q': rnd.choice(s['members']).phone_number[:5]}}
+
+
+def product_list(rnd, s):
+    return 'get', '/product/list', {}
+
+
+def report_dashboard(rnd, s):
+    return 'get', '/report/dashboard', {}
+
+
+def report_overview(rnd, s):
+    return 'get', f"/report/api/overview?days={rnd.choice([7, 30, 90])}", {}
+
+
+def report_sales_trend(rnd, s):
+    return 'get', '/report/api/sales_trend', {}
+
+
+def report_product_ranking(rnd, s):
+    return 'get', f"/report/api/product_ranking?days={rnd.choice([7, 30, 90])}", {}
+
+
+def export_sales_week(rnd, s):
+    start = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+    return 'get', f'/report/export/sales?start_date={start}', {}
+
+
+# (名称, 请求生成函数, 请求数占 --requests 的比例)
+SCENARIOS = [
+    ('submit_order', submit_order, 1.0),
+    ('list_orders', list_orders, 1.0),
+    ('list_orders_by_phone', list_orders_by_phone, 1.0),
+    ('order_detail', order_detail, 1.0),
+    ('product_search_api', product_search_api, 1.0),
+    ('member_search_api', member_search_api, 1.0),
+    ('product_list', product_list, 1.0),
+    ('report_dashboard', report_dashboard, 1.0),
+    ('report_overview', report_overview, 1.0),
+    ('report_sales_trend', report_sales_trend, 1.0),
+    ('report_product_ranking', report_product_ranking, 1.0),
+    ('export_sales_week', export_sales_week, 0.1),
+]
+
+
+def percentile(sorted_values, pct):
+    """最近秩法百分位数"""
+    if not sorted_values:
+        return 0.0
+    index = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def run_scenario(app, samples, make_request, total, concurrency, seed):
+    """concurrency 个线程共发出 total 个请求，返回统计结果字典"""
+    latencies, queries, errors = [], [], []
+    lock = threading.Lock()
+
+    def worker(index, count):
+        rnd = random.Random(seed * 1000 + index)
+        client = app.test_client()
+        for _ in range(count):
+            method, url, kwargs = make_request(rnd, samples)
+            _local.queries = 0
+            started = time.perf_counter()
+            response = getattr(client, method)(url, **kwargs)
+            response.get_data()  # 流式响应读完才算结束
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                queries.append(_local.queries)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+
+    counts = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(counts) if n]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': round(wall, 3),
+        'throughput': round(len(latencies) / wall, 1) if wall else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else 0.0,
+    }
+
+
+# --- 结果保存与对比 ---
+
+def git_revision():
+    try:
+        sha = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                             check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return sha + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def save_results(results):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{results['meta']['revision']}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def previous_results(exclude):
+    paths = sorted(p for p in glob.glob(os.path.join(RESULTS_DIR, '*.json')) if p != exclude)
+    return paths[-1] if paths else None
+
+
+def delta(new, old):
+    if not old:
+        return ''
+    return f'{(new - old) / old * 100:+.0f}%'
+
+
+def print_report(results, baseline=None):
+    base = baseline['scenarios'] if baseline else {}
+    header = (f"{'场景':<24}{'请求':>6}{'错误':>5}{'吞吐(req/s)':>13}{'p50(ms)':>9}{'p95(ms)':>9}"
+              f"{'p99(ms)':>9}{'SQL/请求':>9}")
+    if baseline:
+        header += f"{'吞吐变化':>10}{'p95变化':>9}"
+    print(header)
+    for name, r in results['scenarios'].items():
+        line = (f"{name:<24}{r['requests']:>6}{r['errors']:>5}{r['throughput']:>13}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+                f"{r['p99_ms']:>9}{r['queries_per_request']:>9}")
+        if baseline:
+            old = base.get(name, {})
+            line += f"{delta(r['throughput'], old.get('throughput')):>10}{delta(r['p95_ms'], old.get('p95_ms')):>9}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端基准测试套件')
+    parser.add_argument('--orders', type=int, default=20000, help='生成的订单数')
+    parser.add_argument('--members', type=int, default=2000, help='生成的会员数')
+    parser.add_argument('--products', type=int, default=200, help='生成的商品数')
+    parser.add_argument('--no-seed', action='store_true', help='不生成数据，直接使用 BENCH_DATABASE_URL 中已有的数据')
+    parser.add_argument('--reset', action='store_true', help='确认清空并重建 BENCH_DATABASE_URL 指定的数据库后造数')
+    parser.add_argument('--requests', type=int, default=200, help='每个场景的请求数')
+    parser.add_argument('--concurrency', type=int, default=4, help='并发线程数')
+    parser.add_argument('--only', default='', help='只运行这些场景，逗号分隔')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--compare', help='对比的结果文件，默认取 benchmarks/results 中最近的一次')
+    parser.add_argument('--no-save', action='store_true', help='不保存本次结果')
+    args = parser.parse_args()
+
+    database_url = os.environ.get('BENCH_DATABASE_URL')
+    if args.no_seed and args.reset:
+        parser.error('--no-seed 与 --reset 不能同时使用')
+    if not database_url:
+        if args.no_seed:
+            parser.error('--no-seed 需要通过 BENCH_DATABASE_URL 指定已有数据的数据库')
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_suite.db')
+    elif not (args.reset or args.no_seed):
+        parser.error('造数会删除并重建 BENCH_DATABASE_URL 中的所有表：确认后请加 --reset，或用 --no-seed 使用已有数据')
+    app = create_app(make_config(database_url))
+
+    if not args.no_seed:
+        started = time.perf_counter()
+        with app.app_context():
+            db.drop_all(bind_key=None)
+            db.create_all(bind_key=None)
+            seed_data(orders=args.orders, members=args.members, products=args.products, seed=args.seed)
+        print(f'已生成 {args.orders} 个订单 ({time.perf_counter() - started:.1f}s)')
+
+    samples = load_samples(app)
+    selected = set(filter(None, args.only.split(',')))
+    results = {
+        'meta': {
+            'revision': git_revision(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'database': make_url(database_url).get_backend_name(),
+            'orders': args.orders if not args.no_seed else None,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'python': platform.python_version(),
+        },
+        'scenarios': {},
+    }
+    for index, (name, make_request, share) in enumerate(SCENARIOS):
+        if selected and name not in selected:
+            continue
+        total = max(int(args.requests * share), 1)
+        run_scenario(app, samples, make_request, min(total, 5), 1, args.seed)  # 预热：进程内缓存、搜索索引
+        results['scenarios'][name] = run_scenario(app, samples, make_request, total, args.concurrency,
+                                                  args.seed + index)
+
+    baseline_path = args.compare
+    saved = None if args.no_save else save_results(results)
+    if not baseline_path:
+        baseline_path = previous_results(exclude=saved)
+    baseline = None
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"对比基准: {os.path.relpath(baseline_path, ROOT)} ({baseline['meta']['revision']})")
+    print_report(results, baseline)
+    if saved:
+        print(f'结果已保存: {os.path.relpath(saved, ROOT)}')
+
+
+if __name__ == '__main__':
+    main()
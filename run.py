@@ -1,8 +1,20 @@
 # run.py
 
+import time
+
+import click
 from app import create_app
 from app.extensions import db
-from app.models import Admin
+from app.models import Admin, Product, Order, DailySales, ProductDailySales, MemberPhoneSuffix, MemberStats, \
+    MemberSegment
+from app.services.rollups import rebuild_daily_sales, rebuild_product_daily_sales
+from app.services.phone_index import rebuild_phone_index
+from app.services.member_stats import recompute_member_stats as rebuild_member_stats
+from app.services.segments import segment_members as generate_segments, SEGMENTS, SEGMENT_CHUNK
+from app.services.explain import hot_requests, capture_queries, explain
+from app.services.ai_stub import make_server
+from app.services.order_import import parse_batch, import_orders as import_order_batch, IMPORT_CHUNK_SIZE
+from app.services.seed import seed_data as generate_seed_data
 
 app = create_app()
 
@@ -11,20 +23,160 @@ def init_db():
     """初始化数据库和创建表"""
     with app.app_context():
         # 删除现有表（仅用于开发环境）
-        db.drop_all()
-        # 创建所有表
-        db.create_all()
+        db.drop_all(bind_key=None)
+        # 创建所有表 (只在主库执行，只读副本的表结构由复制同步)
+        db.create_all(bind_key=None)
         print("数据库表已创建！")
+        create_default_admin()
+
+def create_default_admin():
+    """创建一个初始管理员账号"""
+    if not Admin.query.filter_by(username='admin').first():
+        admin = Admin(username='admin', name='超级管理员')
+        admin.set_password('123456') # 初始密码：123456，**生产环境中必须更改**
+        db.session.add(admin)
+        db.session.commit()
+        print("已创建初始管理员账号：admin / 123456")
+    else:
+        print("管理员账号已存在。")
+
+@app.cli.command('rebuild_rollups')
+def rebuild_rollups():
+    """根据订单数据全量重建报表汇总表"""
+    with app.app_context():
+        # 已有数据库升级时汇总表可能尚未创建
+        DailySales.__table__.create(db.engine, checkfirst=True)
+        ProductDailySales.__table__.create(db.engine, checkfirst=True)
+
+        days = rebuild_daily_sales()
+        product_rows = rebuild_product_daily_sales()
+        db.session.commit()
+        print(f"每日销售汇总已重建：{days} 天。")
+        print(f"商品每日销售汇总已重建：{product_rows} 行。")
+
+@app.cli.command('rebuild_search_index')
+def rebuild_search_index():
+    """根据会员数据全量重建手机号后缀索引"""
+    with app.app_context():
+        MemberPhoneSuffix.__table__.create(db.engine, checkfirst=True)
+
+        rows = rebuild_phone_index()
+        db.session.commit()
+        print(f"手机号后缀索引已重建：{rows} 行。")
+
+@app.cli.command('recompute_member_stats')
+def recompute_member_stats():
+    """根据订单数据全量重建会员消费统计，并校正会员累计消费"""
+    with app.app_context():
+        MemberStats.__table__.create(db.engine, checkfirst=True)
+
+        members = rebuild_member_stats()
+        db.session.commit()
+        print(f"会员消费统计已重建：{members} 个会员有消费记录。")
+
+@app.cli.command('segment_members')
+@click.option('--workers', default=1, help='按会员 ID 区间拆分到多个进程并行扫描订单')
+@click.option('--chunk-size', default=SEGMENT_CHUNK, help='游标每批读取的订单数')
+def segment_members(workers, chunk_size):
+    """按最近消费 (R)、消费频次 (F)、消费金额 (M) 五分位打分，为所有会员划分 RFM 分群"""
+    with app.app_context():
+        MemberSegment.__table__.create(db.engine, checkfirst=True)
+
+        started = time.perf_counter()
+        try:
+            counts = generate_segments(workers=workers, chunk_size=chunk_size)
+        except RuntimeError as e:
+            print(e)
+            raise SystemExit(1)
+        db.session.commit()
+
+    print(f"会员分群完成：{sum(counts.values())} 个会员，耗时 {time.perf_counter() - started:.1f}s。")
+    for key, label in SEGMENTS:
+        if counts.get(key):
+            print(f"  {label}: {counts[key]}")
+
+@app.cli.command('import_orders')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['ndjson', 'csv']), default=None,
+              help='文件格式，缺省时按扩展名判断')
+@click.option('--chunk-size', default=IMPORT_CHUNK_SIZE, help='每个事务写入的订单数')
+def import_orders(path, file_format, chunk_size):
+    """从 NDJSON / CSV 文件批量导入离线收银台的订单 (按订单 UUID 幂等，可重复执行)"""
+    file_format = file_format or ('csv' if path.endswith('.csv') else 'ndjson')
+    with app.app_context():
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            records = parse_batch(f, file_format)
+        report = import_order_batch(records, chunk_size=chunk_size)
+
+    print(f"已导入 {len(report.imported)} 个订单，跳过重复 {len(report.duplicates)} 个，拒绝 {len(report.rejected)} 个。")
+    for item in report.rejected:
+        print(f"  [第 {item['line']} 行] {item['uuid']}: {item['message']}")
+    if report.rejected:
+        raise SystemExit(1)
+
+@app.cli.command('seed_data')
+@click.option('--orders', default=100000, help='订单数 (可到数百万)')
+@click.option('--members', default=5000, help='会员数')
+@click.option('--products', default=200, help='商品数 (最多约 5000)')
+@click.option('--days', default=365, help='订单分布在最近多少天内')
+@click.option('--seed', default=42, help='随机种子，相同参数生成相同数据')
+@click.option('--reset', is_flag=True, help='先删除并重建所有表 (会清空现有数据)')
+def seed_data(orders, members, products, days, seed, reset):
+    """批量生成分类、商品、会员和订单，用于演示与压测"""
+    with app.app_context():
+        if reset:
+            db.drop_all(bind_key=None)
+            db.create_all(bind_key=None)
+            create_default_admin()
+        elif db.session.query(Product.id).first() or db.session.query(Order.id).first():
+            print("数据库中已有商品或订单，请使用 --reset 重建后再生成。")
+            raise SystemExit(1)
+
+        def progress(done, total):
+            print(f"  订单 {done}/{total}")
+
+        generate_seed_data(orders=orders, members=members, products=products, days=days, seed=seed,
+                           progress=progress)
+        print(f"已生成 {products} 个商品、{members} 个会员、{orders} 个订单，报表汇总与手机号索引已重建。")
+
+@app.cli.command('upgrade_db')
+def upgrade_db():
+    """为已有数据库补建新增的表 (不删除已有表和数据)"""
+    with app.app_context():
+        db.create_all(bind_key=None)
+        print("缺失的数据表已创建。")
+
+@app.cli.command('explain_hot_queries')
+def explain_hot_queries():
+    """对各蓝图实际执行的查询运行 EXPLAIN，发现全表扫描时以非零状态退出"""
+    with app.app_context():
+        queries = capture_queries(app, hot_requests())
+
+    flagged = 0
+    for endpoint, statement, parameters in queries:
+        plan, scans = explain(statement, parameters)
+        status = '全表扫描: ' + ', '.join(scans) if scans else 'OK'
+        print(f"[{endpoint}] {status}")
+        print('    ' + ' '.join(statement.split()))
+        for line in plan:
+            print(f"      -> {line}")
+        flagged += bool(scans)
+
+    print(f"共检查 {len(queries)} 条查询，{flagged} 条存在全表扫描。")
+    if flagged:
+        raise SystemExit(1)
 
-        # 创建一个初始管理员账号
-        if not Admin.query.filter_by(username='admin').first():
-            admin = Admin(username='admin', name='超级管理员')
-            admin.set_password('123456') # 初始密码：123456，**生产环境中必须更改**
-            db.session.add(admin)
-            db.session.commit()
-            print("已创建初始管理员账号：admin / 123456")
-        else:
-            print("管理员账号已存在。")
+@app.cli.command('ai_stub_server')
+@click.option('--port', default=8001, help='监听端口')
+@click.option('--delay', default=0.0, help='模拟模型响应耗时 (秒)')
+def ai_stub_server(port, delay):
+    """启动本地 OpenAI 兼容桩服务，用于测试 AI 分析而无需调用 DeepSeek"""
+    server = make_server(port=port, delay=delay)
+    print(f"AI 桩服务已启动：设置 DEEPSEEK_BASE_URL=http://127.0.0.1:{port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"已停止，共收到 {server.calls} 次模型调用。")
 
 if __name__ == '__main__':
     # 建议使用 flask run 来运行应用
@@ -0,0 +1,46 @@
+# tests/conftest.py
+
+import os
+
+import pytest
+
+os.environ.setdefault('DEEPSEEK_API_KEY', 'test')  # 创建应用时需要；测试不调用模型
+
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.models import Category, Product, Member
+
+
+@pytest.fixture
+def app(tmp_path):
+    """指向临时 SQLite 文件的应用 (免登录、免 CSRF)，写入三个商品和一个会员"""
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        SQLALCHEMY_BINDS = {}  # 不使用 .env 中配置的只读副本
+        WTF_CSRF_ENABLED = False
+        LOGIN_DISABLED = True
+        TESTING = True
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all(bind_key=None)
+        category = Category(name='水果')
+        db.session.add(category)
+        db.session.flush()
+        db.session.add_all([
+            Product(name=name, category_id=category.id, retail_price=price, cost_price=price / 2,
+                    unit='斤', stock_quantity=100)
+            for name, price in (('苹果', 5.5), ('香蕉', 3.3), ('葡萄', 12.8))
+        ])
+        db.session.add(Member(name='张三', phone_number='13800138000', discount_rate=0.9))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,43 @@
+# tests/test_ai_analysis.py
+
+from types import SimpleNamespace
+
+from app.extensions import db
+from app.models import AiAnalysis
+from app.services import ai_analysis
+
+METRICS = {'total_sales': 100, 'today_sales': 10, 'total_sales_30': 90, 'avg_daily_sales_30': 3,
+           'top_products': '苹果 (3件)'}
+
+
+class FakeClient:
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='分析结果'))])
+
+
+def test_failed_write_back_marks_job_failed(app, monkeypatch):
+    """写回结果失败时回滚并标记为 failed，任务不会停留在 pending 直到 JOB_TIMEOUT"""
+    monkeypatch.setattr(ai_analysis, 'get_client', lambda *args: FakeClient())
+    save_result = ai_analysis._save_result
+    calls = []
+
+    def failing_save(key, status, result):
+        calls.append(status)
+        if len(calls) == 1:
+            db.session.execute(db.text('SELECT * FROM missing_table'))  # 模拟写回时数据库出错
+        save_result(key, status, result)
+
+    monkeypatch.setattr(ai_analysis, '_save_result', failing_save)
+    with app.app_context():
+        db.session.add(AiAnalysis(fingerprint='job', status='pending'))
+        db.session.commit()
+
+    ai_analysis._run_job(app, 'job', METRICS)
+
+    with app.app_context():
+        record = db.session.get(AiAnalysis, 'job')
+        assert calls == ['done', 'failed']
+        assert record.status == 'failed'
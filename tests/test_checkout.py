@@ -0,0 +1,31 @@
+# tests/test_checkout.py
+
+from decimal import Decimal
+
+from app.extensions import db
+from app.models import Order, Member
+
+
+def test_submit_order_with_string_member_id(app, client):
+    """收银页以字符串提交会员 ID ($('#current-member-id').val())"""
+    resp = client.post('/order/api/submit_order',
+                       json={'items': [{'product_id': 1, 'quantity': 2}], 'member_id': '1'})
+    assert resp.status_code == 200, resp.get_json()
+    with app.app_context():
+        order_obj = db.session.get(Order, resp.get_json()['order_id'])
+        assert order_obj.member_id == 1
+        assert order_obj.final_amount == Decimal('9.90')  # 2 x 5.5，九折
+        assert db.session.get(Member, 1).total_spent == Decimal('9.90')
+
+
+def test_submit_order_rejects_invalid_member_id(client):
+    resp = client.post('/order/api/submit_order',
+                       json={'items': [{'product_id': 1, 'quantity': 1}], 'member_id': 'abc'})
+    assert resp.status_code == 400
+
+
+def test_submit_order_unknown_member(client):
+    resp = client.post('/order/api/submit_order',
+                       json={'items': [{'product_id': 1, 'quantity': 1}], 'member_id': 99})
+    assert resp.status_code == 400
+    assert '会员 ID 99 不存在' in resp.get_json()['message']
@@ -0,0 +1,58 @@
+# tests/test_db_routing.py
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.services.db_routing import REPLICA_BIND, read_replica, primary_reads, replica_available, _health
+
+
+@pytest.fixture
+def routed_app(tmp_path):
+    class RoutingConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        SQLALCHEMY_BINDS = {REPLICA_BIND: f"sqlite:///{tmp_path / 'replica.db'}"}
+        WTF_CSRF_ENABLED = False
+        LOGIN_DISABLED = True
+        TESTING = True
+
+    app = create_app(RoutingConfig)
+    _health.clear()
+    yield app
+    _health.clear()
+
+
+def test_primary_error_does_not_fall_back(routed_app):
+    """主库上的错误 (如锁等待超时) 照常抛出：不标记副本不可用，也不重新执行视图"""
+    calls = []
+
+    @read_replica
+    def view():
+        calls.append(1)
+        with primary_reads():
+            db.session.execute(text('SELECT * FROM missing_table'))
+
+    with routed_app.test_request_context():
+        with pytest.raises(OperationalError):
+            view()
+        assert len(calls) == 1
+        assert replica_available(db.engines[REPLICA_BIND])
+
+
+def test_replica_error_falls_back(routed_app):
+    calls = []
+
+    @read_replica
+    def view():
+        calls.append(1)
+        db.session.execute(text('SELECT * FROM orders')).all()  # 副本是空库，主库已建表
+        return 'ok'
+
+    with routed_app.test_request_context():
+        db.create_all(bind_key=None)
+        assert view() == 'ok'
+        assert len(calls) == 2
+        assert not replica_available(db.engines[REPLICA_BIND])
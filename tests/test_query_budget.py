@@ -0,0 +1,74 @@
+# tests/test_query_budget.py
+"""统计关键端点执行的 SQL 语句数，超出预算即说明出现了 N+1 查询"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import Category, Product, Member, Order, OrderItem
+from app.services.member_stats import recompute_member_stats
+
+# 每个端点允许执行的 SQL 语句数，与返回的行数无关
+QUERY_BUDGETS = {
+    '/order/list': 2,  # 订单页 (JOIN 会员) + 缓存的总数
+    '/order/detail/1': 2,  # 订单 JOIN 会员 + 订单详情 JOIN 商品
+    '/member/list': 2,  # 会员页 (JOIN 消费统计) + 缓存的总数
+    '/member/list?sort=recent_spent&inactive_days=1': 2,  # 按消费统计排序 / 筛选
+    '/report/export/sales': 1,  # 订单 JOIN 会员
+}
+
+
+@contextmanager
+def count_queries(engine):
+    """统计代码块内在 engine 上执行的 SQL 语句，yield 的列表在退出后包含全部语句"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def seed_fixture(num_orders=30, items_per_order=5):
+    """写入足够多的订单、会员和商品，使 N+1 查询在语句数上明显暴露"""
+    category = Category(name='预算检查')
+    db.session.add(category)
+    db.session.flush()
+
+    products = [Product(name=f'预算商品{i}', category_id=category.id, retail_price=10, cost_price=5,
+                        unit='斤', stock_quantity=1000) for i in range(items_per_order)]
+    members = [Member(name=f'预算会员{i}', phone_number=f'1380000{i:04d}') for i in range(num_orders)]
+    db.session.add_all(products + members)
+    db.session.flush()
+
+    start = datetime(2024, 1, 1)
+    for i, member in enumerate(members):
+        order_obj = Order(order_date=start + timedelta(hours=i), member_id=member.id,
+                          original_amount=50, discount_amount=0, final_amount=50)
+        order_obj.items = [OrderItem(product_id=p.id, quantity=1, price_at_sale=10, cost_at_sale=5,
+                                     line_subtotal=10) for p in products]
+        db.session.add(order_obj)
+    db.session.flush()
+    recompute_member_stats()
+    db.session.commit()
+
+
+@pytest.mark.parametrize('url, budget', QUERY_BUDGETS.items())
+def test_query_budget(app, client, url, budget):
+    with app.app_context():
+        seed_fixture()
+        client.get(url).get_data()  # 预热：总数缓存等进程内缓存
+        with count_queries(db.engine) as statements:
+            response = client.get(url)
+            response.get_data()  # 流式响应需要消费完才会执行全部查询
+    # 报错或跳转的端点可能只执行了一条语句就返回，先确认请求成功
+    assert response.status_code == 200, f'{url} 返回 {response.status_code}'
+    assert len(statements) <= budget, '\n'.join([f'{url}: {len(statements)} 条 SQL (预算 {budget})'] + [
+        '    ' + ' '.join(statement.split())[:160] for statement in statements])